@@ -6,27 +6,145 @@ import yaml
 import sys
 import glob
 import subprocess
+import json
+import shutil
+import datetime
 
 # Script path
 script_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_path, 'utils'))
+from regression_test import record_startup_time, start_launcher
+from regression_test.distributed import make_job, run_coordinator
+sys.path.append(os.path.join(script_path, 'utils', 'performance_test'))
+from build_watcher import BuildWatcher, get_version, machine_is_idle, snapshot_binary
+from dashboard import build_dashboard
 
 def get_inputs_from_yaml_node(yaml_node, test_name_prefix, build_dir):
     inputs = {}
 
     # test name is directory + hardware + number of processors
     inputs['test_name'] = test_name_prefix + '_' + yaml_node['hardware'] + '_np_' + str(yaml_node['num_processors'])
-    inputs['input_file'] = yaml_node['input_file']
+    inputs['input_file'] = yaml_node.get('input_file')
     inputs['executable_path'] = build_dir + '/Release/aperi-mech'
     if yaml_node['hardware'] == 'gpu':
         inputs['executable_path'] = build_dir + '/Release_gpu/aperi-mech'
     inputs['num_processors'] = yaml_node['num_processors']
     inputs['num_runs'] = yaml_node['num_runs']
-    inputs['runtime_tolerance_percent'] = yaml_node['runtime_tolerance_percent']
-    inputs['memory_tolerance_percent'] = yaml_node['memory_tolerance_percent']
+    # Optional problem-size sweep, e.g. {meshes: [a.exo, b.exo, c.exo], time_end: 1.0e-4, exponent_tolerance: 0.1}
+    inputs['sweep'] = yaml_node.get('sweep')
+    # Optional benchmark of the harness itself with a stub executable, e.g. {timing_tolerance: 0.1, memory_tolerance: 5.0}
+    inputs['harness_benchmark'] = yaml_node.get('harness_benchmark')
+    # Settings for --smoke, e.g. {steps: [5, 10], setup_tolerance_percent: 10.0, step_tolerance_percent: 10.0}
+    inputs['smoke'] = yaml_node.get('smoke', {})
+    if inputs['sweep'] is None and inputs['harness_benchmark'] is None:
+        inputs['runtime_tolerance_percent'] = yaml_node['runtime_tolerance_percent']
+        inputs['memory_tolerance_percent'] = yaml_node['memory_tolerance_percent']
+    inputs['io_mode'] = yaml_node.get('io_mode', 'none')
+    # Optional gates on resource usage, e.g. {system_time: 20.0}
+    inputs['resource_tolerance_percent'] = yaml_node.get('resource_tolerance_percent', {})
 
     return inputs
 
-def run_performance_tests_from_directory(root_dir, build_dir, gpu_only=False, cpu_only=False, cpu_procs=None, skip_csv=False, update_baseline=False):
+def get_skip_message(test_config, gpu_only=False, cpu_only=False, cpu_procs=None, smoke=False):
+    if smoke and 'sweep' in test_config:
+        return f"  Skipping test {test_config['hardware']}_{test_config['num_processors']}. Sweeps don't have a smoke mode."
+    if test_config['hardware'] == 'gpu' and cpu_only:
+        return f"  Skipping test {test_config['hardware']}_{test_config['num_processors']}. --cpu set"
+    if test_config['hardware'] == 'cpu' and gpu_only:
+        return f"  Skipping test {test_config['hardware']}_{test_config['num_processors']}. --gpu set"
+    if cpu_procs and not(int(cpu_procs) == int(test_config['num_processors'])):
+        return f"  Skipping test {test_config['hardware']}_{test_config['num_processors']}. Request only tests with {cpu_procs} processors."
+    return None
+
+def get_sweep_command(inputs, root=script_path, python='python3', skip_csv=False, update_baseline=False):
+    sweep = inputs['sweep']
+    command = [python, root+'/utils/performance_test/sweep.py',
+               '--n', str(inputs['num_runs']),
+               '--np', str(inputs['num_processors']),
+               '--io-mode', inputs['io_mode'],
+               '--meshes'] + sweep['meshes']
+    if 'time_end' in sweep:
+        time_end = sweep['time_end'] if isinstance(sweep['time_end'], list) else [sweep['time_end']]
+        command.extend(['--time-end'] + [str(value) for value in time_end])
+    if 'exponent_tolerance' in sweep:
+        command.extend(['--exponent-tolerance', str(sweep['exponent_tolerance'])])
+    if 'memory_exponent_tolerance' in sweep:
+        command.extend(['--memory-exponent-tolerance', str(sweep['memory_exponent_tolerance'])])
+    if not skip_csv:
+        command.append('--csv')
+    if update_baseline:
+        command.append('--update-baseline')
+    command.append(inputs['executable_path'])
+    command.append(inputs['input_file'])
+    return command
+
+def get_harness_benchmark_command(inputs, root=script_path, python='python3', skip_csv=False, update_baseline=False):
+    harness_benchmark = inputs['harness_benchmark']
+    command = [python, root+'/utils/performance_test/harness_benchmark.py',
+               '--n', str(inputs['num_runs']),
+               '--np', str(inputs['num_processors'])]
+    for key in ['timing_tolerance', 'memory_tolerance', 'overhead_tolerance']:
+        if key in harness_benchmark:
+            command.extend(['--' + key.replace('_', '-'), str(harness_benchmark[key])])
+    if 'scenarios' in harness_benchmark:
+        command.extend(['--scenarios'] + harness_benchmark['scenarios'])
+    if not skip_csv:
+        command.append('--csv')
+    if update_baseline:
+        command.append('--update-baseline')
+    return command
+
+def get_smoke_command(inputs, root=script_path, python='python3', skip_csv=False, update_baseline=False):
+    smoke = inputs['smoke']
+    command = [python, root+'/utils/performance_test/smoke.py',
+               '--n', str(inputs['num_runs']),
+               '--np', str(inputs['num_processors']),
+               '--io-mode', inputs['io_mode']]
+    if 'steps' in smoke:
+        command.extend(['--steps'] + [str(steps) for steps in smoke['steps']])
+    if 'setup_tolerance_percent' in smoke:
+        command.extend(['--setup-tolerance', str(smoke['setup_tolerance_percent'])])
+    if 'step_tolerance_percent' in smoke:
+        command.extend(['--step-tolerance', str(smoke['step_tolerance_percent'])])
+    if not skip_csv:
+        command.append('--csv')
+    if update_baseline:
+        command.append('--update-baseline')
+    command.append(inputs['executable_path'])
+    command.append(inputs['input_file'])
+    return command
+
+def get_performance_command(inputs, root=script_path, python='python3', skip_csv=False, update_baseline=False, stage_dir=None, stats_file=None, smoke=False):
+    if inputs['sweep'] is not None:
+        return get_sweep_command(inputs, root, python, skip_csv, update_baseline)
+    if inputs['harness_benchmark'] is not None:
+        return get_harness_benchmark_command(inputs, root, python, skip_csv, update_baseline)
+    if smoke:
+        return get_smoke_command(inputs, root, python, skip_csv, update_baseline)
+    command = [python, root+'/utils/performance_test/performance_test.py',
+               '--n', str(inputs['num_runs']),
+               '--np', str(inputs['num_processors']),
+               '--time-tolerance', str(inputs['runtime_tolerance_percent']),
+               '--memory-tolerance', str(inputs['memory_tolerance_percent']),
+               '--no-plot',
+               '--no-ask']
+    if not skip_csv:
+        command.append('--csv')
+    if update_baseline:
+        command.append('--update-baseline')
+    command.extend(['--io-mode', inputs['io_mode']])
+    for stat_name, tolerance in inputs['resource_tolerance_percent'].items():
+        command.extend(['--resource-tolerance', f'{stat_name}={tolerance}'])
+    # Only warm runs are staged
+    if stage_dir is not None and inputs['io_mode'] == 'warm':
+        command.extend(['--stage-dir', stage_dir])
+    if stats_file is not None:
+        command.extend(['--stats-file', stats_file])
+    command.append(inputs['executable_path'])
+    command.append(inputs['input_file'])
+    return command
+
+def run_performance_tests_from_directory(root_dir, build_dir, gpu_only=False, cpu_only=False, cpu_procs=None, skip_csv=False, update_baseline=False, io_mode=None, stage_dir=None, smoke=False):
     passing_tests = 0
     total_tests = 0
     
@@ -43,31 +161,16 @@ def run_performance_tests_from_directory(root_dir, build_dir, gpu_only=False, cp
                 yaml_node = yaml.safe_load(file)
                 test_configs = yaml_node['tests']
                 for test_config in test_configs:
-                    if test_config['hardware'] == 'gpu' and cpu_only:
-                        print(f"  Skipping test {test_config['hardware']}_{test_config['num_processors']}. --cpu set")
-                        continue
-                    if test_config['hardware'] == 'cpu' and gpu_only:
-                        print(f"  Skipping test {test_config['hardware']}_{test_config['num_processors']}. --gpu set")
-                        continue
-                    if cpu_procs and not(int(cpu_procs) == int(test_config['num_processors'])):
-                        print(f"  Skipping test {test_config['hardware']}_{test_config['num_processors']}. Request only tests with {cpu_procs} processors.")
+                    skip_message = get_skip_message(test_config, gpu_only, cpu_only, cpu_procs, smoke)
+                    if skip_message is not None:
+                        print(skip_message)
                         continue
                     print(f"  Running test {test_config['hardware']}_{test_config['num_processors']}")
                     inputs = get_inputs_from_yaml_node(test_config, os.path.basename(dirpath), build_dir)
-                    # Command:
-                    command = ['python3', script_path+'/utils/performance_test/performance_test.py',
-                               '--n', str(inputs['num_runs']),
-                               '--np', str(inputs['num_processors']),
-                               '--time-tolerance', str(inputs['runtime_tolerance_percent']),
-                               '--memory-tolerance', str(inputs['memory_tolerance_percent']),
-                               '--no-plot',
-                               '--no-ask']
-                    if not skip_csv:
-                        command.append('--csv')
-                    if update_baseline:
-                        command.append('--update-baseline')
-                    command.append(inputs['executable_path'])
-                    command.append(inputs['input_file'])
+                    # The command line I/O mode overrides the one in the yaml file
+                    if io_mode is not None:
+                        inputs['io_mode'] = io_mode
+                    command = get_performance_command(inputs, skip_csv=skip_csv, update_baseline=update_baseline, stage_dir=stage_dir, smoke=smoke)
 
                     # Run the command
                     return_code = subprocess.call(command)
@@ -79,6 +182,70 @@ def run_performance_tests_from_directory(root_dir, build_dir, gpu_only=False, cp
             os.chdir(current_dir)
     return passing_tests, total_tests
 
+def get_distributed_jobs(root_dirs, gpu_only=False, cpu_only=False, cpu_procs=None, skip_csv=False, update_baseline=False, io_mode=None, stage_dir=None, smoke=False):
+    # One job per performance test. Performance jobs get a worker to themselves so they don't disturb each other's timings.
+    jobs = []
+    for root_dir in root_dirs:
+        for dirpath, _dirnames, filenames in os.walk(root_dir):
+            if 'performance.yaml' in filenames:
+                with open(os.path.join(dirpath, 'performance.yaml'), 'r') as file:
+                    yaml_node = yaml.safe_load(file)
+                directory = os.path.relpath(dirpath, script_path)
+                for test_config in yaml_node['tests']:
+                    skip_message = get_skip_message(test_config, gpu_only, cpu_only, cpu_procs, smoke)
+                    if skip_message is not None:
+                        print(skip_message)
+                        continue
+                    inputs = get_inputs_from_yaml_node(test_config, os.path.basename(dirpath), '{build_dir}')
+                    if io_mode is not None:
+                        inputs['io_mode'] = io_mode
+                    command = get_performance_command(inputs, '{root}', '{python}', skip_csv, update_baseline, stage_dir, '{stats_file}', smoke)
+                    jobs.append(make_job(len(jobs), inputs['test_name'], directory, command, test_config['hardware'], test_config['num_processors'], exclusive=True))
+    return jobs
+
+def watch_builds(root_dirs, build_dir, state_dir, poll_interval=30.0, settle_time=60.0, max_load=0.25, gpu_only=False, cpu_only=False, cpu_procs=None, skip_csv=False, io_mode=None, stage_dir=None, dashboard_file=None):
+    # Run the performance tests on every new build of the aperi-mech binaries in build_dir. Runs forever.
+    # Each build is benchmarked from a copy of its binary and recorded in builds.jsonl in state_dir.
+    os.makedirs(state_dir, exist_ok=True)
+    binaries = {}
+    if not gpu_only:
+        binaries['cpu'] = os.path.join(build_dir, 'Release', 'aperi-mech')
+    if not cpu_only:
+        binaries['gpu'] = os.path.join(build_dir, 'Release_gpu', 'aperi-mech')
+    watcher = BuildWatcher(binaries, os.path.join(state_dir, 'benchmarked.json'), settle_time)
+    print(f"Watching {', '.join(binaries.values())}")
+    waiting_for_idle = False
+    while True:
+        for hardware, path, digest in watcher.poll():
+            # Other load on the machine would skew the timings
+            if not machine_is_idle(max_load):
+                if not waiting_for_idle:
+                    print(f"New {hardware} build {digest[:16]}. Waiting for the machine to be idle.")
+                    waiting_for_idle = True
+                break
+            waiting_for_idle = False
+            version = get_version(path)
+            print("===================================")
+            print(f"Benchmarking {hardware} build {digest[:16]}: {version}")
+            snapshot_build_dir, _snapshot_path = snapshot_binary(path, digest, os.path.join(state_dir, 'snapshots'))
+            passing_tests = 0
+            total_tests = 0
+            try:
+                for root_dir in root_dirs:
+                    passing, total = run_performance_tests_from_directory(root_dir, snapshot_build_dir, hardware == 'gpu', hardware == 'cpu', cpu_procs, skip_csv, False, io_mode, stage_dir)
+                    passing_tests += passing
+                    total_tests += total
+            finally:
+                shutil.rmtree(snapshot_build_dir, ignore_errors=True)
+            record = {'date': datetime.datetime.now().isoformat(), 'hardware': hardware, 'hash': digest, 'version': version, 'passing_tests': passing_tests, 'total_tests': total_tests}
+            with open(os.path.join(state_dir, 'builds.jsonl'), 'a') as file:
+                file.write(json.dumps(record) + '\n')
+            watcher.mark_benchmarked(hardware, digest)
+            print(f"{passing_tests}/{total_tests} tests passed for {hardware} build {digest[:16]}")
+            if dashboard_file is not None:
+                build_dashboard(root_dirs, dashboard_file)
+        time.sleep(poll_interval)
+
 def clean_logs(root_dir):
     for dirpath, _dirnames, filenames in os.walk(root_dir):
         if 'performance.yaml' in filenames:
@@ -99,6 +266,17 @@ def parse_arguments():
     parser.add_argument('--cpu_num_procs', help='Only run CPU tests with this number of processors', default=None)
     parser.add_argument('--skip_csv', help='Skip putting reuslts in the csv file.', action='store_true')
     parser.add_argument('--update_baseline', help='Update the baseline results.', action='store_true')
+    parser.add_argument('--io_mode', help='Page cache state for each run: none, warm or cold. Overrides io_mode in performance.yaml.', choices=['none', 'warm', 'cold'], default=None)
+    parser.add_argument('--coordinator', help='Hand the tests out to worker agents (utils/regression_test/distributed.py) that connect to this host:port instead of running them here', default=None)
+    parser.add_argument('--stage_dir', help='RAM-backed directory to stage meshes in for warm runs, e.g. /dev/shm/aperi-mech', default=None)
+    parser.add_argument('--smoke', help='Run each test truncated to a few steps, gate the setup and per step times separately and extrapolate the full runtime (utils/performance_test/smoke.py)', action='store_true')
+    parser.add_argument('--launcher', help='How the MPI runs are launched. "dvm" starts a persistent MPI runtime (prte or orte-dvm) once and submits every run into it, falling back to mpirun if it is unavailable.', choices=['mpirun', 'dvm'], default='mpirun')
+    parser.add_argument('--dashboard', help='Update this HTML dashboard of all the performance histories after the runs (utils/performance_test/dashboard.py)', default=None)
+    parser.add_argument('--watch', help='Run as a daemon. Benchmark each new build of the binaries in --build_dir, identified by content hash.', action='store_true')
+    parser.add_argument('--watch_interval', help='Seconds between checks for a new build', type=float, default=30.0)
+    parser.add_argument('--settle_time', help='Seconds a binary must be unchanged before it is benchmarked. Rebuilds within this time are coalesced.', type=float, default=60.0)
+    parser.add_argument('--max_load', help='Only start benchmarking while the 1 minute load average per core is at most this', type=float, default=0.25)
+    parser.add_argument('--state_dir', help='Directory for the state of --watch and the record of benchmarked builds', default=os.path.expanduser('~/.aperi-mech_build_watcher'))
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -115,13 +293,38 @@ if __name__ == "__main__":
     # full path to the build directory
     build_dir = os.path.abspath(args.build_dir)
 
+    if args.watch:
+        launcher = start_launcher(args.launcher)
+        try:
+            watch_builds(directories, build_dir, os.path.abspath(args.state_dir), args.watch_interval, args.settle_time, args.max_load, args.gpu, args.cpu, args.cpu_num_procs, args.skip_csv, args.io_mode, args.stage_dir, args.dashboard)
+        finally:
+            launcher.stop()
+
     # time the regression tests
     start_time = time.perf_counter()
-    for directory in directories:
-        passing_tests, total_tests = run_performance_tests_from_directory(directory, build_dir, args.gpu, args.cpu, args.cpu_num_procs, args.skip_csv, args.update_baseline)
+    if args.coordinator is not None:
+        jobs = get_distributed_jobs(directories, args.gpu, args.cpu, args.cpu_num_procs, args.skip_csv, args.update_baseline, args.io_mode, args.stage_dir, args.smoke)
+        results = run_coordinator(jobs, args.coordinator, script_path)
+        passing_tests = sum(1 for result in results.values() if result['return_code'] == 0)
+        total_tests = len(jobs)
+    else:
+        # The performance scripts submit into the DVM, if one is started, through the environment
+        launcher = start_launcher(args.launcher)
+        try:
+            for directory in directories:
+                passing_tests, total_tests = run_performance_tests_from_directory(directory, build_dir, args.gpu, args.cpu, args.cpu_num_procs, args.skip_csv, args.update_baseline, args.io_mode, args.stage_dir, args.smoke)
+        finally:
+            launcher.stop()
+        if launcher.name != 'mpirun':
+            print(f"MPI runtime startup ({launcher.name}): {launcher.startup_time:.4e} seconds, recorded in {record_startup_time(launcher, directories[0])}")
     end_time = time.perf_counter()
     print(f"Total time: {end_time - start_time:.4e} seconds")
 
+    if args.dashboard is not None:
+        dashboard_start_time = time.perf_counter()
+        num_regressed = build_dashboard(directories, os.path.abspath(args.dashboard))
+        print(f"Dashboard {args.dashboard} updated in {time.perf_counter() - dashboard_start_time:.4e} seconds. {num_regressed} histories regressed.")
+
     failing_tests = total_tests - passing_tests
 
     if failing_tests > 0:
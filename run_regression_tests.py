@@ -5,14 +5,34 @@ import argparse
 import yaml
 import sys
 import glob
-sys.path.append('utils')
-from regression_test import RegressionTest, ExodiffCheck, PeakMemoryCheck
+import json
+import asyncio
+import psutil
 
-def get_inputs_from_yaml_node(yaml_node, test_name_prefix, build_dir):
+# Script path
+script_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_path, 'utils'))
+from regression_test import RegressionTest, ExodiffCheck, PeakMemoryCheck, ResourceCheck, LiveComparison, record_startup_time, start_launcher
+from regression_test.distributed import make_job, run_coordinator
+from regression_test.scheduler import ResourcePool, estimate_durations, partition_tests
+from regression_test.predictor import MEMORY_SAFETY_FACTOR, Predictor, append_to_history, get_features, read_history
+
+def get_test_key(test_dir, yaml_node):
+    # Key of a test in the stats, durations and merged stats files: its directory relative to the checkout (or the
+    # full path outside of it), so directories with the same name in different places don't collide, + hardware
+    # + number of processors. It doesn't depend on --directory, so runs from different roots can be merged.
+    directory = os.path.abspath(test_dir)
+    relative_directory = os.path.relpath(directory, script_path)
+    if not relative_directory.startswith(os.pardir):
+        directory = relative_directory
+    return directory + ':' + yaml_node['hardware'] + '_np_' + str(yaml_node['num_processors'])
+
+def get_inputs_from_yaml_node(yaml_node, test_dir, build_dir):
     inputs = {}
 
     # test name is directory + hardware + number of processors
-    inputs['test_name'] = test_name_prefix + '_' + yaml_node['hardware'] + '_np_' + str(yaml_node['num_processors'])
+    inputs['test_name'] = os.path.basename(test_dir) + '_' + yaml_node['hardware'] + '_np_' + str(yaml_node['num_processors'])
+    inputs['test_key'] = get_test_key(test_dir, yaml_node)
     inputs['input_file'] = yaml_node['input_file']
     memory_node = yaml_node.get('peak_memory_check', None)
     if memory_node is not None:
@@ -21,6 +41,10 @@ def get_inputs_from_yaml_node(yaml_node, test_name_prefix, build_dir):
     else:
         inputs['peak_memory'] = None
         inputs['peak_memory_percent_tolerance'] = None
+    # Optional checks on the resource usage, e.g. system_time or involuntary_context_switches
+    inputs['resource_checks'] = {}
+    for stat_name, resource_node in yaml_node.get('resource_checks', {}).items():
+        inputs['resource_checks'][stat_name] = {'value': resource_node['value'], 'percent_tolerance': resource_node['percent_tolerance']}
     inputs['exodiff'] = []
     exodiff_list = yaml_node['exodiff']
     for exodiff in exodiff_list:
@@ -34,17 +58,113 @@ def get_inputs_from_yaml_node(yaml_node, test_name_prefix, build_dir):
     if yaml_node['hardware'] == 'gpu':
         inputs['executable_path'] = build_dir + '/Release_gpu/aperi-mech'
     inputs['num_processors'] = yaml_node['num_processors']
+    inputs['hardware'] = yaml_node['hardware']
+    # Seconds before the run is killed. None for no limit.
+    inputs['timeout'] = yaml_node.get('timeout', None)
+    # Compare the results against the gold files while the test runs and stop it at the first difference
+    inputs['live_compare'] = yaml_node.get('live_compare', False)
 
     return inputs
 
-def run_regression_tests_from_directory(root_dir, build_dir):
+def run_regression_test(inputs):
+    # Run one test from the test.yaml in the current directory. Returns whether it passed and the run stats.
+    return asyncio.run(run_regression_test_async(inputs))
+
+def get_live_comparisons(inputs, working_dir=None):
+    live_comparisons = []
+    if inputs['live_compare']:
+        for exodiff in inputs['exodiff']:
+            paths = [exodiff[key] if working_dir is None else os.path.join(working_dir, exodiff[key]) for key in ['results_file', 'gold_file', 'compare_file']]
+            live_comparisons.append(LiveComparison(*paths))
+    return live_comparisons
+
+async def run_regression_test_async(inputs, working_dir=None):
+    live_comparisons = get_live_comparisons(inputs, working_dir)
+    regression_test = RegressionTest(inputs['test_name'], inputs['executable_path'], inputs['num_processors'], [inputs['input_file']], working_dir=working_dir, timeout=inputs['timeout'], live_comparisons=live_comparisons)
+    return_code, stats = await regression_test.run_async()
+    if return_code != 0:
+        print("\033[91m  FAIL\033[0m")
+        return False, stats
+
+    num_exodiff = 0
+    all_exodiff_passed = True
+    for exodiff in inputs['exodiff']:
+        exodiff_check = ExodiffCheck(inputs['test_name']+"_exodiff_"+str(num_exodiff), 'exodiff', exodiff['compare_file'], exodiff['results_file'], exodiff['gold_file'], [], working_dir=working_dir)
+        return_code = await exodiff_check.run_async()
+        if return_code != 0:
+            all_exodiff_passed = False
+    memcheck_passed = True
+    if inputs['peak_memory'] is not None:
+        peak_memory_check = PeakMemoryCheck(inputs['test_name']+"_peak_memory", stats["peak_memory"], inputs['peak_memory'], inputs['peak_memory_percent_tolerance'])
+        return_code = peak_memory_check.run()
+        if return_code != 0:
+            memcheck_passed = False
+    resource_checks_passed = True
+    for stat_name, resource_check_inputs in inputs['resource_checks'].items():
+        resource_check = ResourceCheck(inputs['test_name']+"_"+stat_name, stat_name, stats.get(stat_name), resource_check_inputs['value'], resource_check_inputs['percent_tolerance'])
+        return_code = resource_check.run()
+        if return_code != 0:
+            resource_checks_passed = False
+    if all_exodiff_passed and memcheck_passed and resource_checks_passed:
+        print("\033[92m  PASS\033[0m")
+        return True, stats
+    print("\033[91m  FAIL\033[0m")
+    return False, stats
+
+def get_memory_limit(memory_limit=None):
+    # MB of memory the tests may use. Defaults to what is available when the tests start.
+    if memory_limit is not None:
+        return memory_limit
+    return psutil.virtual_memory().available / (1024 * 1024)
+
+def predict_test(inputs, predictor, working_dir=None):
+    # Features of the test and its predicted peak memory and runtime. None for either if they aren't known.
+    if predictor is None:
+        return None, None
+    input_file = inputs['input_file'] if working_dir is None else os.path.join(working_dir, inputs['input_file'])
+    try:
+        features = get_features(input_file, inputs['num_processors'])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"  Can't predict the usage of {inputs['test_name']}: {e}")
+        return None, None
+    prediction = predictor.predict(features)
+    if prediction is not None:
+        print(f"  Predicted for {inputs['test_name']}: peak memory {prediction['peak_memory']:.1f} MB ({prediction['peak_memory_per_rank']:.1f} MB per rank), runtime {prediction['runtime']:.1f} s")
+    return features, prediction
+
+def get_predicted_memory(prediction):
+    # Memory to set aside for a test, with a margin for the error of the prediction
+    if prediction is None:
+        return 0.0
+    return prediction['peak_memory'] * MEMORY_SAFETY_FACTOR
+
+def get_refusal_message(inputs, prediction, pool):
+    # A test that wouldn't fit even on an idle host is refused rather than left to run out of memory
+    predicted_memory = get_predicted_memory(prediction)
+    if not pool.fits_alone(predicted_memory):
+        return f"Not running {inputs['test_name']}: predicted peak memory {predicted_memory:.0f} MB (with margin) is more than the {pool.memory:.0f} MB available"
+    return None
+
+def record_run(history_file, features, passed, stats):
+    # Only runs that completed are representative
+    if history_file is not None and features is not None and passed and stats.get('peak_memory'):
+        append_to_history(history_file, features, stats['peak_memory'], stats['run_time'])
+
+def run_regression_tests_from_directory(root_dir, build_dir, test_index=None, stats_file=None, live_compare=False, history_file=None, memory_limit=None, selected=None):
     passing_tests = 0
     total_tests = 0
+    all_stats = {}
+    predictor = Predictor(read_history(history_file)) if history_file is not None else None
+    # Tests run one at a time here, so a pool only decides which are refused
+    pool = ResourcePool(memory=get_memory_limit(memory_limit))
     
     # Store the current directory
     current_dir = os.getcwd()
 
-    for dirpath, _dirnames, filenames in os.walk(root_dir):
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        # A single test only comes from the test.yaml in root_dir
+        if test_index is not None:
+            dirnames.clear()
         if 'test.yaml' in filenames:
             # Change to the directory where the test files are located
             os.chdir(dirpath)
@@ -53,38 +173,197 @@ def run_regression_tests_from_directory(root_dir, build_dir):
             with open('test.yaml', 'r') as file:
                 yaml_node = yaml.safe_load(file)
                 test_configs = yaml_node['tests']
-                for test_config in test_configs:
+                for index, test_config in enumerate(test_configs):
+                    if test_index is not None and index != test_index:
+                        continue
+                    # Tests in other shards
+                    if selected is not None and (dirpath, index) not in selected:
+                        continue
                     print(f"  Running test {test_config['hardware']}_{test_config['num_processors']}")
-                    inputs = get_inputs_from_yaml_node(test_config, os.path.basename(dirpath), build_dir)
-                    regression_test = RegressionTest(inputs['test_name'], inputs['executable_path'], inputs['num_processors'], [inputs['input_file']])
-                    return_code, stats = regression_test.run()
-                    if return_code == 0:
-                        num_exodiff = 0
-                        all_exodiff_passed = True
-                        for exodiff in inputs['exodiff']:
-                            exodiff_check = ExodiffCheck(inputs['test_name']+"_exodiff_"+str(num_exodiff), 'exodiff', exodiff['compare_file'], exodiff['results_file'], exodiff['gold_file'], [])
-                            return_code = exodiff_check.run()
-                            if return_code != 0:
-                                all_exodiff_passed = False
-                        memcheck_passed = True
-                        if inputs['peak_memory'] is not None:
-                            peak_memory_check = PeakMemoryCheck(inputs['test_name']+"_peak_memory", stats["peak_memory"], inputs['peak_memory'], inputs['peak_memory_percent_tolerance'])
-                            return_code = peak_memory_check.run()
-                            if return_code != 0:
-                                memcheck_passed = False
-                        if all_exodiff_passed and memcheck_passed:
-                            passing_tests += 1
-                            print("\033[92m  PASS\033[0m")
-                        else:
-                            print("\033[91m  FAIL\033[0m")
-                    else:
+                    inputs = get_inputs_from_yaml_node(test_config, dirpath, build_dir)
+                    inputs['live_compare'] = inputs['live_compare'] or live_compare
+                    features, prediction = predict_test(inputs, predictor)
+                    refusal_message = get_refusal_message(inputs, prediction, pool)
+                    if refusal_message is not None:
+                        print(f"  {refusal_message}")
                         print("\033[91m  FAIL\033[0m")
+                        all_stats[inputs['test_key']] = {'passed': False, 'stats': {}, 'refused': refusal_message}
+                        total_tests += 1
+                        continue
+                    passed, stats = run_regression_test(inputs)
+                    record_run(history_file, features, passed, stats)
+                    all_stats[inputs['test_key']] = {'passed': passed, 'stats': stats}
+                    if passed:
+                        passing_tests += 1
                     total_tests += 1
             print("-----------------------------------\n")
             # Change back to the original directory
             os.chdir(current_dir)
+
+    if stats_file is not None:
+        with open(stats_file, 'w') as file:
+            json.dump(all_stats, file, indent=2)
     return passing_tests, total_tests
 
+def find_tests(root_dir, build_dir):
+    # All the tests in the test.yaml files under root_dir, as (directory, index in test.yaml, inputs)
+    tests = []
+    for dirpath, _dirnames, filenames in os.walk(root_dir):
+        if 'test.yaml' in filenames:
+            with open(os.path.join(dirpath, 'test.yaml'), 'r') as file:
+                yaml_node = yaml.safe_load(file)
+            for index, test_config in enumerate(yaml_node['tests']):
+                tests.append((dirpath, index, get_inputs_from_yaml_node(test_config, dirpath, build_dir)))
+    return tests
+
+def filter_hardware(tests, gpu_only=False, cpu_only=False):
+    # The tests for the hardware asked for with --gpu or --cpu, like run_performance_tests.py
+    if gpu_only:
+        return [test for test in tests if test[2]['hardware'] == 'gpu']
+    if cpu_only:
+        return [test for test in tests if test[2]['hardware'] == 'cpu']
+    return tests
+
+def run_regression_tests_concurrently(root_dir, build_dir, max_jobs, stats_file=None, live_compare=False, history_file=None, memory_limit=None, selected=None):
+    # Run up to max_jobs tests at once, limited by the cores they use and their predicted memory, from a single event loop.
+    # Tests in the same directory share output files, so they still run one after the other.
+    tests = [test for test in find_tests(root_dir, build_dir) if selected is None or (test[0], test[1]) in selected]
+    for _dirpath, _index, inputs in tests:
+        inputs['live_compare'] = inputs['live_compare'] or live_compare
+    predictor = Predictor(read_history(history_file)) if history_file is not None else None
+    pool = ResourcePool(max_jobs, memory=get_memory_limit(memory_limit))
+    predictions = [predict_test(inputs, predictor, dirpath) for dirpath, _index, inputs in tests]
+
+    async def run_all():
+        directory_locks = {dirpath: asyncio.Lock() for dirpath, _index, _inputs in tests}
+
+        async def run_one(dirpath, inputs, features, prediction):
+            refusal_message = get_refusal_message(inputs, prediction, pool)
+            if refusal_message is not None:
+                print(f"  {refusal_message}")
+                return False, {}
+            memory = get_predicted_memory(prediction)
+            async with directory_locks[dirpath]:
+                await pool.acquire(int(inputs['num_processors']), memory)
+                try:
+                    print(f"  Running test {inputs['test_name']} in {dirpath}")
+                    passed, stats = await run_regression_test_async(inputs, dirpath)
+                finally:
+                    await pool.release(int(inputs['num_processors']), memory)
+            record_run(history_file, features, passed, stats)
+            return passed, stats
+
+        # Start the longest predicted tests first so they don't end up running alone at the end
+        order = sorted(range(len(tests)), key=lambda i: -(predictions[i][1]['runtime'] if predictions[i][1] is not None else 0.0))
+        results = await asyncio.gather(*(run_one(tests[i][0], tests[i][2], *predictions[i]) for i in order))
+        return [result for _i, result in sorted(zip(order, results))]
+
+    results = asyncio.run(run_all())
+    all_stats = {inputs['test_key']: {'passed': passed, 'stats': stats} for (_dirpath, _index, inputs), (passed, stats) in zip(tests, results)}
+    if stats_file is not None:
+        with open(stats_file, 'w') as file:
+            json.dump(all_stats, file, indent=2)
+    passing_tests = sum(1 for passed, _stats in results if passed)
+    return passing_tests, len(tests)
+
+def get_distributed_jobs(root_dir, live_compare=False, selected=None):
+    # One job per test in each test.yaml. Paths are relative to the checkout so workers can use their own.
+    jobs = []
+    for dirpath, index, inputs in find_tests(root_dir, '{build_dir}'):
+        if selected is not None and (dirpath, index) not in selected:
+            continue
+        directory = os.path.relpath(dirpath, script_path)
+        command = ['{python}', '{root}/run_regression_tests.py',
+                   '--directory', '{root}/' + directory,
+                   '--build_dir', '{build_dir}',
+                   '--test_index', str(index),
+                   '--stats_file', '{stats_file}']
+        if live_compare:
+            command.append('--live_compare')
+        jobs.append(make_job(len(jobs), inputs['test_key'], directory, command, inputs['hardware'], inputs['num_processors']))
+    return jobs
+
+def run_regression_tests_distributed(root_dir, address, live_compare=False, selected=None):
+    jobs = get_distributed_jobs(root_dir, live_compare, selected)
+    results = run_coordinator(jobs, address, script_path)
+    passing_tests = sum(1 for result in results.values() if result['return_code'] == 0)
+    return passing_tests, len(jobs)
+
+def parse_shard(value):
+    # 'i/N' with 1 <= i <= N, as (0-based shard index, number of shards)
+    try:
+        index, num_shards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, e.g. 1/4, got '{value}'")
+    if num_shards < 1 or not 1 <= index <= num_shards:
+        raise argparse.ArgumentTypeError(f"shard {value} is out of range. Expected 1 <= i <= N.")
+    return index - 1, num_shards
+
+def read_recorded_durations(stats_files):
+    # Runtime of each test that passed in earlier --stats_file outputs (one per shard, or merged). Later files win.
+    durations = {}
+    for stats_file in stats_files or []:
+        with open(stats_file, 'r') as file:
+            all_stats = json.load(file)
+        for test_key, result in all_stats.items():
+            if result.get('passed') and result.get('stats', {}).get('run_time'):
+                durations[test_key] = result['stats']['run_time']
+    return durations
+
+def get_test_work(dirpath, inputs):
+    # Steps x mesh entities per rank, for tests that have never run. None if the mesh can't be read, e.g. it isn't generated yet.
+    try:
+        features = get_features(os.path.join(dirpath, inputs['input_file']), inputs['num_processors'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return features['num_steps'] * (features['num_nodes'] + features['num_elem']) / features['num_procs']
+
+def select_shard(tests, shard, recorded_durations, predictor=None):
+    # The (directory, index in test.yaml) of the tests in this shard, and their expected runtime and cores.
+    # Expected runtimes are the recorded ones, then the predicted ones, then estimates from the mesh size.
+    shard_index, num_shards = shard
+    durations = []
+    work = []
+    for dirpath, _index, inputs in tests:
+        duration = recorded_durations.get(inputs['test_key'])
+        amount = None
+        if duration is None:
+            _features, prediction = predict_test(inputs, predictor, dirpath)
+            duration = prediction['runtime'] if prediction is not None else None
+            amount = get_test_work(dirpath, inputs)
+        durations.append(duration)
+        work.append(amount)
+    durations = estimate_durations(durations, work)
+    cores = [int(inputs['num_processors']) for _dirpath, _index, inputs in tests]
+    keys = [f"{os.path.relpath(dirpath, script_path)}:{index}" for dirpath, index, _inputs in tests]
+    shards = partition_tests(keys, durations, cores, num_shards)
+    selected = {(dirpath, index) for (dirpath, index, _inputs), s in zip(tests, shards) if s == shard_index}
+    expected_duration = sum(duration for duration, s in zip(durations, shards) if s == shard_index)
+    shard_cores = sum(core for core, s in zip(cores, shards) if s == shard_index)
+    print(f"Shard {shard_index + 1}/{num_shards}: {len(selected)} of {len(tests)} tests, expected runtime {expected_duration:.1f} s of {sum(durations):.1f} s, {shard_cores} of {sum(cores)} cores")
+    return selected
+
+def merge_stats(stats_files, merged_file=None):
+    # Combine the --stats_file outputs of the shards into one. Returns (passing tests, total tests).
+    merged = {}
+    for stats_file in stats_files:
+        with open(stats_file, 'r') as file:
+            all_stats = json.load(file)
+        for test_key, result in all_stats.items():
+            if test_key in merged:
+                print(f"Warning: {test_key} is in more than one stats file. Keeping the one from {stats_file}.")
+            merged[test_key] = result
+    if merged_file is not None:
+        with open(merged_file, 'w') as file:
+            json.dump(merged, file, indent=2)
+    run_time = sum(result.get('stats', {}).get('run_time', 0.0) for result in merged.values())
+    print(f"Merged {len(merged)} tests from {len(stats_files)} stats files. Total test runtime: {run_time:.4e} seconds")
+    for test_key, result in sorted(merged.items()):
+        if not result.get('passed'):
+            print(f"\033[91m  FAIL\033[0m {test_key}")
+    passing_tests = sum(1 for result in merged.values() if result.get('passed'))
+    return passing_tests, len(merged)
+
 def clean_logs(root_dir):
     for dirpath, _dirnames, filenames in os.walk(root_dir):
         if 'test.yaml' in filenames:
@@ -100,6 +379,19 @@ def parse_arguments():
     parser.add_argument('--directory', help='Directory root containing the tests. Will recursively search for test.yaml files.', default='.')
     parser.add_argument('--build_dir', help='Directory containing the build', default='/home/azureuser/projects/aperi-mech/build/')
     parser.add_argument('--clean_logs', help='Clean the log files from the tests', action='store_true')
+    parser.add_argument('--gpu', help='Only run GPU tests', action='store_true')
+    parser.add_argument('--cpu', help='Only run CPU tests', action='store_true')
+    parser.add_argument('--test_index', help='Only run the test with this index in the test.yaml in --directory. Subdirectories are not searched.', type=int, default=None)
+    parser.add_argument('--stats_file', help='Write the results and run stats of the tests to this JSON file', default=None)
+    parser.add_argument('--jobs', help='Number of tests to run at once. Tests are also limited by the cores they use.', type=int, default=1)
+    parser.add_argument('--coordinator', help='Hand the tests out to worker agents (utils/regression_test/distributed.py) that connect to this host:port instead of running them here', default=None)
+    parser.add_argument('--history_file', help='JSON lines file of earlier runs, used to predict the peak memory and runtime of each test before it starts. Each run that passes is added to it.', default=None)
+    parser.add_argument('--memory_limit', help='MB of memory the tests may use. Tests predicted to need more are not run. Defaults to the memory available at the start.', type=float, default=None)
+    parser.add_argument('--live_compare', help='Compare the results against the gold files while each test runs and stop it at the first time step out of the exodiff tolerances', action='store_true')
+    parser.add_argument('--launcher', help='How the MPI runs are launched. "dvm" starts a persistent MPI runtime (prte or orte-dvm) once and submits every run into it, falling back to mpirun if it is unavailable.', choices=['mpirun', 'dvm'], default='mpirun')
+    parser.add_argument('--shard', help='Only run shard i of N (1-based, e.g. 2/4). The tests are split into N groups with about the same expected runtime and cores.', type=parse_shard, default=None)
+    parser.add_argument('--durations_file', help='--stats_file outputs of earlier runs, giving the runtime of each test for --shard', nargs='+', default=None)
+    parser.add_argument('--merge_stats', help='Merge these --stats_file outputs of the shards into --stats_file, print the summary and exit', nargs='+', default=None)
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -108,6 +400,8 @@ if __name__ == "__main__":
     build_dir = os.path.abspath(args.build_dir)
 
     directory = os.path.abspath(args.directory)
+    # Tests run from their own directories
+    history_file = os.path.abspath(args.history_file) if args.history_file is not None else None
 
     # Just clean the logs and exit
     if (args.clean_logs):
@@ -115,9 +409,34 @@ if __name__ == "__main__":
         clean_logs(directory)
         sys.exit(0)
 
+    if args.merge_stats is not None:
+        passing_tests, total_tests = merge_stats(args.merge_stats, args.stats_file)
+        sys.exit(0 if passing_tests == total_tests else 1)
+
+    tests = filter_hardware(find_tests(directory, build_dir), args.gpu, args.cpu)
+    selected = None
+    if args.gpu or args.cpu:
+        selected = {(dirpath, index) for dirpath, index, _inputs in tests}
+    if args.shard is not None:
+        predictor = Predictor(read_history(history_file)) if history_file is not None else None
+        selected = select_shard(tests, args.shard, read_recorded_durations(args.durations_file), predictor)
+
     # time the regression tests
     start_time = time.perf_counter()
-    passing_tests, total_tests = run_regression_tests_from_directory(directory, build_dir)
+    if args.coordinator is not None:
+        passing_tests, total_tests = run_regression_tests_distributed(directory, args.coordinator, args.live_compare, selected)
+    else:
+        # The tests submit into the DVM, if one is started, through the environment
+        launcher = start_launcher(args.launcher)
+        try:
+            if args.jobs > 1:
+                passing_tests, total_tests = run_regression_tests_concurrently(directory, build_dir, args.jobs, args.stats_file, args.live_compare, history_file, args.memory_limit, selected)
+            else:
+                passing_tests, total_tests = run_regression_tests_from_directory(directory, build_dir, args.test_index, args.stats_file, args.live_compare, history_file, args.memory_limit, selected)
+        finally:
+            launcher.stop()
+        if launcher.name != 'mpirun':
+            print(f"MPI runtime startup ({launcher.name}): {launcher.startup_time:.4e} seconds, recorded in {record_startup_time(launcher, directory)}")
     end_time = time.perf_counter()
     print(f"Total time: {end_time - start_time:.4e} seconds")
 
@@ -1,109 +1,147 @@
-import subprocess
-import gmsh
-import exodus
+import argparse
 import numpy as np
 
-def create_gmsh_cylinder(height, radius, mesh_size, out_file_base):
-    # Initialize gmsh
-    gmsh.initialize()
-    
-    # Create a new model
+# gmsh and exodus.py are imported where they are used, so the mesh processing can be used (and tested) without them
+
+GMSH_TET4 = 4  # gmsh element type of 4 node tetrahedra
+
+# Exodus TET4 sides, as 0-based local node indices
+TET4_SIDES = np.array([
+    [0, 1, 3],
+    [1, 2, 3],
+    [0, 3, 2],
+    [0, 2, 1],
+])
+
+def create_gmsh_cylinder(height, radius, mesh_size):
+    # Mesh a cylinder in the current gmsh model. gmsh must be initialized.
+    import gmsh
     gmsh.model.add("Cylinder")
-    
+
     # Add a cylinder
     cylinder_tag = gmsh.model.occ.addCylinder(0, 0, 0, 0, 0, height, radius)
-    
+
     # Synchronize the CAD kernel with the Gmsh model
     gmsh.model.occ.synchronize()
-    
+
     # Set the mesh size for the points at the bottom and top faces
     # Get the points of the bottom and top circle
     bottom_circle = gmsh.model.getEntitiesInBoundingBox(-radius, -radius, 0, radius, radius, 0, 0)
     top_circle = gmsh.model.getEntitiesInBoundingBox(-radius, -radius, height, radius, radius, height, 0)
-    
+
     # Combine the points and filter for dimension 0 (points)
     points = [pt for pt in bottom_circle + top_circle if pt[0] == 0]
-    
+
     # Set mesh size at the points
     for point in points:
         gmsh.model.mesh.setSize([point], mesh_size)
-    
+
     # Define a physical group for the whole cylinder
     gmsh.model.addPhysicalGroup(3, [cylinder_tag], tag=1)
     gmsh.model.setPhysicalName(3, 1, "Cylinder")
-    
+
     # Generate a 3D mesh
     gmsh.model.mesh.generate(3)
-    
-    # Save the mesh to a file
-    gmsh.write(out_file_base+".msh")
-    gmsh.write(out_file_base+".key")
-    
-    # Finalize the gmsh API
-    gmsh.finalize()
-
-def convert_gmsh_to_exo(out_file_base):
-    # Convert the Gmsh mesh to ExodusII format using meshio
-    subprocess.run(["meshio", "convert", out_file_base+".msh", out_file_base+"_meshio.e"])
-    
-def add_nodeset_and_fix_exo(out_file_base):
-    in_file = out_file_base+"_meshio.e"
-    out_file = out_file_base+".exo"
-
-    # Open the existing ExodusII file
-    # Struggled to add nodesets to meshio file, so just grab the nodes and connectivity and create a new file
-    exo_in = exodus.exodus(in_file, mode='r')
-    
-    # Get the coordinates of all nodes
-    points = np.array(exo_in.get_coords()).T  # Transpose to get (n_nodes, 3)
-    
-    # Leading face nodes
-    nodeset_nodes = np.where(points[:, 2] == 0)[0] + 1  # Convert to 1-based indexing
-    
-    # Element connectivity
-    elements = np.array(exo_in.get_elem_connectivity(0)[0])
-    num_elements = exo_in.num_elems()
-    
+
+def get_mesh_arrays():
+    # Node coordinates (num_nodes, 3) and 0-based tet connectivity (num_elements, 4) straight from the gmsh model.
+    # Only nodes used by the tets are kept, numbered compactly in gmsh tag order.
+    import gmsh
+    node_tags, coordinates, _parametric_coordinates = gmsh.model.mesh.getNodes()
+    node_tags = np.asarray(node_tags, dtype=np.int64)
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+    _element_tags, element_node_tags = gmsh.model.mesh.getElementsByType(GMSH_TET4)
+    element_node_tags = np.asarray(element_node_tags, dtype=np.int64).reshape(-1, 4)
+    return remap_to_compact(node_tags, coordinates, element_node_tags)
+
+def remap_to_compact(node_tags, coordinates, element_node_tags):
+    # gmsh tags can have gaps and include nodes no element uses
+    used_tags = np.unique(element_node_tags)
+    tag_to_row = np.full(node_tags.max() + 1, -1, dtype=np.int64)
+    tag_to_row[node_tags] = np.arange(node_tags.shape[0])
+    points = coordinates[tag_to_row[used_tags]]
+    tag_to_index = np.full(node_tags.max() + 1, -1, dtype=np.int64)
+    tag_to_index[used_tags] = np.arange(used_tags.shape[0])
+    return points, tag_to_index[element_node_tags]
+
+def get_face_sets(points, elements, z):
+    # 0-based nodes on the plane at z, and the (element, 1-based Exodus side) pairs of the tet faces lying on it
+    on_face = points[:, 2] == z
+    nodeset_nodes = np.nonzero(on_face)[0]
+    element_on_face = on_face[elements]
+    sideset_elements = []
+    sideset_sides = []
+    for side, side_nodes in enumerate(TET4_SIDES):
+        side_elements = np.nonzero(element_on_face[:, side_nodes].all(axis=1))[0]
+        sideset_elements.append(side_elements)
+        sideset_sides.append(np.full(side_elements.shape[0], side + 1, dtype=np.int64))
+    sideset_elements = np.concatenate(sideset_elements)
+    sideset_sides = np.concatenate(sideset_sides)
+    order = np.argsort(sideset_elements, kind='stable')
+    return nodeset_nodes, sideset_elements[order], sideset_sides[order]
+
+def write_exo(out_file, points, elements, nodeset_nodes, sideset_elements, sideset_sides):
     # Create an ExodusII file and write the mesh data
+    import exodus
     exo_out = exodus.exodus(out_file, mode='w',
                             array_type='numpy', title="Cylinder Mesh",
                             numDims=3, numNodes=points.shape[0],
-                            numElems=num_elements, numBlocks=1,
-                            numNodeSets=1)
-    
+                            numElems=elements.shape[0], numBlocks=1,
+                            numNodeSets=1, numSideSets=1)
+
     # Write coordinates
     exo_out.put_coords(points[:, 0], points[:, 1], points[:, 2])
-    
-    # Write element block info
-    exo_out.put_elem_blk_info(1, "TET4", num_elements, 4, 0)
-    exo_out.put_elem_connectivity(1, elements.flatten())
-    
+
+    # Write element block info. Exodus is 1-based.
+    exo_out.put_elem_blk_info(1, "TET4", elements.shape[0], 4, 0)
+    exo_out.put_elem_connectivity(1, elements.flatten() + 1)
+
     # Write nodeset info
     exo_out.put_set_params('EX_NODE_SET', 1, nodeset_nodes.shape[0], 0)
-    exo_out.put_node_set(1, nodeset_nodes)
-    
-    # Add names to the element block and nodeset
+    exo_out.put_node_set(1, nodeset_nodes + 1)
+
+    # Write sideset info
+    exo_out.put_set_params('EX_SIDE_SET', 1, sideset_elements.shape[0], 0)
+    exo_out.put_side_set(1, sideset_elements + 1, sideset_sides)
+
+    # Add names to the element block, nodeset and sideset
     exo_out.put_names("EX_ELEM_BLOCK", ["block_1"])
     exo_out.put_names("EX_NODE_SET", ["nodeset_1"])
-    
-    # Close the ExodusII files
+    exo_out.put_names("EX_SIDE_SET", ["sideset_1"])
+
     exo_out.close()
-    exo_in.close()
-    
+
     print(f"ExodusII file '{out_file}' created successfully.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mesh the Taylor bar cylinder with gmsh and write it to an Exodus file, cylinder<mesh size>.exo.',
+                                     epilog='Only the .exo file is written by default. The .msh and LS-DYNA .key files that used to always be written '
+                                            'are now opt-in: pass --write-msh and/or --write-key to get them.')
+    parser.add_argument('--mesh-size', dest='mesh_size', type=float, default=0.02, help='Target mesh size')
+    parser.add_argument('--write-msh', dest='write_msh', action='store_true', default=False, help='Also write the gmsh .msh file (no longer written by default)')
+    parser.add_argument('--write-key', dest='write_key', action='store_true', default=False, help='Also write the LS-DYNA .key file (no longer written by default)')
+    args = parser.parse_args()
+
+    import gmsh
 
     # Define the parameters
-    mesh_size = 0.02  # Define the desired mesh size
     height = 0.2346
     radius = 0.0391
 
-    out_file_base = "cylinder"+str(mesh_size).replace('.','p')
-
-    create_gmsh_cylinder(height, radius, mesh_size, out_file_base)
+    out_file_base = "cylinder"+str(args.mesh_size).replace('.','p')
 
-    convert_gmsh_to_exo(out_file_base)
+    gmsh.initialize()
+    try:
+        create_gmsh_cylinder(height, radius, args.mesh_size)
+        if args.write_msh:
+            gmsh.write(out_file_base+".msh")
+        if args.write_key:
+            gmsh.write(out_file_base+".key")
+        points, elements = get_mesh_arrays()
+    finally:
+        gmsh.finalize()
 
-    add_nodeset_and_fix_exo(out_file_base)
+    # Leading face, at z = 0
+    nodeset_nodes, sideset_elements, sideset_sides = get_face_sets(points, elements, 0.0)
 
+    write_exo(out_file_base+".exo", points, elements, nodeset_nodes, sideset_elements, sideset_sides)
@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+# script directory
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(script_dir+os.sep+'..')
+from regression_test import read_header, read_variable
+
+# Offline estimate of the RKPM neighbor lists aperi-mech builds for a mesh, without running it. Like the solver,
+# the kernel radius of a node is kernel_radius_scale_factor times the largest distance between two nodes of an
+# element it belongs to, and the neighbors of a node are the nodes whose kernel covers it (including itself).
+# Matches the kernel_radius and num_neighbors outputs of the rkpm regression test exactly.
+
+CHUNK_SIZE = 16384  # kernels searched at once. Bounds the memory used for candidate pairs.
+BYTES_PER_NEIGHBOR = 16  # neighbor index (8) and shape function value (8)
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+def read_mesh(mesh_file):
+    # Node coordinates (num_nodes, num_dim) and the 0-based connectivity of each element block
+    header = read_header(mesh_file)
+    coordinates = np.stack([read_variable(mesh_file, name, header=header) for name in ['coordx', 'coordy', 'coordz'] if name in header['variables']], axis=1)
+    connectivities = []
+    for i in range(header['dimensions'].get('num_el_blk', 0)):
+        name = f'connect{i+1}'
+        if name in header['variables']:
+            connectivities.append(read_variable(mesh_file, name, header=header).astype(np.int64) - 1)
+    return coordinates, connectivities
+
+def get_kernel_radii(coordinates, connectivities, scale_factor):
+    # scale_factor times the largest distance from each node to another node of an element it belongs to
+    max_distance = np.zeros(coordinates.shape[0])
+    for connectivity in connectivities:
+        num_nodes_per_element = connectivity.shape[1]
+        element_max = np.zeros(connectivity.shape)
+        for a in range(num_nodes_per_element):
+            for b in range(a + 1, num_nodes_per_element):
+                distance = np.linalg.norm(coordinates[connectivity[:, a]] - coordinates[connectivity[:, b]], axis=1)
+                np.maximum(element_max[:, a], distance, out=element_max[:, a])
+                np.maximum(element_max[:, b], distance, out=element_max[:, b])
+        for a in range(num_nodes_per_element):
+            np.maximum.at(max_distance, connectivity[:, a], element_max[:, a])
+    return scale_factor * max_distance
+
+def _kd_tree_pairs(coordinates, tree, kernels, radii):
+    # (covered node, index into kernels) for every node within the radius of a kernel
+    kernel_tree = cKDTree(coordinates[kernels])
+    pairs = tree.sparse_distance_matrix(kernel_tree, radii.max(), output_type='ndarray')
+    inside = pairs['v'] <= radii[pairs['j']]
+    return pairs['i'][inside], pairs['j'][inside]
+
+def _cell_keys(cells, shape):
+    return (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+
+def _bin_nodes(coordinates, cell_size):
+    # Cell list with cells as wide as the largest kernel radius, so only the 27 cells around a kernel need to be searched
+    points = np.zeros((coordinates.shape[0], 3))
+    points[:, :coordinates.shape[1]] = coordinates
+    cells = np.floor((points - points.min(axis=0)) / max(cell_size, np.finfo(float).tiny)).astype(np.int64) + 1
+    shape = cells.max(axis=0) + 2
+    keys = _cell_keys(cells, shape)
+    order = np.argsort(keys, kind='stable')
+    return {'points': points, 'cells': cells, 'shape': shape, 'order': order, 'sorted_keys': keys[order]}
+
+def _cell_list_pairs(cell_list, kernels, radii):
+    # Same as _kd_tree_pairs with numpy only
+    points = cell_list['points']
+    order = cell_list['order']
+    covered_nodes = []
+    kernel_indices = []
+    for offset in np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1])).reshape(3, -1).T:
+        kernel_keys = _cell_keys(cell_list['cells'][kernels] + offset, cell_list['shape'])
+        start = np.searchsorted(cell_list['sorted_keys'], kernel_keys, 'left')
+        counts = np.searchsorted(cell_list['sorted_keys'], kernel_keys, 'right') - start
+        kernel = np.repeat(np.arange(kernels.shape[0]), counts)
+        position_in_cell = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        node = order[np.repeat(start, counts) + position_in_cell]
+        inside = np.linalg.norm(points[node] - points[kernels[kernel]], axis=1) <= radii[kernel]
+        covered_nodes.append(node[inside])
+        kernel_indices.append(kernel[inside])
+    return np.concatenate(covered_nodes), np.concatenate(kernel_indices)
+
+def _spatial_order(coordinates):
+    # Node order along a Morton (Z-order) curve, so a chunk of consecutive nodes is compact in space
+    points = coordinates - coordinates.min(axis=0)
+    cells = (points / max(points.max(), np.finfo(float).tiny) * 1023).astype(np.int64)
+    keys = np.zeros(coordinates.shape[0], dtype=np.int64)
+    for bit in range(10):
+        for dim in range(cells.shape[1]):
+            keys |= ((cells[:, dim] >> bit) & 1) << (bit * 3 + dim)
+    return np.argsort(keys, kind='stable')
+
+def count_neighbors(coordinates, radii, use_kd_tree=True, chunk_size=CHUNK_SIZE):
+    # Returns (neighbors of each node, nodes in the support of each node's kernel). Kernels are searched in chunks
+    # that are compact in space, so each chunk only touches the nodes near it.
+    num_nodes = coordinates.shape[0]
+    num_neighbors = np.zeros(num_nodes, dtype=np.int64)
+    support_sizes = np.zeros(num_nodes, dtype=np.int64)
+    if use_kd_tree:
+        tree = cKDTree(coordinates)
+    else:
+        cell_list = _bin_nodes(coordinates, radii.max())
+    spatial_order = _spatial_order(coordinates)
+    for start in range(0, num_nodes, chunk_size):
+        kernels = spatial_order[start:start + chunk_size]
+        if use_kd_tree:
+            covered_nodes, kernel_indices = _kd_tree_pairs(coordinates, tree, kernels, radii[kernels])
+        else:
+            covered_nodes, kernel_indices = _cell_list_pairs(cell_list, kernels, radii[kernels])
+        num_neighbors += np.bincount(covered_nodes, minlength=num_nodes)
+        support_sizes[kernels] = np.bincount(kernel_indices, minlength=kernels.shape[0])
+    return num_neighbors, support_sizes
+
+def summarize(num_neighbors, num_procs=1, bytes_per_neighbor=BYTES_PER_NEIGHBOR):
+    total_pairs = int(num_neighbors.sum())
+    max_neighbors = int(num_neighbors.max())
+    summary = {
+        'num_nodes': int(num_neighbors.shape[0]),
+        'total_pairs': total_pairs,
+        'mean': float(num_neighbors.mean()),
+        'min': int(num_neighbors.min()),
+        'max': max_neighbors,
+        'percentiles': {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(num_neighbors, PERCENTILES))},
+        # Lists sized to each node's neighbors, or all sized to the node with the most
+        'compact_memory_mb': total_pairs * bytes_per_neighbor / (1024 * 1024),
+        'padded_memory_mb': num_neighbors.shape[0] * max_neighbors * bytes_per_neighbor / (1024 * 1024),
+    }
+    summary['compact_memory_mb_per_rank'] = summary['compact_memory_mb'] / num_procs
+    summary['padded_memory_mb_per_rank'] = summary['padded_memory_mb'] / num_procs
+    return summary
+
+def print_summary(scale_factor, summary, histogram=None):
+    print(f"Scale factor {scale_factor}:")
+    print(f"    Neighbors per node: mean {summary['mean']:.2f}, min {summary['min']}, max {summary['max']}")
+    print("    Percentiles: " + ", ".join(f"p{p} {v:g}" for p, v in summary['percentiles'].items()))
+    print(f"    Total pairs: {summary['total_pairs']}")
+    print(f"    Neighbor list memory: {summary['compact_memory_mb']:.2f} MB compact ({summary['compact_memory_mb_per_rank']:.2f} MB per rank), "
+          f"{summary['padded_memory_mb']:.2f} MB padded to the max ({summary['padded_memory_mb_per_rank']:.2f} MB per rank)")
+    if histogram is not None:
+        print("    Histogram (neighbors: nodes):")
+        for count in np.nonzero(histogram)[0]:
+            print(f"        {count:>4}: {histogram[count]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Estimate the RKPM neighbor counts and neighbor list memory of a mesh for kernel radius scale factors.')
+    parser.add_argument('mesh_file', type=str, help='Exodus mesh (netCDF classic format)')
+    parser.add_argument('--scale-factor', dest='scale_factors', type=float, nargs='+', default=[1.1], help='kernel_radius_scale_factor values to evaluate')
+    parser.add_argument('--np', type=int, default=1, help='Number of processors, for the memory per rank')
+    parser.add_argument('--bytes-per-neighbor', dest='bytes_per_neighbor', type=int, default=BYTES_PER_NEIGHBOR, help='Bytes stored for each neighbor of a node')
+    parser.add_argument('--cell-list', dest='cell_list', action='store_true', default=False, help='Use the numpy cell list instead of the scipy KD-tree')
+    parser.add_argument('--histogram', action='store_true', default=False, help='Print the number of nodes with each neighbor count')
+    parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    use_kd_tree = cKDTree is not None and not args.cell_list
+    if cKDTree is None and not args.cell_list:
+        print("scipy is not installed. Using the numpy cell list.")
+
+    start_time = time.perf_counter()
+    coordinates, connectivities = read_mesh(args.mesh_file)
+    print(f"Read {coordinates.shape[0]} nodes and {sum(c.shape[0] for c in connectivities)} elements in {time.perf_counter() - start_time:.2f} s")
+
+    results = {}
+    for scale_factor in args.scale_factors:
+        start_time = time.perf_counter()
+        radii = get_kernel_radii(coordinates, connectivities, scale_factor)
+        num_neighbors, support_sizes = count_neighbors(coordinates, radii, use_kd_tree)
+        summary = summarize(num_neighbors, args.np, args.bytes_per_neighbor)
+        summary['kernel_radius'] = {'min': float(radii.min()), 'mean': float(radii.mean()), 'max': float(radii.max())}
+        summary['max_support_size'] = int(support_sizes.max())
+        print_summary(scale_factor, summary, np.bincount(num_neighbors) if args.histogram else None)
+        print(f"    Kernel radius: min {radii.min():.4g}, mean {radii.mean():.4g}, max {radii.max():.4g}. Largest kernel support: {summary['max_support_size']} nodes")
+        print(f"    Time: {time.perf_counter() - start_time:.2f} s")
+        results[str(scale_factor)] = summary
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump({'mesh_file': args.mesh_file, 'num_procs': args.np, 'scale_factors': results}, file, indent=2)
@@ -0,0 +1,52 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# The mesh script lives next to the meshes it makes. gmsh and exodus.py are only needed to run it.
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', '..', 'tests', 'cylindrical_taylor_bar', 'mesh'))
+from gmsh_to_exo_cylinder import TET4_SIDES, get_face_sets, remap_to_compact
+
+
+class TestGmshToExoCylinder(unittest.TestCase):
+
+    def test_remap_to_compact(self):
+        # Tags out of order, with gaps and an unused node (tag 5)
+        node_tags = np.array([10, 3, 7, 5, 20])
+        coordinates = np.array([[10.0, 0, 0], [3.0, 0, 0], [7.0, 0, 0], [5.0, 0, 0], [20.0, 0, 0]])
+        element_node_tags = np.array([[3, 7, 10, 20], [20, 10, 7, 3]])
+        points, elements = remap_to_compact(node_tags, coordinates, element_node_tags)
+        np.testing.assert_array_equal(points[:, 0], [3.0, 7.0, 10.0, 20.0])
+        np.testing.assert_array_equal(elements, [[0, 1, 2, 3], [3, 2, 1, 0]])
+        # Each element still refers to the same coordinates
+        tag_rows = {tag: row for row, tag in enumerate(node_tags)}
+        for element, tags in zip(elements, element_node_tags):
+            np.testing.assert_array_equal(points[element], coordinates[[tag_rows[tag] for tag in tags]])
+
+    def test_get_face_sets(self):
+        # A pyramid split into two tets on the square at z = 0, and a tet with only an edge on it
+        points = np.array([[0.0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0.5, 0.5, 1], [0.5, -1, 0.5]])
+        elements = np.array([[0, 1, 4, 5], [4, 0, 3, 2], [0, 1, 2, 4]])
+        nodeset_nodes, sideset_elements, sideset_sides = get_face_sets(points, elements, 0.0)
+        np.testing.assert_array_equal(nodeset_nodes, [0, 1, 2, 3])
+        # Sorted by element. The faces on the plane are local nodes 1, 2, 3 (side 2) and 0, 1, 2 (side 4).
+        np.testing.assert_array_equal(sideset_elements, [1, 2])
+        np.testing.assert_array_equal(sideset_sides, [2, 4])
+        # The sides cover the square and point out of the positively oriented tets, down out of the bar
+        area = 0.0
+        for element, side in zip(sideset_elements, sideset_sides):
+            corners = points[elements[element]]
+            self.assertGreater(np.linalg.det(corners[1:] - corners[0]), 0.0)
+            a, b, c = corners[TET4_SIDES[side - 1]]
+            normal = np.cross(b - a, c - a)
+            self.assertLess(normal[2], 0.0)
+            area += 0.5 * np.linalg.norm(normal)
+        self.assertAlmostEqual(area, 1.0)
+        # Nothing on a plane no node is on
+        nodeset_nodes, sideset_elements, sideset_sides = get_face_sets(points, elements, 2.0)
+        self.assertEqual(nodeset_nodes.shape[0] + sideset_elements.shape[0] + sideset_sides.shape[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import unittest
+
+import numpy as np
+
+from rkpm_neighbors import cKDTree, count_neighbors, get_kernel_radii, read_mesh, summarize
+from regression_test import read_time_step
+
+# Regression test with kernel_radius_scale_factor 1.1 and the kernel_radius and num_neighbors outputs
+GOLD_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', '..', 'tests', 'cylindrical_taylor_bar', 'regression', 'rkpm', 'gold_results.exo')
+
+
+def make_hex_mesh(num_x, num_y, num_z, jitter=0.1, seed=0):
+    # Perturbed structured grid of hex elements, 0-based connectivity
+    rng = np.random.default_rng(seed)
+    grid = np.stack(np.meshgrid(np.arange(num_x + 1.0), np.arange(num_y + 1.0), np.arange(num_z + 1.0), indexing='ij'), axis=-1).reshape(-1, 3)
+    coordinates = grid + rng.uniform(-jitter, jitter, grid.shape)
+    node = np.arange(grid.shape[0]).reshape(num_x + 1, num_y + 1, num_z + 1)
+    corners = [node[i:i + num_x, j:j + num_y, k:k + num_z] for i, j, k in
+               [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]]
+    return coordinates, [np.stack([corner.reshape(-1) for corner in corners], axis=1)]
+
+
+class TestRkpmNeighbors(unittest.TestCase):
+
+    def test_backends_match_brute_force(self):
+        coordinates, connectivities = make_hex_mesh(6, 5, 4)
+        radii = get_kernel_radii(coordinates, connectivities, 1.1)
+        # Node i is a neighbor of node j if it is inside the kernel of node j
+        distances = np.linalg.norm(coordinates[:, None, :] - coordinates[None, :, :], axis=2)
+        inside = distances <= radii[None, :]
+        expected_neighbors = inside.sum(axis=1)
+        expected_support_sizes = inside.sum(axis=0)
+
+        backends = [False] + ([True] if cKDTree is not None else [])
+        for use_kd_tree in backends:
+            # Small chunks so the kernels are searched in several chunks
+            num_neighbors, support_sizes = count_neighbors(coordinates, radii, use_kd_tree, chunk_size=17)
+            np.testing.assert_array_equal(num_neighbors, expected_neighbors)
+            np.testing.assert_array_equal(support_sizes, expected_support_sizes)
+            self.assertEqual(summarize(num_neighbors)['total_pairs'], int(inside.sum()))
+
+    def test_gold_results(self):
+        coordinates, connectivities = read_mesh(GOLD_FILE)
+        gold = read_time_step(GOLD_FILE, 0)['nodal']
+        radii = get_kernel_radii(coordinates, connectivities, 1.1)
+        np.testing.assert_allclose(radii, gold['kernel_radius'], rtol=1e-12)
+        backends = [False] + ([True] if cKDTree is not None else [])
+        for use_kd_tree in backends:
+            num_neighbors, _support_sizes = count_neighbors(coordinates, radii, use_kd_tree)
+            np.testing.assert_array_equal(num_neighbors, gold['num_neighbors'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import numpy as np
+
+# Statistics for interleaved A/B benchmarking of two executables. Runs are done in pairs, each pair running
+# A and B back to back in a random order, so machine drift (thermal state, noisy neighbors) hits both alike.
+# Confidence intervals come from a paired bootstrap over the pairs.
+
+NUM_BOOTSTRAP = 10000
+
+def interleaved_schedule(num_pairs, seed=None):
+    # Order of the runs, e.g. ['A', 'B', 'B', 'A', ...]. Each consecutive pair holds one A and one B.
+    rng = np.random.default_rng(seed)
+    schedule = []
+    for _ in range(num_pairs):
+        schedule.extend(['A', 'B'] if rng.random() < 0.5 else ['B', 'A'])
+    return schedule
+
+def _bootstrap_pair_indices(num_pairs, num_bootstrap, seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, num_pairs, size=(num_bootstrap, num_pairs))
+
+def relative_change(a_values, b_values, confidence=0.95, num_bootstrap=NUM_BOOTSTRAP, seed=None):
+    # Relative change of B vs A in percent, 100 * (mean(B) / mean(A) - 1), with a confidence interval.
+    # Returns (estimate, lower, upper). Negative means B is lower (e.g. faster) than A.
+    a_values = np.asarray(a_values, dtype=float)
+    b_values = np.asarray(b_values, dtype=float)
+    estimate = 100.0 * (b_values.mean() / a_values.mean() - 1.0)
+    if a_values.shape[0] < 2:
+        return estimate, np.nan, np.nan
+    indices = _bootstrap_pair_indices(a_values.shape[0], num_bootstrap, seed)
+    ratios = 100.0 * (b_values[indices].mean(axis=1) / a_values[indices].mean(axis=1) - 1.0)
+    alpha = 1.0 - confidence
+    lower, upper = np.quantile(ratios, [alpha / 2.0, 1.0 - alpha / 2.0])
+    return estimate, lower, upper
+
+def difference(a_values, b_values, confidence=0.95, num_bootstrap=NUM_BOOTSTRAP, seed=None):
+    # Mean paired difference B - A, with a confidence interval. Returns (estimate, lower, upper).
+    differences = np.asarray(b_values, dtype=float) - np.asarray(a_values, dtype=float)
+    estimate = differences.mean()
+    if differences.shape[0] < 2:
+        return estimate, np.nan, np.nan
+    indices = _bootstrap_pair_indices(differences.shape[0], num_bootstrap, seed)
+    means = differences[indices].mean(axis=1)
+    alpha = 1.0 - confidence
+    lower, upper = np.quantile(means, [alpha / 2.0, 1.0 - alpha / 2.0])
+    return estimate, lower, upper
+
+def check_gate(upper, max_change_percent):
+    # Passes if B's change is confidently at most max_change_percent. E.g. -3 requires B to be at least 3% lower,
+    # 2 allows B to be up to 2% higher. Without a confidence interval (fewer than 2 pairs) the gate fails.
+    if np.isnan(upper):
+        return False
+    return upper <= max_change_percent
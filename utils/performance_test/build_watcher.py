@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+
+# Watches aperi-mech binaries by content hash so every new build gets a performance run. A build is only
+# picked up once its binary has stopped changing for settle_time seconds, and only the newest build is
+# picked up, so rapid rebuilds (or rebuilds during a run) are coalesced into one run.
+
+HASH_CHUNK_SIZE = 1 << 20
+
+def file_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def get_version(path):
+    try:
+        return subprocess.run([path, '--version'], capture_output=True, text=True, timeout=60).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        return ''
+
+def machine_is_idle(max_load):
+    # 1 minute load average per core
+    return os.getloadavg()[0] / os.cpu_count() <= max_load
+
+def snapshot_binary(path, digest, snapshot_dir):
+    # Copy of the binary to benchmark, so a rebuild during the run doesn't change it. Keeps the
+    # <build type>/aperi-mech layout, so the copy's directory can be used as the build directory.
+    build_dir = os.path.join(snapshot_dir, digest[:16])
+    snapshot_path = os.path.join(build_dir, os.path.basename(os.path.dirname(path)), os.path.basename(path))
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    shutil.copy2(path, snapshot_path)
+    return build_dir, snapshot_path
+
+class BuildWatcher:
+
+    def __init__(self, binaries, state_file, settle_time=60.0):
+        # binaries: {hardware: path}, e.g. {'cpu': '.../Release/aperi-mech', 'gpu': '.../Release_gpu/aperi-mech'}
+        self.binaries = binaries
+        self.state_file = state_file
+        self.settle_time = settle_time
+        # Hash of the last build benchmarked for each binary
+        self.benchmarked = {}
+        if os.path.exists(state_file):
+            with open(state_file, 'r') as file:
+                self.benchmarked = json.load(file)
+        # (stat key, time it was first seen) of each binary, and the hash of each stat key
+        self.last_seen = {}
+        self.hashes = {}
+
+    def poll(self, now=None):
+        # Builds that are ready to benchmark, as a list of (hardware, path, hash)
+        now = time.monotonic() if now is None else now
+        ready = []
+        for hardware, path in self.binaries.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            if hardware not in self.last_seen or self.last_seen[hardware][0] != key:
+                # Still being written or relinked. Wait for it to settle.
+                self.last_seen[hardware] = (key, now)
+                if self.settle_time > 0:
+                    continue
+            if now - self.last_seen[hardware][1] < self.settle_time:
+                continue
+            if key not in self.hashes:
+                self.hashes[key] = file_hash(path)
+            digest = self.hashes[key]
+            if self.benchmarked.get(hardware) != digest:
+                ready.append((hardware, path, digest))
+        return ready
+
+    def mark_benchmarked(self, hardware, digest):
+        self.benchmarked[hardware] = digest
+        with open(self.state_file, 'w') as file:
+            json.dump(self.benchmarked, file, indent=2)
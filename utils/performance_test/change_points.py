@@ -0,0 +1,205 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Change-point detection over the performance history. Each runtime_*.csv history (one per test directory, machine,
+# executable and number of processors) is split into segments of constant mean runtime and peak memory with PELT.
+# A run of small slowdowns that each pass the gold tolerance still shows up as shifts, along with the run and
+# executable version that introduced each one, and the total drift since the gold run can be gated.
+
+METRICS = {
+    'runtime': 'Average Runtime (s)',
+    'peak_memory': 'Peak Memory (MB)',
+}
+PENALTY = 3.0  # cost of a change point, times noise variance x log(number of runs)
+MIN_SEGMENT_SIZE = 2  # so a single outlier run isn't a segment of its own
+CONFIRM_RUNS = 3  # runs after a shift before it is confirmed
+MIN_SHIFT_PERCENT = 0.5  # shifts smaller than this are merged into their neighbors
+
+def estimate_noise(values):
+    # Standard deviation of the run to run noise, from the median absolute difference of consecutive runs.
+    # Shifts only affect a few of the differences, so they don't inflate it.
+    differences = np.abs(np.diff(values))
+    if differences.shape[0] == 0:
+        return 0.0
+    return 1.4826 * np.median(differences) / np.sqrt(2.0)
+
+def pelt(values, penalty, min_size=MIN_SEGMENT_SIZE):
+    # Optimal partition of values into segments of constant mean (least squares cost plus penalty per change point),
+    # with PELT pruning. Returns the start index of each segment after the first.
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    sums = np.concatenate([[0.0], np.cumsum(values)])
+    squares = np.concatenate([[0.0], np.cumsum(values**2)])
+
+    def cost(start, end):
+        # Sum of squared deviations from the mean of values[start:end]
+        return squares[end] - squares[start] - (sums[end] - sums[start])**2 / (end - start)
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last_change = np.zeros(n + 1, dtype=int)
+    candidates = [0]
+    for end in range(min_size, n + 1):
+        valid = [start for start in candidates if end - start >= min_size]
+        totals = [best[start] + cost(start, end) + penalty for start in valid]
+        index = int(np.argmin(totals))
+        best[end] = totals[index]
+        last_change[end] = valid[index]
+        # Starts that can never beat the best are dropped
+        candidates = [start for start, total in zip(valid, totals) if total - penalty <= best[end]] + [start for start in candidates if end - start < min_size]
+        candidates.append(end - min_size + 1)
+    change_points = []
+    end = n
+    while end > 0:
+        end = last_change[end]
+        if end > 0:
+            change_points.append(int(end))
+    return sorted(change_points)
+
+def _merge_small_shifts(values, bounds, min_shift_percent):
+    # Drops the smallest shift under min_shift_percent until there are none, so statistically real but
+    # negligible shifts don't count
+    while len(bounds) > 2:
+        means = [values[start:end].mean() for start, end in zip(bounds[:-1], bounds[1:])]
+        changes = [abs(100.0 * (after / before - 1.0)) for before, after in zip(means[:-1], means[1:])]
+        index = int(np.argmin(changes))
+        if changes[index] >= min_shift_percent:
+            break
+        del bounds[index + 1]
+    return bounds
+
+def detect_shifts(values, penalty=PENALTY, min_size=MIN_SEGMENT_SIZE, confirm_runs=CONFIRM_RUNS, min_shift_percent=MIN_SHIFT_PERCENT):
+    # Segments of the history, as dicts with the start and end (exclusive) run index, mean and, from the second
+    # segment on, the percent change from the one before and whether enough runs followed to confirm it
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    if n < 2 * min_size:
+        return [{'start': 0, 'end': n, 'mean': float(values.mean()) if n else np.nan}]
+    # A floor on the noise, so a perfectly repeatable history doesn't turn every rounding difference into a shift
+    noise = max(estimate_noise(values), 1e-4 * abs(np.median(values)), np.finfo(float).tiny)
+    change_points = pelt(values, penalty * noise**2 * np.log(n), min_size)
+    bounds = _merge_small_shifts(values, [0] + change_points + [n], min_shift_percent)
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        segment = {'start': start, 'end': end, 'mean': float(values[start:end].mean())}
+        if segments:
+            segment['change_percent'] = 100.0 * (segment['mean'] / segments[-1]['mean'] - 1.0)
+            segment['confirmed'] = bool(end - start >= confirm_runs)
+        segments.append(segment)
+    return segments
+
+def cumulative_change(segments, reference_run):
+    # Percent change of the last confirmed segment from the segment holding the reference (e.g. gold) run
+    reference = next(segment for segment in segments if segment['start'] <= reference_run < segment['end'])
+    confirmed = [segment for segment in segments if segment['start'] <= reference_run or segment.get('confirmed')]
+    return 100.0 * (confirmed[-1]['mean'] / reference['mean'] - 1.0)
+
+def read_history(runtime_file):
+    df = pd.read_csv(runtime_file)
+    df['Timestamp'] = pd.to_datetime(df['Date'].astype(str) + ' ' + df['Time'].astype(str), errors='coerce')
+    df = df.sort_values(by='Timestamp', kind='stable').reset_index(drop=True)
+    return df
+
+def analyze_history(df, penalty=PENALTY, min_size=MIN_SEGMENT_SIZE, confirm_runs=CONFIRM_RUNS, min_shift_percent=MIN_SHIFT_PERCENT):
+    # Shifts in each metric, with the run that introduced them, and the cumulative change since the last gold run
+    # (or the first run if there is none)
+    results = {}
+    gold = np.nonzero(df['Platform Gold Standard'].astype(str).str.lower().to_numpy() == 'true')[0]
+    for metric, column in METRICS.items():
+        if column not in df.columns:
+            continue
+        runs = df[df[column].notna() & (df[column] > 0)]
+        if runs.empty:
+            continue
+        values = runs[column].to_numpy(dtype=float)
+        segments = detect_shifts(values, penalty, min_size, confirm_runs, min_shift_percent)
+        shifts = []
+        for segment in segments[1:]:
+            run = runs.iloc[segment['start']]
+            previous_run = runs.iloc[segment['start'] - 1]
+            shifts.append({
+                'run': segment['start'],
+                'date': str(run['Timestamp']),
+                'executable_info': str(run.get('Executable Info', '')),
+                'previous_executable_info': str(previous_run.get('Executable Info', '')),
+                'before': segments[segments.index(segment) - 1]['mean'],
+                'after': segment['mean'],
+                'change_percent': segment['change_percent'],
+                'confirmed': segment['confirmed'],
+            })
+        # Index of the last gold run among the runs with a value
+        gold_runs = np.nonzero(np.isin(runs.index.to_numpy(), gold))[0]
+        reference_run = int(gold_runs[-1]) if gold_runs.shape[0] else 0
+        results[metric] = {
+            'num_runs': int(values.shape[0]),
+            'shifts': shifts,
+            'reference_date': str(runs.iloc[reference_run]['Timestamp']),
+            'cumulative_change_percent': cumulative_change(segments, reference_run),
+        }
+    return results
+
+def check_budget(results, budgets):
+    # Metrics whose confirmed increase since the reference run is over the budget (percent), as messages
+    failures = []
+    for metric, budget in budgets.items():
+        if budget is not None and metric in results and results[metric]['cumulative_change_percent'] > budget:
+            failures.append(f"{metric} is up {results[metric]['cumulative_change_percent']:.2f}% since {results[metric]['reference_date']}, over the budget of {budget}%")
+    return failures
+
+def find_histories(paths):
+    # runtime_*.csv files in the given files and directories (searched recursively)
+    runtime_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            runtime_files.extend(sorted(glob.glob(os.path.join(path, '**', 'runtime_*.csv'), recursive=True)))
+        else:
+            runtime_files.append(path)
+    return runtime_files
+
+def print_results(runtime_file, results):
+    print(runtime_file)
+    for metric, result in results.items():
+        print(f"  {metric}: {result['num_runs']} runs, {result['cumulative_change_percent']:+.2f}% since {result['reference_date']}")
+        for shift in result['shifts']:
+            status = 'confirmed' if shift['confirmed'] else 'unconfirmed'
+            print(f"    {shift['date']}: {shift['before']:.4g} -> {shift['after']:.4g} ({shift['change_percent']:+.2f}%, {status})")
+            print(f"      introduced by: {shift['executable_info']}")
+            print(f"      previous run:  {shift['previous_executable_info']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Find the shifts in runtime and peak memory over the performance history (runtime_*.csv files).')
+    parser.add_argument('paths', type=str, nargs='+', help='History files, or directories to search for runtime_*.csv files')
+    parser.add_argument('--penalty', type=float, default=PENALTY, help='Cost of a change point, times the noise variance and log(number of runs). Higher finds fewer shifts.')
+    parser.add_argument('--min-segment-size', dest='min_segment_size', type=int, default=MIN_SEGMENT_SIZE, help='Fewest runs between shifts')
+    parser.add_argument('--confirm-runs', dest='confirm_runs', type=int, default=CONFIRM_RUNS, help='Runs after a shift before it is confirmed and counts towards the budget')
+    parser.add_argument('--min-shift', dest='min_shift', type=float, default=MIN_SHIFT_PERCENT, help='Smallest shift in percent that is reported')
+    parser.add_argument('--runtime-budget', dest='runtime_budget', type=float, default=None, help='Fail if the confirmed runtime increase since the gold run is over this percent')
+    parser.add_argument('--memory-budget', dest='memory_budget', type=float, default=None, help='Fail if the confirmed peak memory increase since the gold run is over this percent')
+    parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    budgets = {'runtime': args.runtime_budget, 'peak_memory': args.memory_budget}
+    all_results = {}
+    failures = []
+    for runtime_file in find_histories(args.paths):
+        results = analyze_history(read_history(runtime_file), args.penalty, args.min_segment_size, args.confirm_runs, args.min_shift)
+        print_results(runtime_file, results)
+        all_results[runtime_file] = results
+        failures.extend(f"{runtime_file}: {failure}" for failure in check_budget(results, budgets))
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(all_results, file, indent=2)
+
+    if failures:
+        for failure in failures:
+            print(failure)
+        print("\033[91mFAIL\033[0m")
+        sys.exit(1)
+    print("\033[92mPASS\033[0m")
+    sys.exit(0)
@@ -0,0 +1,275 @@
+import argparse
+import csv
+import datetime
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import time
+import numpy as np
+import yaml
+from change_points import find_histories
+
+# Static HTML dashboard of all the performance histories (runtime_*.csv), one section per test directory,
+# machine, hardware and number of processors. The parsed histories are cached next to the page with the byte
+# offset read up to, so a rebuild only parses the rows appended since the last one. Long histories are downsampled
+# with LTTB (largest triangle three buckets) so the page stays light, and the latest run of each history is
+# flagged if it is over the gold by more than the tolerance in performance.yaml.
+
+MAX_POINTS = 400  # points drawn per chart
+DEFAULT_TOLERANCE_PERCENT = 3.0  # performance_test.py defaults
+CACHE_VERSION = 1
+SERIES = {
+    'runtime': 'Average Runtime (s)',
+    'peak_memory': 'Peak Memory (MB)',
+}
+HISTORY_NAME = re.compile(r'runtime_(?P<machine>.*)_(?P<build>Release(?:_gpu)?)_aperi-mech_num_procs_(?P<num_procs>\d+)(?:_io_(?P<io_mode>[a-z]+))?(?:_launcher_(?P<launcher>[\w-]+))?\.csv$')
+
+def lttb(x, y, num_out):
+    # Indices of num_out points that keep the shape of the (x, y) line, always including the first and last
+    n = x.shape[0]
+    if num_out >= n or num_out < 3:
+        return np.arange(n)
+    # num_out - 2 buckets between the first and last points
+    bucket_edges = np.linspace(1, n - 1, num_out - 1).astype(int)
+    bucket_sizes = np.diff(np.append(bucket_edges, n))
+    # Averages of each bucket, and of the last point after the last bucket
+    x_averages = np.add.reduceat(x[1:], bucket_edges - 1) / bucket_sizes
+    y_averages = np.add.reduceat(y[1:], bucket_edges - 1) / bucket_sizes
+    indices = np.zeros(num_out, dtype=int)
+    indices[-1] = n - 1
+    previous = 0
+    for i in range(num_out - 2):
+        start, end = bucket_edges[i], bucket_edges[i + 1]
+        next_x, next_y = x_averages[i + 1], y_averages[i + 1]
+        # Point of this bucket making the largest triangle with the previous point and the next bucket's average
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[i + 1] = previous
+    return indices
+
+def _parse_rows(text, columns):
+    # (timestamp, runtime, peak memory, gold, executable info) of each complete row
+    index = {name: columns.index(name) for name in ['Date', 'Time', 'Platform Gold Standard'] + list(SERIES.values()) if name in columns}
+    info_index = columns.index('Executable Info') if 'Executable Info' in columns else None
+    rows = []
+    for row in csv.reader(io.StringIO(text)):
+        if len(row) < len(columns):
+            continue
+        try:
+            timestamp = datetime.datetime.fromisoformat(f"{row[index['Date']]} {row[index['Time']]}").timestamp()
+        except ValueError:
+            continue
+        values = []
+        for column in SERIES.values():
+            try:
+                values.append(float(row[index[column]]) if column in index else None)
+            except ValueError:
+                values.append(None)
+        gold = row[index['Platform Gold Standard']].strip().lower() == 'true' if 'Platform Gold Standard' in index else False
+        rows.append([timestamp] + values + [gold, row[info_index] if info_index is not None else ''])
+    return rows
+
+def update_history(runtime_file, cached):
+    # Cached history of runtime_file, reading only what was appended since it was cached. The whole file is
+    # read again if it was rewritten, e.g. when the gold row moved.
+    with open(runtime_file, 'rb') as file:
+        header = file.readline()
+        if cached is not None and cached['header'] == header.decode(errors='replace'):
+            tail = cached['tail'].encode()
+            file.seek(max(cached['offset'] - len(tail), 0))
+            if file.read(len(tail)) == tail:
+                new_bytes = file.read()
+                return _append(cached, new_bytes)
+        file.seek(len(header))
+        new_bytes = file.read()
+    columns = next(csv.reader([header.decode(errors='replace')]))
+    history = {'header': header.decode(errors='replace'), 'columns': columns, 'offset': len(header), 'tail': '', 'rows': []}
+    return _append(history, new_bytes)
+
+def _append(history, new_bytes):
+    # Only complete lines are parsed. A partly written last line is read on the next update.
+    complete = new_bytes[:new_bytes.rfind(b'\n') + 1]
+    if not complete:
+        return history
+    history['rows'].extend(_parse_rows(complete.decode(errors='replace'), history['columns']))
+    history['offset'] += len(complete)
+    last_line_start = complete.rfind(b'\n', 0, len(complete) - 1) + 1
+    history['tail'] = complete[last_line_start:].decode(errors='replace')
+    return history
+
+def get_tolerances(runtime_file):
+    # Runtime and memory tolerances (percent) of the test in the performance.yaml next to the history
+    tolerances = {'runtime': DEFAULT_TOLERANCE_PERCENT, 'peak_memory': DEFAULT_TOLERANCE_PERCENT}
+    match = HISTORY_NAME.search(os.path.basename(runtime_file))
+    yaml_file = os.path.join(os.path.dirname(runtime_file), 'performance.yaml')
+    if match is None or not os.path.exists(yaml_file):
+        return tolerances
+    hardware = 'gpu' if match.group('build') == 'Release_gpu' else 'cpu'
+    with open(yaml_file, 'r') as file:
+        yaml_node = yaml.safe_load(file)
+    for test_config in yaml_node.get('tests', []):
+        if test_config.get('hardware') == hardware and int(test_config.get('num_processors', 0)) == int(match.group('num_procs')):
+            tolerances['runtime'] = test_config.get('runtime_tolerance_percent', tolerances['runtime'])
+            tolerances['peak_memory'] = test_config.get('memory_tolerance_percent', tolerances['peak_memory'])
+    return tolerances
+
+def summarize(rows, tolerances):
+    # Latest and gold values of each series, and whether the latest is over the gold by more than the tolerance
+    summary = {}
+    gold_rows = [row for row in rows if row[3]]
+    for i, metric in enumerate(SERIES, start=1):
+        values = [row for row in rows if row[i] is not None and row[i] > 0]
+        if not values:
+            continue
+        latest = values[-1][i]
+        gold = next((row[i] for row in reversed(gold_rows) if row[i] is not None and row[i] > 0), None)
+        change = 100.0 * (latest / gold - 1.0) if gold else None
+        summary[metric] = {'latest': latest, 'gold': gold, 'change_percent': change,
+                           'regressed': change is not None and change > tolerances[metric], 'tolerance': tolerances[metric]}
+    return summary
+
+def _svg_chart(rows, column, summary, max_points, width=560, height=150, margin=40):
+    points = [(row[0], row[column]) for row in rows if row[column] is not None and row[column] > 0]
+    if not points:
+        return '<p>No data</p>'
+    x = np.array([point[0] for point in points])
+    y = np.array([point[1] for point in points])
+    keep = lttb(x, y, max_points)
+    gold = summary['gold']
+    y_values = np.concatenate([y[keep], [gold * (1.0 + summary['tolerance'] / 100.0)] if gold else []])
+    y_min, y_max = y_values.min(), y_values.max()
+    y_range = (y_max - y_min) or abs(y_max) or 1.0
+    x_range = (x.max() - x.min()) or 1.0
+
+    def to_svg(px, py):
+        return margin + (px - x.min()) / x_range * (width - 2 * margin), height - margin / 2 - (py - y_min + 0.05 * y_range) / (1.1 * y_range) * (height - margin)
+
+    line = ' '.join(f'{sx:.1f},{sy:.1f}' for sx, sy in (to_svg(x[i], y[i]) for i in keep))
+    parts = [f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">',
+             f'<text x="2" y="12" font-size="10">{y_max:.4g}</text><text x="2" y="{height - margin / 2}" font-size="10">{y_min:.4g}</text>',
+             f'<polyline fill="none" stroke="#333" stroke-width="1" points="{line}"/>']
+    if gold:
+        _gx, limit_y = to_svg(x.min(), gold * (1.0 + summary['tolerance'] / 100.0))
+        parts.append(f'<line x1="{margin}" x2="{width - margin}" y1="{limit_y:.1f}" y2="{limit_y:.1f}" stroke="#c00" stroke-dasharray="4"><title>gold + {summary["tolerance"]}%</title></line>')
+    for row in rows:
+        if row[3] and row[column] is not None and row[column] > 0:
+            gx, gy = to_svg(row[0], row[column])
+            parts.append(f'<circle cx="{gx:.1f}" cy="{gy:.1f}" r="3" fill="#2a2"><title>gold {row[column]:.4g}</title></circle>')
+    lx, ly = to_svg(x[-1], y[-1])
+    color = '#c00' if summary['regressed'] else '#06c'
+    parts.append(f'<circle cx="{lx:.1f}" cy="{ly:.1f}" r="4" fill="{color}"><title>latest {y[-1]:.4g}</title></circle>')
+    date_format = '%Y-%m-%d'
+    parts.append(f'<text x="{margin}" y="{height - 2}" font-size="10">{datetime.datetime.fromtimestamp(x.min()).strftime(date_format)}</text>')
+    parts.append(f'<text x="{width - margin}" y="{height - 2}" font-size="10" text-anchor="end">{datetime.datetime.fromtimestamp(x.max()).strftime(date_format)}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+def render_section(history_id, name, history, summary, max_points=MAX_POINTS):
+    parts = [f'<section id="{history_id}"><h3>{html.escape(name)}</h3>']
+    latest_info = history['rows'][-1][4] if history['rows'] else ''
+    parts.append(f'<p>Latest executable: {html.escape(latest_info)}</p>')
+    for column, metric in enumerate(SERIES, start=1):
+        if metric in summary:
+            parts.append(f'<div>{html.escape(SERIES[metric])}<br>{_svg_chart(history["rows"], column, summary[metric], max_points)}</div>')
+    parts.append('</section>')
+    return '\n'.join(parts)
+
+def _summary_cells(metric):
+    if metric is None:
+        return '<td></td><td></td><td></td>'
+    change = '' if metric['change_percent'] is None else f"{metric['change_percent']:+.2f}%"
+    style = ' class="regressed"' if metric['regressed'] else ''
+    gold = '' if metric['gold'] is None else f"{metric['gold']:.4g}"
+    return f"<td>{metric['latest']:.4g}</td><td>{gold}</td><td{style}>{change}</td>"
+
+def is_regressed(summary):
+    return any(metric['regressed'] for metric in summary.values())
+
+def render(entries):
+    # The dashboard page from the cached entry of each history. Regressed histories are listed first.
+    entries = sorted(entries, key=lambda entry: (not is_regressed(entry['summary']), entry['name']))
+    num_regressed = sum(1 for entry in entries if is_regressed(entry['summary']))
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>aperi-mech performance</title><style>',
+             'body{font-family:sans-serif;font-size:13px} table{border-collapse:collapse} td,th{border:1px solid #ccc;padding:2px 6px}',
+             '.regressed{background:#fcc} section{margin:16px 0} h3{margin:4px 0}</style></head><body>',
+             f'<h1>aperi-mech performance</h1><p>{len(entries)} histories, {num_regressed} regressed. Built {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}.</p>',
+             '<table><tr><th>History</th><th>Runs</th><th>Runtime (s)</th><th>Gold</th><th>Change</th><th>Peak Memory (MB)</th><th>Gold</th><th>Change</th></tr>']
+    for entry in entries:
+        summary = entry['summary']
+        parts.append(f'<tr><td><a href="#{entry["id"]}">{html.escape(entry["name"])}</a></td><td>{entry["num_rows"]}</td>'
+                     f'{_summary_cells(summary.get("runtime"))}{_summary_cells(summary.get("peak_memory"))}</tr>')
+    parts.append('</table>')
+    parts.extend(entry['section'] for entry in entries)
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+def build_dashboard(paths, output_file, cache_dir=None, max_points=MAX_POINTS):
+    # Updates the cache and writes the page. Returns the number of histories with a regression.
+    # The cache keeps the parsed rows of each history in its own file, and an index with the rendered section of
+    # each history and the size and modification time of its file. Only the histories that changed are parsed
+    # (from where the last build stopped) and drawn again.
+    cache_dir = cache_dir if cache_dir is not None else output_file + '.cache'
+    os.makedirs(cache_dir, exist_ok=True)
+    index_file = os.path.join(cache_dir, 'index.json')
+    index = {}
+    if os.path.exists(index_file):
+        with open(index_file, 'r') as file:
+            index = json.load(file)
+        if index.get('version') != CACHE_VERSION:
+            index = {}
+    cached_entries = index.get('histories', {})
+
+    runtime_files = [os.path.abspath(runtime_file) for runtime_file in find_histories(paths)]
+    # Histories are named by their path from the searched directories
+    search_dirs = [os.path.abspath(path if os.path.isdir(path) else os.path.dirname(path)) for path in paths]
+    root_dir = os.path.commonpath(search_dirs) if search_dirs else '.'
+    entries = {}
+    for runtime_file in runtime_files:
+        file_stat = os.stat(runtime_file)
+        tolerances = get_tolerances(runtime_file)
+        name = os.path.relpath(runtime_file, root_dir)
+        entry = cached_entries.get(runtime_file)
+        if (entry is not None and entry['size'] == file_stat.st_size and entry['mtime'] == file_stat.st_mtime
+                and entry['tolerances'] == tolerances and entry['max_points'] == max_points and entry['name'] == name):
+            entries[runtime_file] = entry
+            continue
+        history_id = 'h' + hashlib.sha1(runtime_file.encode()).hexdigest()[:16]
+        rows_file = os.path.join(cache_dir, history_id + '.json')
+        history = None
+        if entry is not None and os.path.exists(rows_file):
+            with open(rows_file, 'r') as file:
+                history = json.load(file)
+        history = update_history(runtime_file, history)
+        with open(rows_file, 'w') as file:
+            json.dump(history, file)
+        summary = summarize(history['rows'], tolerances)
+        entries[runtime_file] = {'id': history_id, 'name': name, 'size': file_stat.st_size, 'mtime': file_stat.st_mtime, 'tolerances': tolerances,
+                                 'max_points': max_points, 'num_rows': len(history['rows']), 'summary': summary,
+                                 'section': render_section(history_id, name, history, summary, max_points)}
+
+    # Histories that are gone
+    for runtime_file, entry in cached_entries.items():
+        if runtime_file not in entries:
+            rows_file = os.path.join(cache_dir, entry['id'] + '.json')
+            if os.path.exists(rows_file):
+                os.remove(rows_file)
+    with open(index_file, 'w') as file:
+        json.dump({'version': CACHE_VERSION, 'histories': entries}, file)
+    with open(output_file, 'w') as file:
+        file.write(render(list(entries.values())))
+    return sum(1 for entry in entries.values() if is_regressed(entry['summary']))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build a static HTML dashboard of the performance histories (runtime_*.csv files).')
+    parser.add_argument('paths', type=str, nargs='+', help='History files, or directories to search for runtime_*.csv files')
+    parser.add_argument('--output', type=str, default='dashboard.html', help='HTML file to write')
+    parser.add_argument('--cache', type=str, default=None, help='Directory for the cache of the parsed histories. Defaults to <output>.cache.')
+    parser.add_argument('--max-points', dest='max_points', type=int, default=MAX_POINTS, help='Points drawn per chart. Longer histories are downsampled.')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    num_regressed = build_dashboard(args.paths, args.output, args.cache, args.max_points)
+    print(f"Wrote {args.output} in {time.perf_counter() - start_time:.3f} s. {num_regressed} histories regressed.")
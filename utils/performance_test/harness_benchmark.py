@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+# script directory
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(script_dir+os.sep+'..')
+from regression_test import RegressionTest, get_session_launcher
+
+# Benchmark of the harness itself. Runs harness_stub.py, whose runtime and memory profile are known, through
+# RegressionTest like aperi-mech and compares what the harness measured with what the stub reports it did:
+#   timing_error: run_time measured by the harness minus the wall time of the slowest rank (s). Includes the
+#       mpirun launch and interpreter start up, so it is the fixed cost added to every measured runtime.
+#   memory_error: peak memory measured by the harness relative to the summed high water marks of the stub
+#       processes (percent). Includes the launcher. Goes negative when short spikes are missed between samples.
+#   overhead: CPU time of the harness process per second of run time per stub process (percent of a core)
+# The results are stored in a history with a gold row and gated like any other performance test, so a change
+# to the harness that shifts the numbers it produces can't go unnoticed.
+
+STUB_PATH = os.path.join(script_dir, 'harness_stub.py')
+METRICS = {
+    'timing_error': 'Timing Error (s)',
+    'memory_error': 'Memory Error (%)',
+    'overhead': 'Overhead (% of a core per process)',
+}
+
+def get_scenarios(num_procs):
+    # Stub arguments and number of ranks of each scenario
+    return {
+        'sleep': {'num_procs': 1, 'args': ['--sleep', '1.0']},
+        'cpu': {'num_procs': 1, 'args': ['--cpu', '1.0']},
+        'steady_rss': {'num_procs': 1, 'args': ['--rss', '200', '--sleep', '0.5']},
+        'spike': {'num_procs': 1, 'args': ['--rss', '50', '--spike', '200', '--spike-duration', '0.05', '--sleep', '0.5']},
+        'ranks': {'num_procs': num_procs, 'args': ['--rss', '50', '--children', '2', '--sleep', '1.0']},
+    }
+
+def read_reports(report_dir):
+    reports = []
+    for report_file in sorted(glob.glob(os.path.join(report_dir, 'report_*.json'))):
+        with open(report_file, 'r') as file:
+            reports.append(json.load(file))
+    return reports
+
+def compare(stats, reports):
+    # Errors of the harness's measurements against the stub's reports, and its CPU overhead per stub process
+    wall_time = max(report['wall_time'] for report in reports)
+    true_peak_memory = sum(report['max_rss'] for report in reports)
+    return {
+        'timing_error': stats['run_time'] - wall_time,
+        'memory_error': 100.0 * (stats['peak_memory'] / true_peak_memory - 1.0),
+        'overhead': 100.0 * stats['harness_cpu_time'] / stats['run_time'] / len(reports),
+    }
+
+def run_scenario(name, scenario, num_runs):
+    # Mean of each metric over num_runs runs of the scenario
+    results = []
+    for run in range(num_runs):
+        with tempfile.TemporaryDirectory() as working_dir:
+            command_args = scenario['args'] + ['--report-dir', working_dir]
+            regression_test = RegressionTest(f'harness_{name}_{run}', STUB_PATH, scenario['num_procs'], command_args, working_dir=working_dir)
+            start_usage = resource.getrusage(resource.RUSAGE_SELF)
+            return_code, stats = asyncio.run(regression_test.run_async())
+            end_usage = resource.getrusage(resource.RUSAGE_SELF)
+            if return_code != 0:
+                raise RuntimeError(f"The harness stub failed in scenario {name} with return code {return_code}")
+            stats['harness_cpu_time'] = (end_usage.ru_utime - start_usage.ru_utime) + (end_usage.ru_stime - start_usage.ru_stime)
+            results.append(compare(stats, read_reports(working_dir)))
+    return {metric: float(np.mean([result[metric] for result in results])) for metric in METRICS}
+
+def get_columns(scenario_names):
+    return ['Date', 'Time'] + [f'{name} {column}' for name in scenario_names for column in METRICS.values()] + ['Machine', 'Platform Gold Standard']
+
+def _scenario_columns(name):
+    return [f'{name} {column}' for column in METRICS.values()]
+
+def get_scenario_names(columns):
+    # Scenarios that have columns in a history
+    suffix = ' ' + METRICS['timing_error']
+    return [column[:-len(suffix)] for column in columns if column.endswith(suffix)]
+
+def get_gold(history_file, scenario_names):
+    # {scenario: {metric: value}} from the last gold row of each scenario, with nan for scenarios without one.
+    # None if there is no gold row at all. Runs of a subset of the scenarios leave the others empty, so the gold
+    # of a scenario can be in an older row than the gold of another.
+    if not os.path.exists(history_file):
+        return None
+    df = pd.read_csv(history_file)
+    df = df[df['Platform Gold Standard'].astype(str).str.lower() == 'true']
+    if df.empty:
+        return None
+    gold = {}
+    for name in scenario_names:
+        columns = _scenario_columns(name)
+        rows = df[df[columns].notna().all(axis=1)] if all(column in df.columns for column in columns) else df.iloc[:0]
+        gold[name] = {metric: (rows.iloc[-1][f'{name} {column}'] if not rows.empty else np.nan) for metric, column in METRICS.items()}
+    return gold
+
+def add_to_csv(history_file, results, updated):
+    # Columns of the scenarios that aren't in this run are kept, and so are the gold rows that still hold their gold
+    if os.path.exists(history_file):
+        df = pd.read_csv(history_file)
+        scenario_names = get_scenario_names(df.columns)
+        columns = get_columns(scenario_names + [name for name in results if name not in scenario_names])
+        if list(df.columns) != columns or updated:
+            df = df.reindex(columns=columns)
+            if updated:
+                other_columns = [column for name in scenario_names if name not in results for column in _scenario_columns(name)]
+                superseded = ~df[other_columns].notna().any(axis=1) if other_columns else True
+                df.loc[(df['Platform Gold Standard'].astype(str).str.lower() == 'true') & superseded, 'Platform Gold Standard'] = False
+            df.to_csv(history_file, index=False)
+    else:
+        columns = get_columns(list(results))
+        pd.DataFrame(columns=columns).to_csv(history_file, index=False)
+    now = datetime.datetime.now()
+    row = {'Date': now.date(), 'Time': now.time(), 'Machine': platform.processor(), 'Platform Gold Standard': updated}
+    for name, result in results.items():
+        for metric, column in METRICS.items():
+            row[f'{name} {column}'] = result[metric]
+    pd.DataFrame([row], columns=columns).to_csv(history_file, mode='a', header=False, index=False)
+
+def check_against_gold(results, gold, tolerances):
+    # Messages for the metrics that moved from the gold by more than their tolerance. tolerances is in the units
+    # of each metric. The timing error and overhead only fail when they grow, the memory error either way. A
+    # scenario without a gold value fails too, since it would otherwise never be gated.
+    failures = []
+    for name, result in results.items():
+        for metric, value in result.items():
+            gold_value = gold.get(name, {}).get(metric, np.nan)
+            if np.isnan(gold_value):
+                failures.append(f"{name} {METRICS[metric]}: {value:.4g}, no gold value. Run with --update-baseline to record one.")
+                continue
+            change = value - gold_value
+            if metric == 'memory_error':
+                change = abs(change)
+            if change > tolerances[metric]:
+                failures.append(f"{name} {METRICS[metric]}: {value:.4g}, gold {gold_value:.4g}, tolerance {tolerances[metric]}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the accuracy and overhead of the harness measurements with a stub executable.')
+    parser.add_argument('--n', type=int, default=3, help='Number of runs of each scenario')
+    parser.add_argument('--np', type=int, default=2, help='Number of ranks for the multi-rank scenario')
+    parser.add_argument('--scenarios', type=str, nargs='+', default=None, help='Scenarios to run. Defaults to all.')
+    parser.add_argument('--timing-tolerance', dest='timing_tolerance', type=float, default=0.1, help='Allowed increase of the timing error over the gold (s)')
+    parser.add_argument('--memory-tolerance', dest='memory_tolerance', type=float, default=5.0, help='Allowed change of the memory error from the gold (percentage points)')
+    parser.add_argument('--overhead-tolerance', dest='overhead_tolerance', type=float, default=5.0, help='Allowed increase of the overhead over the gold (percentage points)')
+    parser.add_argument('--csv', dest='csv', action='store_true', default=False, help='Save the results to the "harness_benchmark_*.csv" file')
+    parser.add_argument('--update-baseline', dest='update_baseline', action='store_true', default=False, help='Make these results the gold standard')
+    args = parser.parse_args()
+
+    scenarios = get_scenarios(args.np)
+    if args.scenarios is not None:
+        unknown = [name for name in args.scenarios if name not in scenarios]
+        if unknown:
+            parser.error(f"Unknown scenarios: {', '.join(unknown)}. Options: {', '.join(scenarios)}")
+        scenarios = {name: scenarios[name] for name in args.scenarios}
+
+    machine_info = [platform.node(), platform.system(), platform.processor()]
+    history_file = 'harness_benchmark_' + '_'.join(machine_info) + '_num_procs_' + str(args.np)
+    # Runs under a DVM have their own gold
+    launcher_name = get_session_launcher().name
+    if launcher_name != 'mpirun':
+        history_file += '_launcher_' + launcher_name
+    history_file += '.csv'
+
+    results = {}
+    for name, scenario in scenarios.items():
+        results[name] = run_scenario(name, scenario, args.n)
+
+    print(f"{'Scenario':<12} {'Timing Error (s)':>18} {'Memory Error (%)':>18} {'Overhead (%/process)':>22}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['timing_error']:>18.4f} {result['memory_error']:>18.2f} {result['overhead']:>22.3f}")
+
+    gold = get_gold(history_file, list(results))
+    updated = args.update_baseline or gold is None
+    if args.csv or updated:
+        add_to_csv(history_file, results, updated)
+    if updated:
+        print('The harness baseline has been updated.')
+        print("\033[92mPASS\033[0m")
+        sys.exit(0)
+
+    tolerances = {'timing_error': args.timing_tolerance, 'memory_error': args.memory_tolerance, 'overhead': args.overhead_tolerance}
+    failures = check_against_gold(results, gold, tolerances)
+    for failure in failures:
+        print(failure)
+    if failures:
+        print("\033[91mFAIL\033[0m")
+        sys.exit(1)
+    print("\033[92mPASS\033[0m")
+    sys.exit(0)
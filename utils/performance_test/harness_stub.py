@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Stand-in for aperi-mech with a known behavior, for benchmarking the harness itself. Each process burns CPU,
+# sleeps, holds a block of memory with an optional short spike on top, and can spawn child processes that do
+# the same, like ranks. Each process writes what it actually did to a JSON report so the harness's
+# measurements can be compared against it.
+
+def hold_memory(megabytes):
+    # Filling the block touches every page, so it all counts towards the RSS
+    return b'\x01' * int(megabytes * 1024 * 1024)
+
+def burn_cpu(seconds):
+    end = time.process_time() + seconds
+    total = 0
+    while time.process_time() < end:
+        total += 1
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub executable with a known runtime, CPU use and memory profile.')
+    parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to sleep')
+    parser.add_argument('--cpu', type=float, default=0.0, help='CPU seconds to burn')
+    parser.add_argument('--rss', type=float, default=0.0, help='MB to hold for the whole run')
+    parser.add_argument('--spike', type=float, default=0.0, help='MB to allocate on top for --spike-duration seconds')
+    parser.add_argument('--spike-duration', dest='spike_duration', type=float, default=0.05, help='Seconds the spike is held')
+    parser.add_argument('--children', type=int, default=0, help='Child processes to spawn, each doing the same work')
+    parser.add_argument('--report-dir', dest='report_dir', type=str, default=None, help='Directory to write the report of each process to')
+    parser.add_argument('--version', action='store_true', help='Print the version and exit')
+    args = parser.parse_args()
+
+    if args.version:
+        print('harness_stub 1.0')
+        return 0
+
+    start_time = time.perf_counter()
+    block = hold_memory(args.rss)
+    child_args = [sys.executable, os.path.realpath(__file__), '--sleep', str(args.sleep), '--cpu', str(args.cpu), '--rss', str(args.rss),
+                  '--spike', str(args.spike), '--spike-duration', str(args.spike_duration)]
+    if args.report_dir is not None:
+        child_args.extend(['--report-dir', args.report_dir])
+    children = [subprocess.Popen(child_args) for _ in range(args.children)]
+
+    burn_cpu(args.cpu)
+    time.sleep(args.sleep)
+    if args.spike > 0.0:
+        spike = hold_memory(args.spike)
+        time.sleep(args.spike_duration)
+        del spike
+
+    return_code = 0
+    for child in children:
+        return_code = max(return_code, child.wait())
+    del block
+
+    if args.report_dir is not None:
+        report = {
+            'pid': os.getpid(),
+            'wall_time': time.perf_counter() - start_time,
+            'cpu_time': time.process_time(),
+            # High water mark of the RSS, in KB on Linux
+            'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'children': args.children,
+        }
+        with open(os.path.join(args.report_dir, f'report_{os.getpid()}.json'), 'w') as file:
+            json.dump(report, file)
+    return return_code
+
+if __name__ == "__main__":
+    sys.exit(main())
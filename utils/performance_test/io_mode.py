@@ -0,0 +1,88 @@
+import os
+import shutil
+import time
+import yaml
+
+# I/O modes for the performance runs:
+#   none: leave the page cache alone (previous behavior)
+#   warm: pre-stage the input meshes into the page cache (or a RAM-backed directory) before each run
+#   cold: evict the input meshes and old results from the page cache before each run
+IO_MODES = ['none', 'warm', 'cold']
+
+READ_CHUNK_SIZE = 16 * 1024 * 1024
+
+def _get_procedures(input_file):
+    with open(input_file, 'r') as file:
+        yaml_node = yaml.safe_load(file)
+    procedures = []
+    for procedure in yaml_node.get('procedures', []):
+        procedures.extend(procedure.values())
+    return yaml_node, procedures
+
+def get_mesh_files(input_file):
+    # Mesh paths are relative to the input file
+    _yaml_node, procedures = _get_procedures(input_file)
+    input_dir = os.path.dirname(os.path.abspath(input_file))
+    mesh_files = []
+    for procedure in procedures:
+        mesh = procedure.get('geometry', {}).get('mesh', None)
+        if mesh is not None:
+            mesh_files.append(os.path.normpath(os.path.join(input_dir, mesh)))
+    return mesh_files
+
+def get_results_files(input_file):
+    _yaml_node, procedures = _get_procedures(input_file)
+    return [procedure['output']['file'] for procedure in procedures if 'output' in procedure]
+
+def evict_from_page_cache(filename):
+    if not os.path.exists(filename):
+        return
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        # Dirty pages can't be dropped, so write them out first
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+def warm_page_cache(filename):
+    # Read the whole file so it is resident in the page cache. Returns the time it took.
+    start_time = time.perf_counter()
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        while os.read(fd, READ_CHUNK_SIZE):
+            pass
+    finally:
+        os.close(fd)
+    return time.perf_counter() - start_time
+
+def stage_input(input_file, stage_dir):
+    # Copy the meshes into stage_dir (e.g. /dev/shm) and write an input file next to the original that points to them
+    yaml_node, procedures = _get_procedures(input_file)
+    input_dir = os.path.dirname(os.path.abspath(input_file))
+    os.makedirs(stage_dir, exist_ok=True)
+    for procedure in procedures:
+        geometry = procedure.get('geometry', {})
+        if 'mesh' not in geometry:
+            continue
+        mesh_file = os.path.normpath(os.path.join(input_dir, geometry['mesh']))
+        staged_mesh_file = os.path.join(os.path.abspath(stage_dir), os.path.basename(mesh_file))
+        if not os.path.exists(staged_mesh_file) or os.path.getmtime(staged_mesh_file) < os.path.getmtime(mesh_file):
+            shutil.copyfile(mesh_file, staged_mesh_file)
+        geometry['mesh'] = staged_mesh_file
+
+    base, extension = os.path.splitext(input_file)
+    staged_input_file = base + '_staged' + extension
+    with open(staged_input_file, 'w') as file:
+        yaml.safe_dump(yaml_node, file, sort_keys=False)
+    return staged_input_file
+
+def prepare_io(io_mode, mesh_files, results_files):
+    # Put the page cache in the requested state right before a run
+    if io_mode == 'warm':
+        for mesh_file in mesh_files:
+            warm_page_cache(mesh_file)
+    elif io_mode == 'cold':
+        for filename in mesh_files + results_files:
+            evict_from_page_cache(filename)
@@ -1,5 +1,6 @@
 import argparse
 import datetime
+import json
 import os
 import platform
 import select
@@ -12,30 +13,140 @@ import sys
 # script directory
 script_dir = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(script_dir+os.sep+'..')
-from regression_test import RegressionTest
-
-def run_once(test_name, executable_path, num_procs, executable_args):
-    regression_test = RegressionTest(test_name, executable_path, num_procs, executable_args)
+from regression_test import RegressionTest, RESOURCE_STATS, get_session_launcher
+from io_mode import IO_MODES, get_mesh_files, get_results_files, prepare_io, stage_input
+from ab_test import interleaved_schedule, relative_change, difference, check_gate
+
+# Per run stats that are averaged over the runs and stored in the history, with their column names. The names
+# say what is measured:
+#   mesh_read_time: from the start until the last rank closed the mesh files, or last moved its read position in
+#       them. Empty when a rank reads with pread and keeps the mesh open (as netCDF does), since nothing then
+#       shows when it finished.
+#   results_flush_time: the fsync of the results file after the run exits, i.e. only the part of the results
+#       that was still in the page cache. The time the run spent writing is in the runtime.
+#   read_chars, write_chars: bytes the processes read and wrote, including what was served from the page cache
+AVERAGED_STATS = {
+    'peak_memory': 'Peak Memory (MB)',
+    'mesh_read_time': 'Mesh Read End (s)',
+    'results_flush_time': 'Results Flush After Exit (s)',
+    'user_time': 'User Time (s)',
+    'system_time': 'System Time (s)',
+    'voluntary_context_switches': 'Voluntary Context Switches',
+    'involuntary_context_switches': 'Involuntary Context Switches',
+    'minor_page_faults': 'Minor Page Faults',
+    'major_page_faults': 'Major Page Faults',
+    'read_bytes': 'Read Bytes',
+    'write_bytes': 'Write Bytes',
+    'read_chars': 'Read Chars',
+    'write_chars': 'Write Chars',
+}
+# Columns of older histories that were renamed, kept under their new name
+RENAMED_COLUMNS = {
+    'Mesh Read Time (s)': 'Mesh Read End (s)',
+    'Results Write Time (s)': 'Results Flush After Exit (s)',
+    'Results Flush Time (s)': 'Results Flush After Exit (s)',
+}
+
+def _stat_or_nan(stats, key):
+    value = stats.get(key, None)
+    return np.nan if value is None else value
+
+def _nanmean(values):
+    # np.nanmean warns on all-nan input
+    values = np.asarray(values, dtype=float)
+    if np.all(np.isnan(values)):
+        return np.nan
+    return np.nanmean(values)
+
+def _average_stats(run_stats):
+    return {key: _nanmean([_stat_or_nan(stats, key) for stats in run_stats]) for key in AVERAGED_STATS}
+
+def get_test_name(executable_path, num_procs, io_mode='none', launcher='mpirun'):
+    # Machine, executable directory and number of processors, and the I/O mode and launcher if not the defaults.
+    # Names the history files.
+    machine_info = [platform.node(), platform.system(), platform.processor()]
+    test_name = '_'.join(machine_info) + '_' + '_'.join(executable_path.split(os.sep)[-2:]) + '_num_procs_' + str(num_procs)
+    if io_mode != 'none':
+        test_name += '_io_' + io_mode
+    if launcher != 'mpirun':
+        test_name += '_launcher_' + launcher
+    return test_name
+
+def run_once(test_name, executable_path, num_procs, executable_args, io_mode='none'):
+    mesh_files = get_mesh_files(executable_args[-1])
+    results_files = get_results_files(executable_args[-1])
+    prepare_io(io_mode, mesh_files, results_files)
+    results_file = results_files[0] if results_files else None
+    regression_test = RegressionTest(test_name, executable_path, num_procs, executable_args, mesh_files=mesh_files, results_file=results_file)
     return_code, stats = regression_test.run()
     if return_code != 0:
         print("\033[91mFAIL\033[0m")
         sys.exit(1)
-    return regression_test.executable_time, stats['peak_memory']
+    return regression_test.executable_time, stats
 
-def run(test_name, executable_path, num_procs, executable_args, num_runs, no_ask=False):
+def run(test_name, executable_path, num_procs, executable_args, num_runs, no_ask=False, io_mode='none'):
     run_times = []
-    peak_memory_values = []
+    run_stats = []
 
     baseline_and_updated = get_baseline(runtime_file, no_ask)
     updated = baseline_and_updated['updated']
 
     for i in range(num_runs):
         print(f'Running executable {i+1}/{num_runs}')
-        run_time, peak_memory = run_once(test_name, executable_path, num_procs, executable_args)
-        peak_memory_values.append(peak_memory)
+        run_time, stats = run_once(test_name, executable_path, num_procs, executable_args, io_mode)
+        run_stats.append(stats)
         run_times.append(run_time)
     
-    return {'time': np.nanmean(run_times), 'updated': updated, 'peak_memory': np.nanmean(peak_memory_values)}
+    return {'time': np.nanmean(run_times), 'updated': updated, **_average_stats(run_stats)}
+
+def run_ab(test_name, executable_path_a, executable_path_b, num_procs, executable_args, num_pairs, io_mode='none', seed=None):
+    # Run A and B interleaved, in a random order within each pair, with the same input and launch settings
+    executables = {'A': executable_path_a, 'B': executable_path_b}
+    values = {label: {'time': [], 'peak_memory': []} for label in executables}
+    schedule = interleaved_schedule(num_pairs, seed)
+    for i, label in enumerate(schedule):
+        print(f'Running executable {label} {i+1}/{len(schedule)}: {executables[label]}')
+        run_time, stats = run_once(test_name + '_' + label, executables[label], num_procs, executable_args, io_mode)
+        values[label]['time'].append(run_time)
+        values[label]['peak_memory'].append(stats['peak_memory'])
+    return values
+
+def report_ab(values, time_gate=None, memory_gate=None, confidence=0.95, seed=None):
+    times_a = np.array(values['A']['time'])
+    times_b = np.array(values['B']['time'])
+    memory_a = np.array(values['A']['peak_memory'])
+    memory_b = np.array(values['B']['peak_memory'])
+    confidence_percent = confidence * 100.0
+
+    print(f'A: average runtime {times_a.mean():.4f} seconds, peak memory {memory_a.mean():.2f} MB')
+    print(f'B: average runtime {times_b.mean():.4f} seconds, peak memory {memory_b.mean():.2f} MB')
+
+    time_change, time_lower, time_upper = relative_change(times_a, times_b, confidence, seed=seed)
+    print(f'Runtime change B vs A: {time_change:+.2f}% ({confidence_percent:.0f}% CI [{time_lower:+.2f}%, {time_upper:+.2f}%])')
+    print(f'Speedup of B over A: {times_a.mean() / times_b.mean():.4f}x')
+
+    memory_delta, memory_delta_lower, memory_delta_upper = difference(memory_a, memory_b, confidence, seed=seed)
+    memory_change, memory_lower, memory_upper = relative_change(memory_a, memory_b, confidence, seed=seed)
+    print(f'Peak memory delta B - A: {memory_delta:+.2f} MB ({confidence_percent:.0f}% CI [{memory_delta_lower:+.2f}, {memory_delta_upper:+.2f}] MB), {memory_change:+.2f}%')
+
+    return_code = 0
+    if time_gate is not None:
+        if check_gate(time_upper, time_gate):
+            print(f'The runtime change is confidently within {time_gate:+.2f}%.')
+            print("\033[92mPASS\033[0m")
+        else:
+            print(f'The runtime change is not confidently within {time_gate:+.2f}%. Upper bound: {time_upper:+.2f}%')
+            print("\033[91mFAIL\033[0m")
+            return_code = 1
+    if memory_gate is not None:
+        if check_gate(memory_upper, memory_gate):
+            print(f'The peak memory change is confidently within {memory_gate:+.2f}%.')
+            print("\033[92mPASS\033[0m")
+        else:
+            print(f'The peak memory change is not confidently within {memory_gate:+.2f}%. Upper bound: {memory_upper:+.2f}%')
+            print("\033[91mFAIL\033[0m")
+            return_code = 1
+    return return_code
 
 def ask_to_set_baseline(no_ask=False):
     if no_ask:
@@ -75,7 +186,7 @@ def get_baseline(runtime_file, no_ask=False):
         # Ask the user if they want to set the baseline, get the value and return it
         return ask_to_set_baseline(no_ask)
 
-    df = pd.read_csv(runtime_file)
+    df = pd.read_csv(runtime_file).rename(columns=RENAMED_COLUMNS)
 
     # Only consider the rows where the platform gold standard is true
     df = df[(df['Platform Gold Standard'].astype(str).str.lower() == 'true')]
@@ -95,15 +206,21 @@ def get_baseline(runtime_file, no_ask=False):
     baseline_runtime = df.iloc[-1]['Average Runtime (s)']
     baseline_peak_memory = df.iloc[-1]['Peak Memory (MB)']
 
-    return {'time': baseline_runtime, 'updated': False, 'peak_memory': baseline_peak_memory}
+    baseline = {'time': baseline_runtime, 'updated': False, 'peak_memory': baseline_peak_memory}
+    # Gold rows written before a stat was recorded don't have a value for it
+    for key, column in AVERAGED_STATS.items():
+        if key not in baseline:
+            baseline[key] = df.iloc[-1][column] if column in df.columns else np.nan
+    return baseline
 
-def run_and_plot(test_name, executable_path, runtime_file, num_procs, executable_args, num_runs, file, live_plot, no_ask=False):
+def run_and_plot(test_name, executable_path, runtime_file, num_procs, executable_args, num_runs, file, live_plot, no_ask=False, io_mode='none'):
     run_times = []
 
     fig, ax = plt.subplots()
     # Create the run_times and peak_memory np array and fill it with nan
     run_times = np.nan * np.zeros(num_runs)
     peak_memory_values = np.nan * np.zeros(num_runs)
+    run_stats = []
 
     # Get the baseline runtime
     baseline_and_updated = get_baseline(runtime_file, no_ask)
@@ -122,9 +239,10 @@ def run_and_plot(test_name, executable_path, runtime_file, num_procs, executable
 
     def update(frame):
         print(f'Running executable {frame+1}/{num_runs}')
-        run_time, peak_memory = run_once(test_name, executable_path, num_procs, executable_args)
+        run_time, stats = run_once(test_name, executable_path, num_procs, executable_args, io_mode)
         run_times[frame] = run_time
-        peak_memory_values[frame] = peak_memory
+        peak_memory_values[frame] = stats['peak_memory']
+        run_stats.append(stats)
         ax.clear()
         # Make each run be a bar, width 0.25
         ax.grid(True, which='both', linestyle='--', linewidth=0.5, color='black', alpha=0.7)
@@ -154,7 +272,7 @@ def run_and_plot(test_name, executable_path, runtime_file, num_procs, executable
             update(frame)
         plt.savefig(file)
     
-    return {'time': np.nanmean(run_times), 'updated': updated, 'peak_memory': np.nanmean(peak_memory_values)}
+    return {'time': np.nanmean(run_times), 'updated': updated, **_average_stats(run_stats)}
 
 def plot_latest_vs_history(runtime_file, plot_file):
     df = pd.read_csv(runtime_file)
@@ -179,17 +297,28 @@ def plot_latest_vs_history(runtime_file, plot_file):
     plt.tight_layout()
     plt.savefig(plot_file)
 
+HISTORY_COLUMNS = ['Date', 'Time', 'Average Runtime (s)', 'Peak Memory (MB)', 'Executable Info', 'Release', 'Version', 'Machine', 'Platform Gold Standard'] + \
+                  [column for key, column in AVERAGED_STATS.items() if key != 'peak_memory']
+
 def add_to_csv(runtime_file, average_runtime):
-    columns = ['Date', 'Time', 'Average Runtime (s)', 'Peak Memory (MB)', 'Executable Info', 'Release', 'Version', 'Machine', 'Platform Gold Standard']
+    columns = HISTORY_COLUMNS
     # Create the file if it doesn't exist
     if not os.path.exists(runtime_file):
         df = pd.DataFrame(columns=columns)
         df.to_csv(runtime_file, index=False)
-    elif average_runtime['updated']:
-        # Set any rows with the same platform gold standard to false
-        df = pd.read_csv(runtime_file)
-        df.loc[(df['Platform Gold Standard'].astype(str).str.lower() == 'true'), 'Platform Gold Standard'] = False
-        df.to_csv(runtime_file, index=False)
+    else:
+        df = pd.read_csv(runtime_file).rename(columns=RENAMED_COLUMNS)
+        rewrite = False
+        if list(df.columns) != columns:
+            # Older files are missing the newer columns. Add them so new rows line up with the header.
+            df = df.reindex(columns=columns)
+            rewrite = True
+        if average_runtime['updated']:
+            # Set any rows with the same platform gold standard to false
+            df.loc[(df['Platform Gold Standard'].astype(str).str.lower() == 'true'), 'Platform Gold Standard'] = False
+            rewrite = True
+        if rewrite:
+            df.to_csv(runtime_file, index=False)
 
     # Date and time
     now = datetime.datetime.now()
@@ -203,7 +332,8 @@ def add_to_csv(runtime_file, average_runtime):
     executable_info = subprocess.run([args.executable_path, '--version'], capture_output=True, text=True).stdout.strip()
 
     # Create a DataFrame with the new data
-    df = pd.DataFrame([[date, now_time, average_runtime['time'], average_runtime['peak_memory'], executable_info] + machine_info + [average_runtime['updated']]], columns=columns)
+    extra_stats = [average_runtime.get(key, np.nan) for key in AVERAGED_STATS if key != 'peak_memory']
+    df = pd.DataFrame([[date, now_time, average_runtime['time'], average_runtime['peak_memory'], executable_info] + machine_info + [average_runtime['updated']] + extra_stats], columns=columns)
 
     # Append the new data to the CSV file
     df.to_csv(runtime_file, mode='a', header=False, index=False)
@@ -221,20 +351,40 @@ if __name__ == "__main__":
     parser.add_argument('--csv', dest='csv', action='store_true', default=False, help='Save the run times to the "runtime.csv" file')
     parser.add_argument('--update-baseline', dest='update_baseline', action='store_true', default=False, help='Update the baseline runtime')
     parser.add_argument('--no-ask', dest='no_ask', action='store_true', default=False, help='Set the baseline if it does not exist without asking')
+    parser.add_argument('--resource-tolerance', dest='resource_tolerance', type=str, action='append', default=[], metavar='STAT=PERCENT',
+                        help=f'Gate on resource usage, e.g. system_time=20. Can be repeated. Options: {", ".join(RESOURCE_STATS)}')
+    parser.add_argument('--stats-file', dest='stats_file', type=str, default=None, help='Write the averaged run stats to this JSON file')
+    parser.add_argument('--ab', dest='ab', type=str, default=None, metavar='EXECUTABLE_B',
+                        help='A/B mode. Run executable_path (A) and this executable (B) interleaved, --n pairs, and report the change of B vs A with a confidence interval. No baseline or csv is used.')
+    parser.add_argument('--ab-time-gate', dest='ab_time_gate', type=float, default=None, metavar='PERCENT',
+                        help='Fail unless the upper confidence bound of the runtime change of B vs A is at most PERCENT. E.g. -3 requires B to be at least 3%% faster.')
+    parser.add_argument('--ab-memory-gate', dest='ab_memory_gate', type=float, default=None, metavar='PERCENT',
+                        help='Fail unless the upper confidence bound of the peak memory change of B vs A is at most PERCENT')
+    parser.add_argument('--ab-confidence', dest='ab_confidence', type=float, default=0.95, help='Confidence level of the A/B intervals')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the A/B run order and bootstrap')
+    parser.add_argument('--io-mode', dest='io_mode', choices=IO_MODES, default='none', help='Page cache state for each run. "warm" pre-stages the input meshes, "cold" evicts them first. Each mode keeps its own baseline.')
+    parser.add_argument('--stage-dir', dest='stage_dir', type=str, default=None, help='With "--io-mode warm", copy the input meshes to this (RAM-backed) directory, e.g. /dev/shm/aperi-mech')
     args = parser.parse_args()
 
-    machine_info = [platform.node(), platform.system(), platform.processor()]
+    if args.stage_dir is not None and args.io_mode != 'warm':
+        parser.error('--stage-dir only applies to --io-mode warm')
 
-    test_name = '_'.join(machine_info) + '_' + '_'.join(args.executable_path.split(os.sep)[-2:]) + '_num_procs_' + str(args.np)
+    test_name = get_test_name(args.executable_path, args.np, args.io_mode, get_session_launcher().name)
+    if args.stage_dir is not None:
+        args.executable_args[-1] = stage_input(args.executable_args[-1], args.stage_dir)
     runtime_file = 'runtime_' + test_name + '.csv'
     plot_file = 'benchmark_' + test_name + '.png'
     history_plot_file = 'history_' + test_name + '.png'
 
+    if args.ab is not None:
+        values = run_ab(test_name + '_ab', args.executable_path, args.ab, args.np, args.executable_args, args.n, args.io_mode, args.seed)
+        sys.exit(report_ab(values, args.ab_time_gate, args.ab_memory_gate, args.ab_confidence, args.seed))
+
     average_runtime = {0.0, False, 0.0}
     if args.plot:
-        average_runtime = run_and_plot(test_name, args.executable_path, runtime_file, args.np, args.executable_args, args.n, plot_file, args.live_plot, args.no_ask)
+        average_runtime = run_and_plot(test_name, args.executable_path, runtime_file, args.np, args.executable_args, args.n, plot_file, args.live_plot, args.no_ask, args.io_mode)
     else:
-        average_runtime = run(test_name, args.executable_path, args.np, args.executable_args, args.n, args.no_ask)
+        average_runtime = run(test_name, args.executable_path, args.np, args.executable_args, args.n, args.no_ask, args.io_mode)
 
     if args.update_baseline:
         average_runtime['updated'] = True
@@ -250,6 +400,15 @@ if __name__ == "__main__":
     baseline_memory = baseline['peak_memory']
     print(f'Average runtime:  {average_runtime["time"]:.2f} seconds')
     print(f'Peak memory: {average_runtime["peak_memory"]:.2f} MB')
+    print(f'Mesh read end: {average_runtime["mesh_read_time"]:.4e} seconds')
+    print(f'Results flush after the run exited: {average_runtime["results_flush_time"]:.4e} seconds')
+    for key in RESOURCE_STATS:
+        print(f'{AVERAGED_STATS[key]}: {average_runtime[key]:.6g}')
+
+    if args.stats_file is not None:
+        with open(args.stats_file, 'w') as file:
+            # nan is not valid JSON
+            json.dump({key: (None if isinstance(value, float) and np.isnan(value) else value) for key, value in average_runtime.items()}, file, indent=2, default=float)
 
     if average_runtime['updated']:
         print('The baseline runtime and peak memory have been updated.')
@@ -282,4 +441,29 @@ if __name__ == "__main__":
             print(f"Peak memory ({average_runtime['peak_memory']:.2f} MB) is within the tolerance of {args.memory_tolerance}% of the gold peak memory ({baseline_memory:.2f} MB)")
             print(f"Upper limit: {upper_limit:.2f} MB")
             print("\033[92mPASS\033[0m")
+
+        # Check if the resource usage is within the tolerances
+        for resource_tolerance in args.resource_tolerance:
+            stat_name, tolerance = resource_tolerance.split('=')
+            tolerance = float(tolerance)
+            if stat_name not in RESOURCE_STATS:
+                print(f"Unknown resource '{stat_name}'. Options are: {', '.join(RESOURCE_STATS)}")
+                print("\033[91mFAIL\033[0m")
+                return_code = 1
+                continue
+            if np.isnan(average_runtime[stat_name]):
+                print(f"WARNING: {AVERAGED_STATS[stat_name]} is unknown with the {get_session_launcher().name} launcher. Skipping the check. Use --launcher mpirun to check it.")
+                continue
+            baseline_value = baseline.get(stat_name, np.nan)
+            if np.isnan(baseline_value):
+                print(f"WARNING: No gold value for {AVERAGED_STATS[stat_name]}. Skipping the check. Update the baseline to record one.")
+                continue
+            upper_limit = baseline_value * (1.0 + tolerance / 100.0)
+            if average_runtime[stat_name] > upper_limit:
+                print(f"{AVERAGED_STATS[stat_name]} ({average_runtime[stat_name]:.6g}) exceeded the gold value ({baseline_value:.6g}) by more than {tolerance}%")
+                print("\033[91mFAIL\033[0m")
+                return_code = 1
+            else:
+                print(f"{AVERAGED_STATS[stat_name]} ({average_runtime[stat_name]:.6g}) is within the tolerance of {tolerance}% of the gold value ({baseline_value:.6g})")
+                print("\033[92mPASS\033[0m")
         sys.exit(return_code)
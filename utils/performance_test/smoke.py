@@ -0,0 +1,183 @@
+import argparse
+import datetime
+import os
+import platform
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import yaml
+from io_mode import IO_MODES
+from performance_test import RENAMED_COLUMNS, get_test_name, run_once
+from regression_test import get_session_launcher
+
+# Perf smoke test. Runs temporary copies of an input file truncated to a few steps, with the output pushed past
+# the end of the run, at two or more step counts. A line through runtime vs steps splits the cost into a setup
+# cost (mesh read, neighbor search, ...) and a per step cost, and extrapolates the runtime of the full run. Both
+# components are gated against a gold row, so a PR gets a perf signal in about a minute with setup and stepping
+# regressions reported separately.
+
+SMOKE_COLUMNS = ['Date', 'Time', 'Setup Time (s)', 'Per Step Time (s)', 'Mesh Read End (s)', 'Full Steps', 'Extrapolated Runtime (s)',
+                 'Step Counts', 'Runtimes (s)', 'Peak Memory (MB)', 'Executable Info', 'Machine', 'Platform Gold Standard']
+STEPS = [5, 10]
+
+def get_num_steps(input_file):
+    # Steps of the full run, over all the time steppers
+    with open(input_file, 'r') as file:
+        yaml_node = yaml.safe_load(file)
+    num_steps = 0
+    for procedure in yaml_node['procedures']:
+        for procedure_node in procedure.values():
+            for time_stepper in procedure_node['time_stepper'].values():
+                num_steps += int(round(time_stepper['time_end'] / time_stepper['time_increment']))
+    return num_steps
+
+def make_truncated_input(input_file, num_steps, truncated_file):
+    # Copy of the input file that stops after num_steps steps. The output start and increment are set past the end
+    # so no steps are written, not even the initial one. Written next to the input file so the relative mesh paths still work.
+    with open(input_file, 'r') as file:
+        yaml_node = yaml.safe_load(file)
+    for procedure in yaml_node['procedures']:
+        for procedure_node in procedure.values():
+            time_end = 0.0
+            for time_stepper in procedure_node['time_stepper'].values():
+                time_stepper['time_end'] = num_steps * time_stepper['time_increment']
+                time_end = max(time_end, time_stepper['time_end'])
+            if 'output' in procedure_node:
+                procedure_node['output']['time_start'] = 2.0 * time_end
+                procedure_node['output']['time_increment'] = 2.0 * time_end
+    with open(truncated_file, 'w') as file:
+        yaml.safe_dump(yaml_node, file, sort_keys=False)
+    return truncated_file
+
+def _nanmean(values):
+    # np.nanmean warns on all-nan input
+    values = np.asarray(values, dtype=float)
+    if np.all(np.isnan(values)):
+        return np.nan
+    return np.nanmean(values)
+
+def fit_setup_and_step(step_counts, run_times):
+    # Least squares line run_time = setup + per_step * steps. The setup can't be negative.
+    per_step, setup = np.polyfit(np.asarray(step_counts, dtype=float), np.asarray(run_times, dtype=float), 1)
+    return {'setup': max(setup, 0.0), 'per_step': per_step}
+
+def run_smoke(test_name, executable_path, num_procs, input_file, step_counts, num_runs, io_mode='none'):
+    points = []
+    base, extension = os.path.splitext(input_file)
+    for num_steps in step_counts:
+        truncated_file = make_truncated_input(input_file, num_steps, f'{base}_smoke_{num_steps}{extension}')
+        run_times = []
+        mesh_read_times = []
+        peak_memory_values = []
+        try:
+            for i in range(num_runs):
+                print(f'Running {num_steps} steps {i+1}/{num_runs}')
+                run_time, stats = run_once(test_name + f'_smoke_{num_steps}', executable_path, num_procs, [truncated_file], io_mode)
+                run_times.append(run_time)
+                mesh_read_times.append(np.nan if stats.get('mesh_read_time') is None else stats['mesh_read_time'])
+                peak_memory_values.append(stats['peak_memory'])
+        finally:
+            os.remove(truncated_file)
+        points.append({'steps': num_steps, 'time': np.mean(run_times), 'mesh_read_time': _nanmean(mesh_read_times), 'peak_memory': np.mean(peak_memory_values)})
+    return points
+
+def get_gold(smoke_file):
+    if not os.path.exists(smoke_file):
+        return None
+    df = pd.read_csv(smoke_file)
+    df = df[df['Platform Gold Standard'].astype(str).str.lower() == 'true']
+    if df.empty:
+        return None
+    return {'setup': df.iloc[-1]['Setup Time (s)'], 'per_step': df.iloc[-1]['Per Step Time (s)']}
+
+def get_latest_full_runtime(runtime_file):
+    # Runtime of the latest full run of the same test, to check the extrapolation against
+    if not os.path.exists(runtime_file):
+        return None
+    df = pd.read_csv(runtime_file)
+    df = df[df['Average Runtime (s)'] > 0]
+    if df.empty:
+        return None
+    return df.iloc[-1]['Average Runtime (s)']
+
+def add_to_csv(smoke_file, executable_path, points, fit, full_steps, gold):
+    if os.path.exists(smoke_file):
+        df = pd.read_csv(smoke_file).rename(columns=RENAMED_COLUMNS)
+        if gold or list(df.columns) != SMOKE_COLUMNS:
+            if gold:
+                # Only one gold row
+                df.loc[(df['Platform Gold Standard'].astype(str).str.lower() == 'true'), 'Platform Gold Standard'] = False
+            df.to_csv(smoke_file, index=False)
+    else:
+        pd.DataFrame(columns=SMOKE_COLUMNS).to_csv(smoke_file, index=False)
+
+    now = datetime.datetime.now()
+    executable_info = subprocess.run([executable_path, '--version'], capture_output=True, text=True).stdout.strip()
+    row = [now.date(), now.time(), fit['setup'], fit['per_step'], _nanmean([point['mesh_read_time'] for point in points]),
+           full_steps, fit['setup'] + full_steps * fit['per_step'],
+           ' '.join(str(point['steps']) for point in points),
+           ' '.join(f"{point['time']:.6g}" for point in points),
+           max(point['peak_memory'] for point in points),
+           executable_info, platform.processor(), gold]
+    pd.DataFrame([row], columns=SMOKE_COLUMNS).to_csv(smoke_file, mode='a', header=False, index=False)
+
+def check_component(name, value, gold_value, tolerance_percent):
+    # Only an increase fails
+    upper_limit = gold_value * (1.0 + tolerance_percent / 100.0)
+    percentage_difference = 100.0 * (value / gold_value - 1.0) if gold_value > 0 else 0.0
+    if value > upper_limit:
+        print(f'{name} {value:.4e} s is {percentage_difference:.2f}% over the gold {gold_value:.4e} s, more than the tolerance of {tolerance_percent}%')
+        print("\033[91mFAIL\033[0m")
+        return 1
+    print(f'{name} {value:.4e} s is {percentage_difference:+.2f}% from the gold {gold_value:.4e} s, within the tolerance of {tolerance_percent}%')
+    print("\033[92mPASS\033[0m")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run an input file truncated to a few steps and split the runtime into setup and per step costs.')
+    parser.add_argument('executable_path', type=str, help='Path to the executable')
+    parser.add_argument('input_file', type=str, help='Input file of the full run')
+    parser.add_argument('--steps', type=int, nargs='+', default=STEPS, help='Step counts to run. At least two different ones.')
+    parser.add_argument('--n', type=int, default=1, help='Number of times to run each step count')
+    parser.add_argument('--np', type=int, default=1, help='Number of processors to run the executable with')
+    parser.add_argument('--setup-tolerance', dest='setup_tolerance', type=float, default=10.0, help='Allowed increase of the setup time over the gold, in percent')
+    parser.add_argument('--step-tolerance', dest='step_tolerance', type=float, default=10.0, help='Allowed increase of the per step time over the gold, in percent')
+    parser.add_argument('--csv', dest='csv', action='store_true', default=False, help='Save the results to the "smoke_*.csv" file')
+    parser.add_argument('--update-baseline', dest='update_baseline', action='store_true', default=False, help='Make these results the gold standard')
+    parser.add_argument('--io-mode', dest='io_mode', choices=IO_MODES, default='none', help='Page cache state for each run')
+    args = parser.parse_args()
+
+    if len(set(args.steps)) < 2:
+        parser.error('--steps needs at least two different step counts')
+
+    test_name = get_test_name(args.executable_path, args.np, args.io_mode, get_session_launcher().name)
+    smoke_file = 'smoke_' + test_name + '.csv'
+
+    full_steps = get_num_steps(args.input_file)
+    points = run_smoke(test_name, args.executable_path, args.np, args.input_file, sorted(set(args.steps)), args.n, args.io_mode)
+    fit = fit_setup_and_step([point['steps'] for point in points], [point['time'] for point in points])
+    extrapolated_runtime = fit['setup'] + full_steps * fit['per_step']
+
+    print(f"{'Steps':>8} {'Runtime (s)':>14} {'Mesh Read End (s)':>20} {'Peak Memory (MB)':>18}")
+    for point in points:
+        print(f"{point['steps']:>8} {point['time']:>14.4f} {point['mesh_read_time']:>20.4e} {point['peak_memory']:>18.2f}")
+    print(f"Setup time: {fit['setup']:.4e} s, per step time: {fit['per_step']:.4e} s")
+    print(f"Extrapolated runtime of the full run ({full_steps} steps): {extrapolated_runtime:.4f} s")
+    # The full runs of the same test are in runtime_<test name>.csv
+    full_runtime = get_latest_full_runtime('runtime_' + test_name + '.csv')
+    if full_runtime is not None:
+        print(f"Latest full run: {full_runtime:.4f} s. Extrapolation is {100.0 * (extrapolated_runtime / full_runtime - 1.0):+.2f}% off.")
+
+    gold = get_gold(smoke_file)
+    updated = args.update_baseline or gold is None
+    if args.csv or updated:
+        add_to_csv(smoke_file, args.executable_path, points, fit, full_steps, updated)
+    if updated:
+        print('The smoke baseline has been updated.')
+        print("\033[92mPASS\033[0m")
+        sys.exit(0)
+
+    return_code = check_component('Setup time', fit['setup'], gold['setup'], args.setup_tolerance)
+    return_code |= check_component('Per step time', fit['per_step'], gold['per_step'], args.step_tolerance)
+    sys.exit(return_code)
@@ -0,0 +1,158 @@
+import argparse
+import datetime
+import os
+import platform
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import yaml
+# script directory
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(script_dir+os.sep+'..')
+from regression_test import get_session_launcher, read_mesh_counts
+from io_mode import IO_MODES
+from performance_test import get_test_name, run_once
+
+# Problem-size sweep. Runs variants of an input file over a ladder of meshes and fits runtime and peak memory
+# against the node count on a log-log scale. The fitted exponents are stored in a history file and gated, so a
+# change in algorithmic complexity shows up on small meshes instead of only at production scale.
+
+SWEEP_COLUMNS = ['Date', 'Time', 'Runtime Exponent', 'Runtime R2', 'Memory Exponent', 'Memory R2', 'Node Counts', 'Runtimes (s)', 'Peak Memory (MB)',
+                 'Executable Info', 'Machine', 'Platform Gold Standard']
+
+def fit_power_law(sizes, values):
+    # Fit values = coefficient * sizes^exponent by least squares on log(values) vs log(sizes)
+    log_sizes = np.log(np.asarray(sizes, dtype=float))
+    log_values = np.log(np.asarray(values, dtype=float))
+    exponent, log_coefficient = np.polyfit(log_sizes, log_values, 1)
+    residuals = log_values - (exponent * log_sizes + log_coefficient)
+    total = np.sum((log_values - log_values.mean())**2)
+    r_squared = 1.0 - np.sum(residuals**2) / total if total > 0.0 else 1.0
+    return {'exponent': exponent, 'coefficient': np.exp(log_coefficient), 'r_squared': r_squared}
+
+def make_variant(template_file, mesh_file, time_end, variant_file):
+    # Copy of the template input file with the mesh (and optionally the end time) replaced
+    with open(template_file, 'r') as file:
+        yaml_node = yaml.safe_load(file)
+    for procedure in yaml_node['procedures']:
+        for procedure_node in procedure.values():
+            procedure_node['geometry']['mesh'] = os.path.abspath(mesh_file)
+            if time_end is not None:
+                for time_stepper in procedure_node['time_stepper'].values():
+                    time_stepper['time_end'] = time_end
+    with open(variant_file, 'w') as file:
+        yaml.safe_dump(yaml_node, file, sort_keys=False)
+    return variant_file
+
+def run_sweep(test_name, executable_path, num_procs, template_file, mesh_files, time_ends, num_runs, io_mode='none'):
+    points = []
+    base, extension = os.path.splitext(template_file)
+    for i, (mesh_file, time_end) in enumerate(zip(mesh_files, time_ends)):
+        num_nodes = read_mesh_counts(mesh_file)['num_nodes']
+        variant_file = make_variant(template_file, mesh_file, time_end, f'{base}_sweep_{i}{extension}')
+        print(f'Sweep point {i+1}/{len(mesh_files)}: {os.path.basename(mesh_file)}, {num_nodes} nodes' + (f', time_end {time_end}' if time_end is not None else ''))
+        run_times = []
+        peak_memory_values = []
+        for j in range(num_runs):
+            print(f'Running executable {j+1}/{num_runs}')
+            run_time, stats = run_once(test_name + f'_sweep_{i}', executable_path, num_procs, [variant_file], io_mode)
+            run_times.append(run_time)
+            peak_memory_values.append(stats['peak_memory'])
+        points.append({'mesh': mesh_file, 'num_nodes': num_nodes, 'time': np.mean(run_times), 'peak_memory': np.mean(peak_memory_values)})
+        os.remove(variant_file)
+    return points
+
+def get_gold_fit(sweep_file):
+    if not os.path.exists(sweep_file):
+        return None
+    df = pd.read_csv(sweep_file)
+    df = df[df['Platform Gold Standard'].astype(str).str.lower() == 'true']
+    if df.empty:
+        return None
+    return {'runtime_exponent': df.iloc[-1]['Runtime Exponent'], 'memory_exponent': df.iloc[-1]['Memory Exponent']}
+
+def add_to_csv(sweep_file, executable_path, points, runtime_fit, memory_fit, gold):
+    if os.path.exists(sweep_file) and gold:
+        # Only one gold row
+        df = pd.read_csv(sweep_file)
+        df.loc[(df['Platform Gold Standard'].astype(str).str.lower() == 'true'), 'Platform Gold Standard'] = False
+        df.to_csv(sweep_file, index=False)
+    elif not os.path.exists(sweep_file):
+        pd.DataFrame(columns=SWEEP_COLUMNS).to_csv(sweep_file, index=False)
+
+    now = datetime.datetime.now()
+    executable_info = subprocess.run([executable_path, '--version'], capture_output=True, text=True).stdout.strip()
+    row = [now.date(), now.time(), runtime_fit['exponent'], runtime_fit['r_squared'], memory_fit['exponent'], memory_fit['r_squared'],
+           ' '.join(str(point['num_nodes']) for point in points),
+           ' '.join(f"{point['time']:.6g}" for point in points),
+           ' '.join(f"{point['peak_memory']:.6g}" for point in points),
+           executable_info, platform.processor(), gold]
+    pd.DataFrame([row], columns=SWEEP_COLUMNS).to_csv(sweep_file, mode='a', header=False, index=False)
+
+def check_exponent(name, exponent, gold_exponent, tolerance):
+    # Only an increase fails. A lower exponent is an improvement.
+    upper_limit = gold_exponent + tolerance
+    if exponent > upper_limit:
+        print(f'{name} exponent {exponent:.3f} exceeded the gold exponent {gold_exponent:.3f} by more than {tolerance}')
+        print("\033[91mFAIL\033[0m")
+        return 1
+    print(f'{name} exponent {exponent:.3f} is within {tolerance} of the gold exponent {gold_exponent:.3f}')
+    print("\033[92mPASS\033[0m")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run an input file over a ladder of meshes and fit runtime and peak memory against the node count.')
+    parser.add_argument('executable_path', type=str, help='Path to the executable')
+    parser.add_argument('input_file', type=str, help='Template input file. The mesh (and optionally time_end) is replaced for each sweep point.')
+    parser.add_argument('--meshes', type=str, nargs='+', required=True, help='Mesh ladder, relative to the input file like geometry.mesh. At least two meshes.')
+    parser.add_argument('--time-end', dest='time_end', type=float, nargs='+', default=None, help='time_end for all sweep points, or one per mesh')
+    parser.add_argument('--n', type=int, default=1, help='Number of times to run each sweep point')
+    parser.add_argument('--np', type=int, default=1, help='Number of processors to run the executable with')
+    parser.add_argument('--exponent-tolerance', dest='exponent_tolerance', type=float, default=0.1, help='Allowed increase of the runtime exponent over the gold exponent')
+    parser.add_argument('--memory-exponent-tolerance', dest='memory_exponent_tolerance', type=float, default=0.1, help='Allowed increase of the peak memory exponent over the gold exponent')
+    parser.add_argument('--csv', dest='csv', action='store_true', default=False, help='Save the fit to the "sweep_*.csv" file')
+    parser.add_argument('--update-baseline', dest='update_baseline', action='store_true', default=False, help='Make this fit the gold standard')
+    parser.add_argument('--io-mode', dest='io_mode', choices=IO_MODES, default='none', help='Page cache state for each run')
+    args = parser.parse_args()
+
+    if len(args.meshes) < 2:
+        parser.error('A sweep needs at least two meshes')
+    input_dir = os.path.dirname(os.path.abspath(args.input_file))
+    mesh_files = [os.path.normpath(os.path.join(input_dir, mesh)) for mesh in args.meshes]
+    if args.time_end is None:
+        time_ends = [None] * len(mesh_files)
+    elif len(args.time_end) == 1:
+        time_ends = args.time_end * len(mesh_files)
+    elif len(args.time_end) == len(mesh_files):
+        time_ends = args.time_end
+    else:
+        parser.error('--time-end needs one value or one per mesh')
+
+    test_name = get_test_name(args.executable_path, args.np, args.io_mode, get_session_launcher().name)
+    sweep_file = 'sweep_' + test_name + '.csv'
+
+    points = run_sweep(test_name, args.executable_path, args.np, args.input_file, mesh_files, time_ends, args.n, args.io_mode)
+    num_nodes = [point['num_nodes'] for point in points]
+    runtime_fit = fit_power_law(num_nodes, [point['time'] for point in points])
+    memory_fit = fit_power_law(num_nodes, [point['peak_memory'] for point in points])
+
+    print(f"{'Nodes':>12} {'Runtime (s)':>14} {'Peak Memory (MB)':>18}")
+    for point in points:
+        print(f"{point['num_nodes']:>12} {point['time']:>14.4f} {point['peak_memory']:>18.2f}")
+    print(f"Runtime ~ nodes^{runtime_fit['exponent']:.3f} (R^2 = {runtime_fit['r_squared']:.4f})")
+    print(f"Peak memory ~ nodes^{memory_fit['exponent']:.3f} (R^2 = {memory_fit['r_squared']:.4f})")
+
+    gold_fit = get_gold_fit(sweep_file)
+    update_baseline = args.update_baseline or gold_fit is None
+    if args.csv or update_baseline:
+        add_to_csv(sweep_file, args.executable_path, points, runtime_fit, memory_fit, update_baseline)
+
+    if update_baseline:
+        print('The baseline exponents have been updated.')
+        print("\033[92mPASS\033[0m")
+        sys.exit(0)
+
+    return_code = check_exponent('Runtime', runtime_fit['exponent'], gold_fit['runtime_exponent'], args.exponent_tolerance)
+    return_code |= check_exponent('Peak memory', memory_fit['exponent'], gold_fit['memory_exponent'], args.memory_exponent_tolerance)
+    sys.exit(return_code)
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from ab_test import check_gate, difference, interleaved_schedule, relative_change
+
+
+class TestABTest(unittest.TestCase):
+
+    def test_interleaved_schedule(self):
+        schedule = interleaved_schedule(50, seed=0)
+        self.assertEqual(len(schedule), 100)
+        # Each pair has one A and one B
+        for i in range(0, len(schedule), 2):
+            self.assertEqual(sorted(schedule[i:i+2]), ['A', 'B'])
+        # Both orders show up
+        pairs = set(tuple(schedule[i:i+2]) for i in range(0, len(schedule), 2))
+        self.assertEqual(pairs, {('A', 'B'), ('B', 'A')})
+
+    def test_relative_change(self):
+        rng = np.random.default_rng(0)
+        # Drift that affects both A and B alike
+        drift = np.linspace(10.0, 12.0, 20)
+        a_values = drift + rng.normal(0.0, 0.01, 20)
+        b_values = 0.97 * drift + rng.normal(0.0, 0.01, 20)
+        estimate, lower, upper = relative_change(a_values, b_values, seed=0)
+        self.assertAlmostEqual(estimate, -3.0, delta=0.2)
+        self.assertLess(lower, estimate)
+        self.assertGreater(upper, estimate)
+        self.assertTrue(check_gate(upper, -2.0))
+        self.assertFalse(check_gate(upper, -4.0))
+
+    def test_difference(self):
+        estimate, lower, upper = difference([100.0, 101.0, 99.0, 100.0], [110.0, 111.0, 109.0, 110.0], seed=0)
+        self.assertAlmostEqual(estimate, 10.0)
+        self.assertAlmostEqual(lower, 10.0)
+        self.assertAlmostEqual(upper, 10.0)
+
+    def test_single_pair(self):
+        estimate, lower, upper = relative_change([1.0], [2.0])
+        self.assertAlmostEqual(estimate, 100.0)
+        self.assertTrue(np.isnan(lower) and np.isnan(upper))
+        self.assertFalse(check_gate(upper, 200.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from build_watcher import BuildWatcher, file_hash, snapshot_binary
+
+
+def write_binary(path, content, mtime):
+    with open(path, 'wb') as file:
+        file.write(content)
+    os.utime(path, ns=(mtime, mtime))
+
+
+class TestBuildWatcher(unittest.TestCase):
+
+    def test_settle_and_coalesce(self):
+        with tempfile.TemporaryDirectory() as directory:
+            binary = os.path.join(directory, 'aperi-mech')
+            state_file = os.path.join(directory, 'state.json')
+            watcher = BuildWatcher({'cpu': binary, 'gpu': os.path.join(directory, 'missing')}, state_file, settle_time=10.0)
+            self.assertEqual(watcher.poll(0.0), [])
+
+            # A new build is only ready once it stops changing
+            write_binary(binary, b'build 1', 1)
+            self.assertEqual(watcher.poll(1.0), [])
+            # Rebuilt before settling. Only the newest build is benchmarked.
+            write_binary(binary, b'build 2', 2)
+            self.assertEqual(watcher.poll(5.0), [])
+            self.assertEqual(watcher.poll(12.0), [])
+            self.assertEqual(watcher.poll(15.0), [('cpu', binary, file_hash(binary))])
+
+            # Benchmarked builds aren't run again, even after a restart
+            watcher.mark_benchmarked('cpu', file_hash(binary))
+            self.assertEqual(watcher.poll(30.0), [])
+            watcher = BuildWatcher({'cpu': binary}, state_file, settle_time=10.0)
+            self.assertEqual(watcher.poll(40.0), [])
+            self.assertEqual(watcher.poll(60.0), [])
+
+            # A rebuild with the same content (e.g. touched) isn't a new build
+            write_binary(binary, b'build 2', 3)
+            watcher.poll(70.0)
+            self.assertEqual(watcher.poll(90.0), [])
+
+    def test_snapshot_binary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            binary = os.path.join(directory, 'build', 'Release', 'aperi-mech')
+            os.makedirs(os.path.dirname(binary))
+            write_binary(binary, b'build', 1)
+            os.chmod(binary, 0o755)
+            digest = file_hash(binary)
+            build_dir, snapshot_path = snapshot_binary(binary, digest, os.path.join(directory, 'snapshots'))
+            self.assertEqual(snapshot_path, os.path.join(build_dir, 'Release', 'aperi-mech'))
+            self.assertEqual(file_hash(snapshot_path), digest)
+            self.assertTrue(os.access(snapshot_path, os.X_OK))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from change_points import analyze_history, check_budget, cumulative_change, detect_shifts, pelt
+
+
+class TestChangePoints(unittest.TestCase):
+
+    def test_pelt(self):
+        values = np.concatenate([np.zeros(10), np.full(10, 5.0), np.full(10, 2.0)])
+        self.assertEqual(pelt(values, 1.0), [10, 20])
+        self.assertEqual(pelt(np.ones(20), 1.0), [])
+
+    def test_gradual_drift(self):
+        # Five 1.5% slowdowns, each inside a 3% gold tolerance, add up to about 8%
+        rng = np.random.default_rng(0)
+        levels = np.concatenate([np.full(10, 100.0)] + [np.full(5, 100.0 * 1.015**k) for k in range(1, 6)])
+        values = levels * (1.0 + rng.normal(0.0, 0.003, levels.shape[0]))
+        segments = detect_shifts(values)
+        self.assertEqual([segment['start'] for segment in segments], [0, 10, 15, 20, 25, 30])
+        self.assertAlmostEqual(cumulative_change(segments, 0), 100.0 * (1.015**5 - 1.0), delta=0.5)
+
+    def test_outlier_and_budget(self):
+        rng = np.random.default_rng(1)
+        runtimes = 100.0 * (1.0 + rng.normal(0.0, 0.003, 30))
+        # One slow run is not a confirmed shift
+        runtimes[15] *= 1.2
+        # The tail is too short to confirm yet
+        runtimes[-2:] *= 1.1
+        memory = np.full(30, 500.0)
+        memory[20:] = 600.0
+        df = pd.DataFrame({
+            'Timestamp': pd.date_range('2026-01-01', periods=30),
+            'Average Runtime (s)': runtimes,
+            'Peak Memory (MB)': memory,
+            'Executable Info': [f'v{i}' for i in range(30)],
+            'Platform Gold Standard': [i == 0 for i in range(30)],
+        })
+        results = analyze_history(df)
+        self.assertLess(abs(results['runtime']['cumulative_change_percent']), 0.5)
+        shifts = {shift['run']: shift for shift in results['runtime']['shifts']}
+        self.assertFalse(shifts[15]['confirmed'])
+        self.assertFalse(shifts[28]['confirmed'])
+        self.assertEqual(results['peak_memory']['shifts'][0]['executable_info'], 'v20')
+        self.assertEqual(results['peak_memory']['shifts'][0]['previous_executable_info'], 'v19')
+        self.assertEqual(check_budget(results, {'runtime': 5.0, 'peak_memory': 25.0}), [])
+        self.assertEqual(len(check_budget(results, {'runtime': 5.0, 'peak_memory': 15.0})), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import yaml
+
+from dashboard import HISTORY_NAME as HISTORY_PATTERN, build_dashboard, lttb, update_history
+from performance_test import get_test_name
+
+HEADER = 'Date,Time,Average Runtime (s),Peak Memory (MB),Executable Info,Release,Version,Machine,Platform Gold Standard\n'
+HISTORY_NAME = 'runtime_host_Linux_x86_64_Release_aperi-mech_num_procs_4.csv'
+
+
+def make_row(day, runtime, gold=False):
+    return f'2026-01-{day:02d},01:00:00.000000,{runtime},500.0,v{day},Release,1,host,{gold}\n'
+
+
+class TestDashboard(unittest.TestCase):
+
+    def test_lttb(self):
+        x = np.arange(1000.0)
+        y = np.zeros(1000)
+        y[500] = 10.0
+        indices = lttb(x, y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        # The spike survives the downsampling
+        self.assertIn(500, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        np.testing.assert_array_equal(lttb(x[:10], y[:10], 50), np.arange(10))
+
+    def test_history_name(self):
+        # The I/O mode and launcher suffixes of the history names
+        name = 'runtime_' + get_test_name('/build/Release/aperi-mech', 4, 'cold', 'prte-dvm') + '.csv'
+        match = HISTORY_PATTERN.search(name)
+        self.assertEqual((match.group('num_procs'), match.group('io_mode'), match.group('launcher')), ('4', 'cold', 'prte-dvm'))
+        match = HISTORY_PATTERN.search(HISTORY_NAME)
+        self.assertEqual((match.group('num_procs'), match.group('io_mode'), match.group('launcher')), ('4', None, None))
+
+    def test_update_history(self):
+        with tempfile.TemporaryDirectory() as directory:
+            runtime_file = os.path.join(directory, HISTORY_NAME)
+            with open(runtime_file, 'w') as file:
+                file.write(HEADER + make_row(1, 10.0, True) + make_row(2, 10.1))
+            history = update_history(runtime_file, None)
+            self.assertEqual([row[1] for row in history['rows']], [10.0, 10.1])
+            # Only the appended rows are read. A partly written row waits for the next update.
+            with open(runtime_file, 'a') as file:
+                file.write(make_row(3, 10.2) + '2026-01-04,01:00')
+            history = update_history(runtime_file, history)
+            self.assertEqual([row[1] for row in history['rows']], [10.0, 10.1, 10.2])
+            self.assertEqual(history['offset'], os.path.getsize(runtime_file) - len('2026-01-04,01:00'))
+            # A rewritten file is read again from the start
+            with open(runtime_file, 'w') as file:
+                file.write(HEADER + make_row(1, 10.0) + make_row(2, 10.1, True))
+            history = update_history(runtime_file, history)
+            self.assertEqual([row[3] for row in history['rows']], [False, True])
+
+    def test_build_dashboard(self):
+        with tempfile.TemporaryDirectory() as directory:
+            test_dir = os.path.join(directory, 'taylor_bar')
+            os.makedirs(test_dir)
+            with open(os.path.join(test_dir, 'performance.yaml'), 'w') as file:
+                yaml.safe_dump({'tests': [{'num_processors': 4, 'hardware': 'cpu', 'runtime_tolerance_percent': 8.0, 'memory_tolerance_percent': 5.0}]}, file)
+            runtime_file = os.path.join(test_dir, HISTORY_NAME)
+            with open(runtime_file, 'w') as file:
+                file.write(HEADER + make_row(1, 10.0, True) + ''.join(make_row(day, 10.5) for day in range(2, 20)))
+            output_file = os.path.join(directory, 'dashboard.html')
+            self.assertEqual(build_dashboard([directory], output_file, max_points=10), 0)
+
+            # 11% over the gold is over the 8% tolerance
+            with open(runtime_file, 'a') as file:
+                file.write(make_row(20, 11.1))
+            self.assertEqual(build_dashboard([directory], output_file, max_points=10), 1)
+            with open(output_file, 'r') as file:
+                page = file.read()
+            self.assertIn('taylor_bar', page)
+            self.assertIn('class="regressed"', page)
+            with open(os.path.join(directory, 'dashboard.html.cache', 'index.json'), 'r') as file:
+                entry = next(iter(json.load(file)['histories'].values()))
+            self.assertEqual(entry['num_rows'], 20)
+            self.assertEqual(entry['summary']['runtime']['tolerance'], 8.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
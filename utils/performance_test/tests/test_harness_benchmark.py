@@ -0,0 +1,67 @@
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+from harness_benchmark import STUB_PATH, add_to_csv, check_against_gold, compare, get_gold, read_reports
+
+
+def make_result(timing_error):
+    return {'timing_error': timing_error, 'memory_error': 1.0, 'overhead': 2.0}
+
+
+class TestHarnessBenchmark(unittest.TestCase):
+
+    def test_stub_reports(self):
+        with tempfile.TemporaryDirectory() as report_dir:
+            subprocess.run([sys.executable, STUB_PATH, '--rss', '64', '--children', '1', '--sleep', '0.1', '--report-dir', report_dir], check=True)
+            reports = read_reports(report_dir)
+        # The parent and its child
+        self.assertEqual(len(reports), 2)
+        for report in reports:
+            self.assertGreaterEqual(report['wall_time'], 0.1)
+            self.assertGreater(report['max_rss'], 64.0)
+
+    def test_compare_and_gate(self):
+        reports = [{'wall_time': 1.0, 'max_rss': 100.0}, {'wall_time': 0.9, 'max_rss': 100.0}]
+        result = compare({'run_time': 1.2, 'peak_memory': 190.0, 'harness_cpu_time': 0.12}, reports)
+        self.assertAlmostEqual(result['timing_error'], 0.2)
+        self.assertAlmostEqual(result['memory_error'], -5.0)
+        self.assertAlmostEqual(result['overhead'], 5.0)
+        tolerances = {'timing_error': 0.1, 'memory_error': 2.0, 'overhead': 1.0}
+        gold = {'sleep': {'timing_error': 0.15, 'memory_error': -1.0, 'overhead': 4.5}}
+        failures = check_against_gold({'sleep': result}, gold, tolerances)
+        # The memory error moved by 4 points, the others are within their tolerance
+        self.assertEqual(len(failures), 1)
+        self.assertIn('Memory Error', failures[0])
+        # A scenario without a gold value fails instead of going unchecked
+        failures = check_against_gold({'cpu': result}, gold, tolerances)
+        self.assertEqual(len(failures), 3)
+        self.assertTrue(all('no gold value' in failure for failure in failures))
+
+    def test_history_keeps_other_scenarios(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history_file = os.path.join(directory, 'harness_benchmark.csv')
+            add_to_csv(history_file, {'sleep': make_result(0.1), 'cpu': make_result(0.2)}, True)
+            # A run of one scenario keeps the columns and gold of the other
+            add_to_csv(history_file, {'sleep': make_result(0.3)}, False)
+            add_to_csv(history_file, {'sleep': make_result(0.4)}, True)
+            gold = get_gold(history_file, ['sleep', 'cpu', 'spike'])
+            self.assertEqual(gold['sleep']['timing_error'], 0.4)
+            self.assertEqual(gold['cpu']['timing_error'], 0.2)
+            self.assertTrue(all(value != value for value in gold['spike'].values()))
+            # A new scenario adds its columns
+            add_to_csv(history_file, {'spike': make_result(0.5)}, False)
+            df = pd.read_csv(history_file, keep_default_na=False)
+            self.assertEqual(len(df), 4)
+            self.assertIn('cpu Timing Error (s)', df.columns)
+            self.assertIn('spike Timing Error (s)', df.columns)
+            self.assertEqual(df['Machine'].iloc[-1], platform.processor())
+
+
+if __name__ == '__main__':
+    unittest.main()
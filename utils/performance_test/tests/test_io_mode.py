@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import yaml
+
+import io_mode
+from io_mode import evict_from_page_cache, get_mesh_files, get_results_files, prepare_io, stage_input, warm_page_cache
+
+
+def write_input(directory, meshes):
+    # Input file with one procedure per mesh, each writing its own results file
+    procedures = [{'explicit_dynamics_procedure': {'geometry': {'mesh': mesh, 'parts': []}, 'output': {'file': f'results_{i}.exo'}}}
+                  for i, mesh in enumerate(meshes)]
+    input_file = os.path.join(directory, 'input.yaml')
+    with open(input_file, 'w') as file:
+        yaml.safe_dump({'procedures': procedures}, file)
+    return input_file
+
+
+class TestIoMode(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.mesh_dir = os.path.join(self.directory.name, 'mesh')
+        os.makedirs(self.mesh_dir)
+        self.mesh_file = os.path.join(self.mesh_dir, 'block.exo')
+        with open(self.mesh_file, 'wb') as file:
+            file.write(b'\1' * 4096)
+        self.test_dir = os.path.join(self.directory.name, 'test')
+        os.makedirs(self.test_dir)
+        self.input_file = write_input(self.test_dir, ['../mesh/block.exo'])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_mesh_and_results_files(self):
+        # Mesh paths are relative to the input file, not the current directory
+        self.assertEqual(get_mesh_files(self.input_file), [self.mesh_file])
+        self.assertEqual(get_results_files(self.input_file), ['results_0.exo'])
+        input_file = write_input(self.test_dir, ['../mesh/block.exo', '/abs/other.exo'])
+        self.assertEqual(get_mesh_files(input_file), [self.mesh_file, '/abs/other.exo'])
+        self.assertEqual(get_results_files(input_file), ['results_0.exo', 'results_1.exo'])
+
+    def test_stage_input(self):
+        stage_dir = os.path.join(self.directory.name, 'stage')
+        staged_input_file = stage_input(self.input_file, stage_dir)
+        self.assertEqual(staged_input_file, os.path.join(self.test_dir, 'input_staged.yaml'))
+        staged_mesh_file = os.path.join(stage_dir, 'block.exo')
+        self.assertEqual(get_mesh_files(staged_input_file), [staged_mesh_file])
+        with open(staged_mesh_file, 'rb') as file:
+            self.assertEqual(file.read(), b'\1' * 4096)
+        # The original input file is untouched
+        self.assertEqual(get_mesh_files(self.input_file), [self.mesh_file])
+
+        # An up to date copy is kept, a stale one is replaced
+        stage_input(self.input_file, stage_dir)
+        with open(staged_mesh_file, 'rb') as file:
+            self.assertEqual(file.read(), b'\1' * 4096)
+        with open(self.mesh_file, 'wb') as file:
+            file.write(b'\2' * 4096)
+        future = time.time() + 10.0
+        os.utime(self.mesh_file, (future, future))
+        stage_input(self.input_file, stage_dir)
+        with open(staged_mesh_file, 'rb') as file:
+            self.assertEqual(file.read(), b'\2' * 4096)
+
+    def test_page_cache(self):
+        # Missing files are skipped, existing ones are flushed and dropped without changing them
+        evict_from_page_cache(os.path.join(self.directory.name, 'missing.exo'))
+        evict_from_page_cache(self.mesh_file)
+        self.assertGreaterEqual(warm_page_cache(self.mesh_file), 0.0)
+        with open(self.mesh_file, 'rb') as file:
+            self.assertEqual(file.read(), b'\1' * 4096)
+
+    def test_prepare_io(self):
+        with mock.patch.object(io_mode, 'warm_page_cache') as warm, mock.patch.object(io_mode, 'evict_from_page_cache') as evict:
+            prepare_io('none', [self.mesh_file], ['results.exo'])
+            warm.assert_not_called()
+            evict.assert_not_called()
+            prepare_io('warm', [self.mesh_file], ['results.exo'])
+            warm.assert_called_once_with(self.mesh_file)
+            evict.assert_not_called()
+            warm.reset_mock()
+            # Cold runs also drop the old results so they are written to storage again
+            prepare_io('cold', [self.mesh_file], ['results.exo'])
+            warm.assert_not_called()
+            self.assertEqual([call.args[0] for call in evict.call_args_list], [self.mesh_file, 'results.exo'])
+
+    def test_stage_dir_needs_warm(self):
+        # Staging is only done for warm runs, so asking for it with another mode is an error instead of a no-op
+        script = os.path.join(os.path.dirname(io_mode.__file__), 'performance_test.py')
+        result = subprocess.run([sys.executable, script, sys.executable, self.input_file, '--io-mode', 'cold', '--stage-dir', self.directory.name],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn('--stage-dir only applies to --io-mode warm', result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from smoke import fit_setup_and_step, get_num_steps, make_truncated_input
+
+
+class TestSmoke(unittest.TestCase):
+
+    def test_fit_setup_and_step(self):
+        fit = fit_setup_and_step([5, 10, 20], [2.0 + 0.1 * steps for steps in [5, 10, 20]])
+        self.assertAlmostEqual(fit['setup'], 2.0)
+        self.assertAlmostEqual(fit['per_step'], 0.1)
+
+    def test_make_truncated_input(self):
+        full = {'procedures': [{'explicit_dynamics_procedure': {
+            'geometry': {'mesh': '../mesh.exo', 'parts': []},
+            'time_stepper': {'direct_time_stepper': {'time_increment': 1.25e-7, 'time_end': 3.125e-6}},
+            'output': {'file': 'results.exo', 'time_start': 0, 'time_end': 1, 'time_increment': 3.125e-6},
+        }}]}
+        with tempfile.TemporaryDirectory() as directory:
+            input_file = os.path.join(directory, 'input.yaml')
+            with open(input_file, 'w') as file:
+                yaml.safe_dump(full, file)
+            self.assertEqual(get_num_steps(input_file), 25)
+            truncated_file = make_truncated_input(input_file, 4, os.path.join(directory, 'input_smoke_4.yaml'))
+            self.assertEqual(get_num_steps(truncated_file), 4)
+            with open(truncated_file, 'r') as file:
+                procedure = yaml.safe_load(file)['procedures'][0]['explicit_dynamics_procedure']
+        # No output during the run, and the mesh path is untouched
+        self.assertGreater(procedure['output']['time_start'], procedure['time_stepper']['direct_time_stepper']['time_end'])
+        self.assertGreater(procedure['output']['time_increment'], procedure['time_stepper']['direct_time_stepper']['time_end'])
+        self.assertEqual(procedure['geometry']['mesh'], '../mesh.exo')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import platform
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from performance_test import get_test_name
+from sweep import add_to_csv, fit_power_law, make_variant
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_fit_power_law(self):
+        nodes = np.array([1000, 8000, 64000, 512000])
+        fit = fit_power_law(nodes, 2.0e-6 * nodes**1.5)
+        self.assertAlmostEqual(fit['exponent'], 1.5)
+        self.assertAlmostEqual(fit['coefficient'], 2.0e-6)
+        self.assertAlmostEqual(fit['r_squared'], 1.0)
+
+    def test_fit_power_law_n_log_n(self):
+        # n log n over a small ladder fits an exponent just above 1
+        nodes = np.array([1000, 8000, 64000])
+        fit = fit_power_law(nodes, nodes * np.log(nodes))
+        self.assertGreater(fit['exponent'], 1.0)
+        self.assertLess(fit['exponent'], 1.2)
+        self.assertGreater(fit['r_squared'], 0.99)
+
+    def test_make_variant(self):
+        template = {'procedures': [{'explicit_dynamics_procedure': {
+            'geometry': {'mesh': 'mesh.exo', 'parts': []},
+            'time_stepper': {'direct_time_stepper': {'time_increment': 1.0e-6, 'time_end': 1.0e-3}}}}]}
+        with tempfile.TemporaryDirectory() as directory:
+            template_file = os.path.join(directory, 'input.yaml')
+            with open(template_file, 'w') as file:
+                yaml.safe_dump(template, file)
+            variant_file = make_variant(template_file, os.path.join(directory, 'fine.exo'), 1.0e-4, os.path.join(directory, 'input_sweep_0.yaml'))
+            with open(variant_file, 'r') as file:
+                variant = yaml.safe_load(file)
+        procedure = variant['procedures'][0]['explicit_dynamics_procedure']
+        self.assertEqual(procedure['geometry']['mesh'], os.path.join(directory, 'fine.exo'))
+        self.assertEqual(procedure['time_stepper']['direct_time_stepper']['time_end'], 1.0e-4)
+        self.assertEqual(procedure['time_stepper']['direct_time_stepper']['time_increment'], 1.0e-6)
+
+    def test_history_matches_runtime_history(self):
+        # Same naming and Machine column as the runtime_*.csv history of the same test
+        self.assertTrue(get_test_name('/build/Release/aperi-mech', 4, 'cold').endswith('_Release_aperi-mech_num_procs_4_io_cold'))
+        self.assertTrue(get_test_name('/build/Release/aperi-mech', 4).endswith('_Release_aperi-mech_num_procs_4'))
+        points = [{'num_nodes': 1000, 'time': 1.0, 'peak_memory': 10.0}, {'num_nodes': 8000, 'time': 8.0, 'peak_memory': 80.0}]
+        fit = {'exponent': 1.0, 'r_squared': 1.0}
+        with tempfile.TemporaryDirectory() as directory:
+            sweep_file = os.path.join(directory, 'sweep.csv')
+            add_to_csv(sweep_file, sys.executable, points, fit, fit, True)
+            df = pd.read_csv(sweep_file, keep_default_na=False)
+        self.assertEqual(str(df.iloc[-1]['Machine']), platform.processor())
+
+
+if __name__ == '__main__':
+    unittest.main()
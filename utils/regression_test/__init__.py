@@ -1,3 +1,18 @@
 from .regression_test import RegressionTest
 from .regression_test import ExodiffCheck
-from .regression_test import PeakMemoryCheck
\ No newline at end of file
+from .regression_test import PeakMemoryCheck
+from .regression_test import ResourceCheck
+from .regression_test import RESOURCE_STATS
+from .regression_test import supervise
+from .distributed import Coordinator
+from .distributed import Worker
+from .exodus_reader import read_header
+from .exodus_reader import read_mesh_counts
+from .exodus_reader import read_variable
+from .exodus_reader import read_variable_names
+from .exodus_reader import read_time_step
+from .live_compare import LiveComparison
+from .live_compare import read_exodiff_tolerances
+from .launcher import start_launcher
+from .launcher import get_session_launcher
+from .launcher import record_startup_time
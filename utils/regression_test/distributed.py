@@ -0,0 +1,445 @@
+import argparse
+import asyncio
+import glob
+import hmac
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from regression_test import supervise
+
+# Distributed test execution. A coordinator hands out jobs to worker agents running on other hosts.
+#
+# Protocol: newline delimited JSON messages over TCP. Workers connect to the coordinator.
+#   worker -> coordinator: hello     {name, cores, hardware, token}
+#                          heartbeat {}
+#                          log       {job_id, line}
+#                          log_file  {job_id, name, data}  one chunk of a log file written by the job
+#                          result    {job_id, return_code, stats}
+#   coordinator -> worker: job       {job}
+#                          shutdown  {}
+#
+# A job is a command to run in a directory relative to the worker's checkout. Arguments can use the
+# placeholders {python}, {root}, {build_dir} and {stats_file}, which the worker fills in. If the command
+# writes JSON to {stats_file} it is sent back as the job stats.
+#
+# Workers run the commands of the coordinator they connect to, and the connection is not encrypted. Only use
+# this on a trusted network. Set the same token in APERI_MECH_TEST_TOKEN for the coordinator and the workers so
+# the coordinator turns away workers without it. The token is sent in the clear, so it only keeps out
+# connections from other runs and stray clients, not an attacker on the network.
+
+HEARTBEAT_INTERVAL = 5.0  # seconds
+HEARTBEAT_TIMEOUT = 30.0  # seconds without a message before a worker is considered gone
+MAX_ATTEMPTS = 3  # times a job is handed out before it is marked as failed
+UNRUNNABLE_TIMEOUT = 300.0  # seconds a job waits while none of the connected workers has its hardware before it is marked as failed
+HELLO_TIMEOUT = 10.0  # seconds a new connection has to say hello
+MESSAGE_LIMIT = 16 * 1024 * 1024  # bytes in a message, e.g. one very long line of output
+LOG_CHUNK_SIZE = 32 * 1024  # characters of a log file per log_file message
+TOKEN_ENVIRONMENT_VARIABLE = 'APERI_MECH_TEST_TOKEN'
+
+# Root of the aperi-mech_test checkout
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+
+async def _send(writer, message):
+    writer.write((json.dumps(message) + '\n').encode())
+    await writer.drain()
+
+async def _receive(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def detect_hardware():
+    hardware = ['cpu']
+    if shutil.which('nvidia-smi') or shutil.which('rocm-smi'):
+        hardware.append('gpu')
+    return hardware
+
+def make_job(job_id, name, directory, command, hardware='cpu', num_processors=1, exclusive=False):
+    # exclusive jobs (e.g. performance tests) don't share a worker with other jobs
+    return {
+        'id': job_id,
+        'name': name,
+        'directory': directory,
+        'command': command,
+        'hardware': hardware,
+        'num_processors': int(num_processors),
+        'exclusive': exclusive,
+    }
+
+class _WorkerConnection:
+
+    def __init__(self, name, cores, hardware, writer):
+        self.name = name
+        self.cores = cores
+        self.hardware = hardware
+        self.writer = writer
+        self.jobs = {}
+        # Log files received so far for each running job
+        self.logs = {}
+        self.last_seen = time.monotonic()
+
+    def free_cores(self):
+        return self.cores - sum(job['num_processors'] for job in self.jobs.values())
+
+    def can_run(self, job):
+        if job['hardware'] not in self.hardware:
+            return False
+        # An idle worker takes any job it has the hardware for, even if it has fewer cores than requested
+        if not self.jobs:
+            return True
+        if job['exclusive'] or any(running_job['exclusive'] for running_job in self.jobs.values()):
+            return False
+        return job['num_processors'] <= self.free_cores()
+
+def _print_log(worker_name, job, line):
+    print(f"    [{worker_name}] {job['name']}: {line}")
+
+class Coordinator:
+
+    def __init__(self, jobs, host='0.0.0.0', port=0, heartbeat_timeout=HEARTBEAT_TIMEOUT, max_attempts=MAX_ATTEMPTS, on_log=_print_log, on_result=None,
+                 unrunnable_timeout=UNRUNNABLE_TIMEOUT, token=None, hello_timeout=HELLO_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.jobs = {job['id']: job for job in jobs}
+        self.pending = [job['id'] for job in jobs]
+        self.results = {}
+        self.attempts = {job['id']: 0 for job in jobs}
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.unrunnable_timeout = unrunnable_timeout
+        # When each pending job was first seen with no connected worker that has its hardware
+        self.unrunnable_since = {}
+        # Workers must send this token in their hello, if it is set
+        self.token = token
+        self.hello_timeout = hello_timeout
+        self.on_log = on_log
+        self.on_result = on_result
+        self.workers = []
+        self.handlers = set()
+        # Jobs in the same directory share output files, so only one of them runs at a time
+        self.busy_directories = set()
+        self.server = None
+        self.done = None
+
+    async def start(self):
+        self.done = asyncio.Event()
+        if not self.pending:
+            self.done.set()
+        self.server = await asyncio.start_server(self._handle_worker, self.host, self.port, limit=MESSAGE_LIMIT)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Coordinator listening on {self.host}:{self.port} with {len(self.pending)} jobs")
+
+    async def wait(self):
+        watchdog = asyncio.create_task(self._watchdog())
+        try:
+            await self.done.wait()
+        finally:
+            watchdog.cancel()
+            for worker in list(self.workers):
+                try:
+                    await _send(worker.writer, {'type': 'shutdown'})
+                except ConnectionError:
+                    pass
+                worker.writer.close()
+            # Let the handlers see the closed connections and finish
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+            self.server.close()
+            await self.server.wait_closed()
+        return self.results
+
+    async def serve(self):
+        await self.start()
+        return await self.wait()
+
+    async def _handle_worker(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        try:
+            await self._serve_worker(reader, writer)
+        finally:
+            self.handlers.discard(asyncio.current_task())
+
+    async def _serve_worker(self, reader, writer):
+        try:
+            hello = await asyncio.wait_for(_receive(reader), self.hello_timeout)
+        except (ConnectionError, ValueError, asyncio.TimeoutError):
+            hello = None
+        if hello is None or hello.get('type') != 'hello':
+            writer.close()
+            return
+        if self.token is not None and not hmac.compare_digest(str(hello.get('token')), self.token):
+            print(f"Turned away worker {hello.get('name')}: wrong token")
+            writer.close()
+            return
+        worker = _WorkerConnection(hello['name'], int(hello['cores']), hello['hardware'], writer)
+        self.workers.append(worker)
+        print(f"Worker {worker.name} connected: {worker.cores} cores, hardware: {', '.join(worker.hardware)}")
+        try:
+            await self._dispatch()
+            while True:
+                message = await _receive(reader)
+                if message is None:
+                    break
+                worker.last_seen = time.monotonic()
+                if message['type'] == 'log' and message['job_id'] in worker.jobs:
+                    if self.on_log is not None:
+                        self.on_log(worker.name, worker.jobs[message['job_id']], message['line'])
+                elif message['type'] == 'log_file' and message['job_id'] in worker.jobs:
+                    logs = worker.logs.setdefault(message['job_id'], {})
+                    logs[message['name']] = logs.get(message['name'], '') + message['data']
+                elif message['type'] == 'result' and message['job_id'] in worker.jobs:
+                    self._finish_job(worker, message)
+                    await self._dispatch()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            await self._drop_worker(worker)
+
+    async def _watchdog(self):
+        # Close connections to workers that stopped sending heartbeats. Their handler then requeues the jobs.
+        # Fail the jobs that none of the connected workers can run.
+        while True:
+            await asyncio.sleep(min(self.heartbeat_timeout, self.unrunnable_timeout) / 4.0)
+            now = time.monotonic()
+            for worker in list(self.workers):
+                if now - worker.last_seen > self.heartbeat_timeout:
+                    print(f"Worker {worker.name} missed its heartbeats. Dropping it.")
+                    worker.writer.close()
+            self._fail_unrunnable_jobs(now)
+
+    def _fail_unrunnable_jobs(self, now):
+        # Without any workers connected the jobs keep waiting, since workers can connect at any time
+        offered_hardware = {hardware for worker in self.workers for hardware in worker.hardware}
+        for job_id in list(self.pending):
+            job = self.jobs[job_id]
+            if not self.workers or job['hardware'] in offered_hardware:
+                self.unrunnable_since.pop(job_id, None)
+                continue
+            since = self.unrunnable_since.setdefault(job_id, now)
+            if now - since >= self.unrunnable_timeout:
+                self.pending.remove(job_id)
+                del self.unrunnable_since[job_id]
+                self._fail_job(job, 'no worker', f"No connected worker has {job['hardware']} hardware")
+
+    async def _dispatch(self):
+        assignments = []
+        for job_id in list(self.pending):
+            job = self.jobs[job_id]
+            if job['directory'] in self.busy_directories:
+                continue
+            for worker in self.workers:
+                if worker.can_run(job):
+                    self.pending.remove(job_id)
+                    worker.jobs[job_id] = job
+                    self.busy_directories.add(job['directory'])
+                    self.attempts[job_id] += 1
+                    assignments.append((worker, job))
+                    break
+        for worker, job in assignments:
+            try:
+                await _send(worker.writer, {'type': 'job', 'job': job})
+            except ConnectionError:
+                # The worker's handler sees the broken connection and requeues its jobs
+                pass
+
+    def _finish_job(self, worker, message):
+        job = worker.jobs.pop(message['job_id'])
+        self.busy_directories.discard(job['directory'])
+        result = dict(job)
+        result['worker'] = worker.name
+        result['return_code'] = message['return_code']
+        result['stats'] = message.get('stats', {})
+        result['logs'] = worker.logs.pop(message['job_id'], {})
+        self._record_result(result)
+
+    def _fail_job(self, job, worker_name, error):
+        result = dict(job)
+        result['worker'] = worker_name
+        result['return_code'] = 1
+        result['stats'] = {}
+        result['logs'] = {}
+        result['error'] = error
+        self._record_result(result)
+
+    def _record_result(self, result):
+        self.results[result['id']] = result
+        if self.on_result is not None:
+            self.on_result(result)
+        if len(self.results) == len(self.jobs):
+            self.done.set()
+
+    async def _drop_worker(self, worker):
+        if worker not in self.workers:
+            return
+        self.workers.remove(worker)
+        worker.writer.close()
+        if worker.jobs:
+            print(f"Worker {worker.name} disconnected with {len(worker.jobs)} running jobs")
+        # Requeue the jobs that were running on the worker, at the front of the queue
+        for job_id, job in reversed(list(worker.jobs.items())):
+            self.busy_directories.discard(job['directory'])
+            if self.attempts[job_id] >= self.max_attempts:
+                self._fail_job(job, worker.name, f"Lost the worker {self.attempts[job_id]} times")
+            else:
+                self.pending.insert(0, job_id)
+        worker.jobs = {}
+        worker.logs = {}
+        await self._dispatch()
+
+class Worker:
+
+    def __init__(self, host, port, build_dir, root=REPO_ROOT, cores=None, hardware=None, name=None, heartbeat_interval=HEARTBEAT_INTERVAL, token=None):
+        self.host = host
+        self.port = port
+        self.build_dir = build_dir
+        self.root = root
+        self.cores = cores if cores is not None else os.cpu_count()
+        self.hardware = hardware if hardware is not None else detect_hardware()
+        self.name = name if name is not None else f"{os.uname().nodename}:{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.token = token
+        self.writer = None
+        self.send_lock = None
+
+    async def connect(self, timeout=60.0):
+        # Keep trying so workers can be started before the coordinator
+        start_time = time.monotonic()
+        while True:
+            try:
+                return await asyncio.open_connection(self.host, self.port, limit=MESSAGE_LIMIT)
+            except OSError:
+                if time.monotonic() - start_time > timeout:
+                    raise
+                await asyncio.sleep(1.0)
+
+    async def run(self, connect_timeout=60.0):
+        reader, self.writer = await self.connect(connect_timeout)
+        self.send_lock = asyncio.Lock()
+        await self._send({'type': 'hello', 'name': self.name, 'cores': self.cores, 'hardware': self.hardware, 'token': self.token})
+        heartbeat = asyncio.create_task(self._heartbeat())
+        tasks = set()
+        try:
+            while True:
+                try:
+                    message = await _receive(reader)
+                except (ConnectionError, ValueError):
+                    message = None
+                if message is None or message['type'] == 'shutdown':
+                    break
+                if message['type'] == 'job':
+                    task = asyncio.create_task(self._run_job(message['job']))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            heartbeat.cancel()
+            # Anything still running will be requeued by the coordinator. Cancelling kills the processes.
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.writer.close()
+
+    async def _send(self, message):
+        async with self.send_lock:
+            await _send(self.writer, message)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._send({'type': 'heartbeat'})
+            except ConnectionError:
+                return
+
+    def _fill_placeholders(self, arg, stats_file):
+        return arg.replace('{python}', sys.executable).replace('{root}', self.root).replace('{build_dir}', self.build_dir).replace('{stats_file}', stats_file)
+
+    async def _run_job(self, job):
+        directory = os.path.join(self.root, job['directory'])
+        stats_fd, stats_file = tempfile.mkstemp(suffix='.json')
+        os.close(stats_fd)
+        command = [self._fill_placeholders(arg, stats_file) for arg in job['command']]
+        start_time = time.time()
+
+        def on_output(_stream_name, line):
+            # Buffered write, so the lines go out in order without waiting on the connection
+            self.writer.write((json.dumps({'type': 'log', 'job_id': job['id'], 'line': line}) + '\n').encode())
+
+        try:
+            result = await supervise(command, cwd=directory, on_output=on_output)
+            return_code = result['return_code']
+        except OSError as e:
+            await self._send({'type': 'log', 'job_id': job['id'], 'line': f"Failed to run {' '.join(command)}: {e}"})
+            return_code = 1
+
+        stats = {}
+        try:
+            with open(stats_file, 'r') as file:
+                stats = json.load(file)
+        except (FileNotFoundError, ValueError):
+            pass  # The command didn't write any stats, or removed the file
+        if os.path.exists(stats_file):
+            os.remove(stats_file)
+
+        # Send back the log files written by the job, in chunks so a long log doesn't make one huge message
+        for log_file in glob.glob(os.path.join(directory, '*.log')):
+            if os.path.getmtime(log_file) >= start_time:
+                with open(log_file, 'r', errors='replace') as file:
+                    while True:
+                        data = file.read(LOG_CHUNK_SIZE)
+                        await self._send({'type': 'log_file', 'job_id': job['id'], 'name': os.path.basename(log_file), 'data': data})
+                        if len(data) < LOG_CHUNK_SIZE:
+                            break
+
+        await self._send({'type': 'result', 'job_id': job['id'], 'return_code': return_code, 'stats': stats})
+
+def run_coordinator(jobs, address, root_dir=None):
+    # Hand out the jobs to the workers that connect to address, print results as they come in and return them.
+    # Log files sent back by the workers are written to the job directory under root_dir if it doesn't have them.
+    def on_result(result):
+        status = "\033[92mPASS\033[0m" if result['return_code'] == 0 else "\033[91mFAIL\033[0m"
+        print(f"  {status}: {result['name']} on {result['worker']}" + (f" ({result['error']})" if 'error' in result else ""))
+        if root_dir is None:
+            return
+        directory = os.path.join(root_dir, result['directory'])
+        for log_name, content in result['logs'].items():
+            log_file = os.path.join(directory, log_name)
+            if os.path.isdir(directory) and not os.path.exists(log_file):
+                with open(log_file, 'w') as file:
+                    file.write(content)
+
+    host, port = parse_address(address)
+    token = os.environ.get(TOKEN_ENVIRONMENT_VARIABLE)
+    if token is None:
+        print(f"WARNING: {TOKEN_ENVIRONMENT_VARIABLE} is not set, so any client that reaches {address} is taken as a worker. Only use this on a trusted network.")
+    coordinator = Coordinator(jobs, host, port, on_result=on_result, token=token)
+    return asyncio.run(coordinator.serve())
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(description='Worker agent for distributed test runs. Connects to a coordinator started with --coordinator in run_regression_tests.py or run_performance_tests.py.')
+    parser.add_argument('--coordinator', help='Address of the coordinator, host:port', required=True)
+    parser.add_argument('--build_dir', help='Directory containing the build', default='/home/azureuser/projects/aperi-mech/build/')
+    parser.add_argument('--root', help='Root of the aperi-mech_test checkout on this host', default=REPO_ROOT)
+    parser.add_argument('--cores', help='Number of cores to offer. Defaults to all of them.', type=int, default=None)
+    parser.add_argument('--hardware', help='Hardware to offer. Defaults to cpu, plus gpu if nvidia-smi or rocm-smi is found.', nargs='+', choices=['cpu', 'gpu'], default=None)
+    parser.add_argument('--name', help='Name of the worker', default=None)
+    parser.add_argument('--token', help=f'Token the coordinator expects in the hello. Defaults to ${TOKEN_ENVIRONMENT_VARIABLE}. Only use workers on a trusted network: they run the commands the coordinator sends.', default=os.environ.get(TOKEN_ENVIRONMENT_VARIABLE))
+    parser.add_argument('--connect_timeout', help='Seconds to keep trying to reach the coordinator', type=float, default=60.0)
+    return parser.parse_args()
+
+def main():
+    args = _parse_arguments()
+    host, port = parse_address(args.coordinator)
+    worker = Worker(host, port, os.path.abspath(args.build_dir), os.path.abspath(args.root), args.cores, args.hardware, args.name, token=args.token)
+    print(f"Worker {worker.name}: {worker.cores} cores, hardware: {', '.join(worker.hardware)}")
+    asyncio.run(worker.run(args.connect_timeout))
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
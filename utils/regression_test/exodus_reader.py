@@ -0,0 +1,226 @@
+import struct
+import numpy as np
+
+# Minimal reader for Exodus files in the netCDF classic formats (CDF-1, CDF-2 and CDF-5), which is what
+# IOSS writes by default. The header is parsed on its own, so it's cheap even for large meshes, and values
+# are read one variable and time step at a time. Needs neither the exodus.py module from seacas nor netCDF4.
+
+_NC_DIMENSION = 0x0A
+_NC_VARIABLE = 0x0B
+_NC_ATTRIBUTE = 0x0C
+
+# nc_type -> (struct format, size in bytes)
+_NC_TYPES = {
+    1: ('b', 1),  # NC_BYTE
+    2: ('c', 1),  # NC_CHAR
+    3: ('h', 2),  # NC_SHORT
+    4: ('i', 4),  # NC_INT
+    5: ('f', 4),  # NC_FLOAT
+    6: ('d', 8),  # NC_DOUBLE
+    7: ('B', 1),  # NC_UBYTE
+    8: ('H', 2),  # NC_USHORT
+    9: ('I', 4),  # NC_UINT
+    10: ('q', 8),  # NC_INT64
+    11: ('Q', 8),  # NC_UINT64
+}
+
+# Exodus dimension names for the counts reported by read_mesh_counts
+_COUNT_DIMENSIONS = {
+    'num_dim': 'num_dim',
+    'num_nodes': 'num_nodes',
+    'num_elem': 'num_elem',
+    'num_el_blk': 'num_elem_blocks',
+    'num_node_sets': 'num_node_sets',
+    'num_side_sets': 'num_side_sets',
+}
+
+# Exodus variables holding the names of the global, nodal and element results variables
+_NAME_VARIABLES = {
+    'global': 'name_glo_var',
+    'nodal': 'name_nod_var',
+    'element': 'name_elem_var',
+}
+
+def _padded(size):
+    return (size + 3) // 4 * 4
+
+class _HeaderParser:
+
+    def __init__(self, file):
+        self.file = file
+
+    def read(self, size):
+        data = self.file.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated netCDF header")
+        return data
+
+    def int32(self):
+        return struct.unpack('>i', self.read(4))[0]
+
+    def size(self):
+        # Counts, lengths and dimension ids are 8 bytes in CDF-5
+        if self.version == 5:
+            return struct.unpack('>q', self.read(8))[0]
+        return struct.unpack('>i', self.read(4))[0]
+
+    def offset(self):
+        if self.version == 1:
+            return struct.unpack('>i', self.read(4))[0]
+        return struct.unpack('>q', self.read(8))[0]
+
+    def name(self):
+        length = self.size()
+        return self.read(_padded(length))[:length].decode('utf-8')
+
+    def list_header(self, expected_tag):
+        tag = self.int32()
+        count = self.size()
+        if tag == 0 and count == 0:
+            return 0
+        if tag != expected_tag:
+            raise ValueError(f"Unexpected tag {tag} in netCDF header")
+        return count
+
+    def attributes(self):
+        attributes = {}
+        for _ in range(self.list_header(_NC_ATTRIBUTE)):
+            name = self.name()
+            nc_type = self.int32()
+            count = self.size()
+            type_format, type_size = _NC_TYPES[nc_type]
+            data = self.read(_padded(count * type_size))[:count * type_size]
+            if nc_type == 2:
+                attributes[name] = data.decode('utf-8', errors='replace').rstrip('\x00')
+            else:
+                values = struct.unpack(f'>{count}{type_format}', data)
+                attributes[name] = values[0] if count == 1 else list(values)
+        return attributes
+
+    def parse(self):
+        magic = self.read(4)
+        if magic[:3] != b'CDF' or magic[3] not in (1, 2, 5):
+            if magic[:4] == b'\x89HDF':
+                raise ValueError("Exodus file is in the netCDF-4 (HDF5) format. Only the classic formats are supported.")
+            raise ValueError("Not a netCDF classic file")
+        self.version = magic[3]
+        num_records = self.size()
+
+        dimensions = {}
+        unlimited_dimension = None
+        for _ in range(self.list_header(_NC_DIMENSION)):
+            name = self.name()
+            length = self.size()
+            if length == 0:
+                unlimited_dimension = name
+            dimensions[name] = length
+
+        attributes = self.attributes()
+
+        variables = {}
+        dimension_names = list(dimensions)
+        for _ in range(self.list_header(_NC_VARIABLE)):
+            name = self.name()
+            dimension_ids = [self.size() for _ in range(self.size())]
+            variable_attributes = self.attributes()
+            nc_type = self.int32()
+            vsize = self.size()
+            begin = self.offset()
+            variables[name] = {
+                'dimensions': [dimension_names[dimension_id] for dimension_id in dimension_ids],
+                'attributes': variable_attributes,
+                'nc_type': nc_type,
+                'vsize': vsize,
+                'begin': begin,
+            }
+
+        return {
+            'version': self.version,
+            'num_records': num_records,
+            'dimensions': dimensions,
+            'unlimited_dimension': unlimited_dimension,
+            'attributes': attributes,
+            'variables': variables,
+        }
+
+def read_header(filename):
+    with open(filename, 'rb') as file:
+        return _HeaderParser(file).parse()
+
+def read_mesh_counts(filename):
+    # Counts from the Exodus header: num_dim, num_nodes, num_elem, num_elem_blocks, num_node_sets,
+    # num_side_sets and num_time_steps. Missing dimensions are reported as 0.
+    header = read_header(filename)
+    counts = {key: header['dimensions'].get(dimension, 0) for dimension, key in _COUNT_DIMENSIONS.items()}
+    counts['num_time_steps'] = header['num_records'] if header['unlimited_dimension'] is not None else 0
+    return counts
+
+def _record_size(header):
+    # Bytes per record. A lone record variable isn't padded.
+    record_variables = [variable for variable in header['variables'].values() if variable['dimensions'][:1] == [header['unlimited_dimension']]]
+    if len(record_variables) == 1:
+        variable = record_variables[0]
+        count = int(np.prod([header['dimensions'][dimension] for dimension in variable['dimensions'][1:]]))
+        return count * _NC_TYPES[variable['nc_type']][1]
+    return sum(variable['vsize'] for variable in record_variables)
+
+def read_variable(filename, name, step=None, header=None):
+    # Values of a variable as a numpy array. For record (time dependent) variables, step is the 0-based time step.
+    # Raises ValueError if the file doesn't hold the values yet, e.g. while the step is still being written.
+    if header is None:
+        header = read_header(filename)
+    variable = header['variables'][name]
+    dimensions = variable['dimensions']
+    offset = variable['begin']
+    if dimensions[:1] == [header['unlimited_dimension']] and header['unlimited_dimension'] is not None:
+        if step is None or step >= header['num_records']:
+            raise ValueError(f"Time step {step} of {name} is not in {filename}")
+        offset += step * _record_size(header)
+        dimensions = dimensions[1:]
+    shape = [header['dimensions'][dimension] for dimension in dimensions]
+    type_format, type_size = _NC_TYPES[variable['nc_type']]
+    count = int(np.prod(shape))
+    with open(filename, 'rb') as file:
+        file.seek(offset)
+        data = file.read(count * type_size)
+    if len(data) != count * type_size:
+        raise ValueError(f"Truncated data for {name} in {filename}")
+    if variable['nc_type'] == 2:
+        return np.frombuffer(data, dtype='S1').reshape(shape)
+    return np.frombuffer(data, dtype='>' + type_format).reshape(shape).astype(type_format)
+
+def read_variable_names(filename, header=None):
+    # Names of the global, nodal and element results variables, as {'global': [...], 'nodal': [...], 'element': [...]}
+    if header is None:
+        header = read_header(filename)
+    names = {}
+    for kind, name_variable in _NAME_VARIABLES.items():
+        names[kind] = []
+        if name_variable in header['variables']:
+            for row in read_variable(filename, name_variable, header=header):
+                names[kind].append(b''.join(row).split(b'\x00')[0].decode('utf-8').strip())
+    return names
+
+def read_time_step(filename, step, header=None, names=None):
+    # Time and results of one 0-based time step, as {'time': t, 'global': {name: value}, 'nodal': {name: array},
+    # 'element': {name: array}}. Element values of all the blocks holding the variable are concatenated.
+    if header is None:
+        header = read_header(filename)
+    if names is None:
+        names = read_variable_names(filename, header)
+    variables = header['variables']
+    values = {'time': float(read_variable(filename, 'time_whole', step, header)), 'global': {}, 'nodal': {}, 'element': {}}
+    if names['global']:
+        global_values = read_variable(filename, 'vals_glo_var', step, header)
+        values['global'] = {name: global_values[i] for i, name in enumerate(names['global'])}
+    for i, name in enumerate(names['nodal']):
+        if f'vals_nod_var{i+1}' in variables:
+            values['nodal'][name] = read_variable(filename, f'vals_nod_var{i+1}', step, header)
+        else:
+            # Older files store all the nodal variables in one array
+            values['nodal'][name] = read_variable(filename, 'vals_nod_var', step, header)[i]
+    num_blocks = header['dimensions'].get('num_el_blk', 0)
+    for i, name in enumerate(names['element']):
+        blocks = [read_variable(filename, f'vals_elem_var{i+1}eb{j+1}', step, header) for j in range(num_blocks) if f'vals_elem_var{i+1}eb{j+1}' in variables]
+        values['element'][name] = np.concatenate(blocks) if blocks else np.empty(0)
+    return values
@@ -0,0 +1,171 @@
+import csv
+import datetime
+import os
+import platform
+import psutil
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+# How the MPI runs are launched. By default each run starts its own MPI runtime with mpirun. A persistent DVM
+# (distributed virtual machine) started once per session lets each run skip the runtime bring-up, which is a
+# real part of the time of short runs and a source of noise in the timings. The session that starts the DVM
+# publishes it in the environment, so the performance scripts it spawns submit into the same DVM.
+# Under a DVM the ranks are children of the DVM daemon, not of the command that submits them. Each run is
+# given a job ID in the environment of its ranks, so they can be found under the daemon and measured.
+
+DVM_ENVIRONMENT_VARIABLE = 'APERI_MECH_TEST_DVM'  # '<kind>:<daemon pid>:<uri file>' of the running DVM
+JOB_ENVIRONMENT_VARIABLE = 'APERI_MECH_TEST_JOB'  # Job ID of a run, set in the environment of its ranks
+DVM_START_TIMEOUT = 30.0  # seconds to wait for the DVM to report its URI
+STARTUP_COLUMNS = ['Date', 'Time', 'Launcher', 'Startup Time (s)', 'Machine']
+
+# The DVMs of Open MPI 5 (PRRTE) and Open MPI 4 (ORTE): the command to start one, the command to submit a run
+# and the command to stop it, if any
+DVM_KINDS = {
+    'prte': {
+        'start': ['prte', '--report-uri', '{uri_file}'],
+        'submit': ['prun', '--dvm-uri', 'file:{uri_file}', '-n', '{num_procs}'],
+        'stop': ['pterm', '--dvm-uri', 'file:{uri_file}'],
+    },
+    'orte': {
+        'start': ['orte-dvm', '--report-uri', '{uri_file}'],
+        'submit': ['mpiexec', '--hnp', 'file:{uri_file}', '-n', '{num_procs}'],
+        'stop': None,
+    },
+}
+
+def _fill(command, **values):
+    return [arg.format(**values) for arg in command]
+
+class MpirunLauncher:
+    # A fresh MPI runtime for every run
+    name = 'mpirun'
+    startup_time = 0.0
+    # The ranks are in the process tree of mpirun, so they are measured and waited for with it
+    ranks_are_children = True
+
+    def command(self, num_procs, job_id=None):
+        return ['mpirun', '-n', str(num_procs)]
+
+    def find_ranks(self, job_id):
+        return []
+
+    def stop(self):
+        pass
+
+class DvmLauncher:
+    # Submits runs into a DVM that is already running, started by this process or the session that spawned it
+
+    ranks_are_children = False
+
+    def __init__(self, kind, uri_file, daemon_pid, process=None, startup_time=0.0):
+        self.kind = kind
+        self.name = kind + '-dvm'
+        self.uri_file = uri_file
+        # The DVM daemon, which starts the ranks of every run
+        self.daemon_pid = daemon_pid
+        # The DVM process if this launcher started it, so it can stop it
+        self.process = process
+        self.startup_time = startup_time
+
+    def command(self, num_procs, job_id=None):
+        command = _fill(DVM_KINDS[self.kind]['submit'], uri_file=self.uri_file, num_procs=num_procs)
+        if job_id is not None:
+            command += ['-x', f'{JOB_ENVIRONMENT_VARIABLE}={job_id}']
+        return command
+
+    def find_ranks(self, job_id):
+        # The processes the daemon started for the run with job_id. Their own children carry the job ID too.
+        try:
+            processes = psutil.Process(self.daemon_pid).children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+        ranks = []
+        for proc in processes:
+            try:
+                if proc.environ().get(JOB_ENVIRONMENT_VARIABLE) == job_id:
+                    ranks.append(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return ranks
+
+    def stop(self):
+        if self.process is None:
+            return
+        stop_command = DVM_KINDS[self.kind]['stop']
+        if stop_command is not None:
+            subprocess.run(_fill(stop_command, uri_file=self.uri_file), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(DVM_START_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+        if os.environ.get(DVM_ENVIRONMENT_VARIABLE) == f'{self.kind}:{self.daemon_pid}:{self.uri_file}':
+            del os.environ[DVM_ENVIRONMENT_VARIABLE]
+        shutil.rmtree(os.path.dirname(self.uri_file), ignore_errors=True)
+
+def _start_dvm(kind):
+    # Returns a DvmLauncher, or None if this kind of DVM isn't installed or doesn't come up
+    commands = DVM_KINDS[kind]
+    needed = [commands['start'][0], commands['submit'][0]] + ([commands['stop'][0]] if commands['stop'] is not None else [])
+    if not all(shutil.which(executable) for executable in needed):
+        return None
+    uri_file = os.path.join(tempfile.mkdtemp(prefix='aperi-mech_dvm_'), 'dvm.uri')
+    start_time = time.perf_counter()
+    process = subprocess.Popen(_fill(commands['start'], uri_file=uri_file), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # The DVM is ready once it has written its URI
+    while time.perf_counter() - start_time < DVM_START_TIMEOUT:
+        if process.poll() is not None:
+            break
+        if os.path.exists(uri_file) and os.path.getsize(uri_file) > 0:
+            return DvmLauncher(kind, uri_file, process.pid, process, time.perf_counter() - start_time)
+        time.sleep(0.05)
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+    shutil.rmtree(os.path.dirname(uri_file), ignore_errors=True)
+    return None
+
+def start_launcher(launcher_name='mpirun'):
+    # 'mpirun', or 'dvm' for a persistent DVM (PRRTE, then ORTE) that falls back to mpirun if neither comes up.
+    # A started DVM is published in the environment for child processes and must be stopped with stop().
+    if launcher_name == 'dvm':
+        for kind in DVM_KINDS:
+            launcher = _start_dvm(kind)
+            if launcher is not None:
+                os.environ[DVM_ENVIRONMENT_VARIABLE] = f'{kind}:{launcher.daemon_pid}:{launcher.uri_file}'
+                print(f"Started a persistent {kind} DVM in {launcher.startup_time:.4e} s")
+                return launcher
+        print("No persistent MPI runtime (prte or orte-dvm) could be started. Falling back to mpirun.")
+    return MpirunLauncher()
+
+def get_session_launcher():
+    # The DVM published by the session that started this process, or mpirun if there is none or it is gone
+    value = os.environ.get(DVM_ENVIRONMENT_VARIABLE)
+    if value:
+        kind, _separator, value = value.partition(':')
+        daemon_pid, _separator, uri_file = value.partition(':')
+        if kind in DVM_KINDS and daemon_pid.isdigit() and psutil.pid_exists(int(daemon_pid)) and os.path.exists(uri_file):
+            return DvmLauncher(kind, uri_file, int(daemon_pid))
+    return MpirunLauncher()
+
+def record_startup_time(launcher, directory):
+    # Append the startup time of a DVM this session started to the startup history in directory, so it is tracked
+    # apart from the test times. Returns the history file, or None for mpirun, which has no separate startup.
+    if launcher.name == 'mpirun':
+        return None
+    machine_info = [platform.node(), platform.system(), platform.processor()]
+    history_file = os.path.join(directory, 'mpi_runtime_startup_' + '_'.join(machine_info) + '.csv')
+    new_file = not os.path.exists(history_file)
+    now = datetime.datetime.now()
+    with open(history_file, 'a', newline='') as file:
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(STARTUP_COLUMNS)
+        writer.writerow([now.date(), now.time(), launcher.name, launcher.startup_time, platform.processor()])
+    return history_file
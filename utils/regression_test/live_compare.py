@@ -0,0 +1,230 @@
+import os
+import numpy as np
+try:
+    from .exodus_reader import read_header, read_time_step, read_variable, read_variable_names
+except ImportError:
+    # Imported from this directory, e.g. by the tests
+    from exodus_reader import read_header, read_time_step, read_variable, read_variable_names
+
+# Compares a results file against the gold file while the run is still writing it, using the tolerances of the
+# exodiff command file. The run can then be stopped at the first time step out of tolerance instead of at the end.
+
+# Used by exodiff for variables without a tolerance
+DEFAULT_TOLERANCE = {'type': 'relative', 'value': 1.0e-6, 'floor': 0.0}
+
+TOLERANCE_TYPES = ['relative', 'absolute', 'combined', 'ulps_float', 'ulps_double', 'eigen_relative', 'eigen_absolute', 'eigen_combined', 'ignore']
+
+# Section headings of the exodiff command file that are compared live
+_SECTIONS = {
+    'COORDINATES': 'coordinates',
+    'TIME STEPS': 'time_steps',
+    'GLOBAL VARIABLES': 'global',
+    'NODAL VARIABLES': 'nodal',
+    'ELEMENT VARIABLES': 'element',
+}
+
+# Names used when reporting the location of the largest difference
+_ENTITY_NAMES = {'coordinates': 'node', 'nodal': 'node', 'element': 'element'}
+
+def _parse_tolerance(tokens, default):
+    # e.g. ['relative', '1.e-6', 'floor', '0.0']. Missing parts come from default.
+    tolerance = dict(default)
+    i = 0
+    while i < len(tokens):
+        token = tokens[i].lower()
+        if token in TOLERANCE_TYPES:
+            tolerance['type'] = token
+            if token != 'ignore' and i + 1 < len(tokens) and tokens[i+1].lower() != 'floor':
+                tolerance['value'] = float(tokens[i+1])
+                i += 1
+        elif token == 'floor' and i + 1 < len(tokens):
+            tolerance['floor'] = float(tokens[i+1])
+            i += 1
+        i += 1
+    return tolerance
+
+def read_exodiff_tolerances(compare_file):
+    # Tolerances from an exodiff command file (the file given to exodiff with -f). Returns a dict with
+    # 'coordinates' and 'time_steps' tolerances (None if not compared) and, for 'global', 'nodal' and 'element',
+    # None if not compared or {'default': tolerance, 'variables': {name: tolerance} or None for all, 'excluded': set}.
+    tolerances = {section: None for section in _SECTIONS.values()}
+    section = None
+    with open(compare_file, 'r') as file:
+        for line in file:
+            line = line.split('#')[0].rstrip()
+            if not line.strip():
+                continue
+            if line[0].isspace():
+                # Variable of the current section, optionally with its own tolerance
+                if section not in ('global', 'nodal', 'element'):
+                    continue
+                tokens = line.split()
+                name = tokens[0]
+                if name.startswith('!'):
+                    tolerances[section]['excluded'].add(name[1:])
+                    continue
+                if tolerances[section]['variables'] is None:
+                    tolerances[section]['variables'] = {}
+                tolerances[section]['variables'][name] = _parse_tolerance(tokens[1:], tolerances[section]['default'])
+                continue
+            section = None
+            for heading, key in _SECTIONS.items():
+                if line.upper().startswith(heading):
+                    section = key
+                    tolerance = _parse_tolerance(line[len(heading):].split(), DEFAULT_TOLERANCE)
+                    if key in ('coordinates', 'time_steps'):
+                        tolerances[key] = tolerance
+                    else:
+                        tolerances[key] = {'default': tolerance, 'variables': None, 'excluded': set()}
+                    break
+    return tolerances
+
+def _ordered_bits(values, float_type, int_type):
+    # Maps floats to integers that are ordered like the floats, so their difference counts the representable values between them
+    bits = np.asarray(values, dtype=float_type).view(int_type).astype(np.float64)
+    return np.where(bits < 0, float(np.iinfo(int_type).min) - bits, bits)
+
+def exceeds_tolerance(tolerance, gold_values, values):
+    # Boolean array, True where values differ from gold_values by more than the tolerance. Follows exodiff:
+    # values are equal if both are within the floor of zero. A non finite value where the gold one is finite always fails.
+    gold_values = np.atleast_1d(np.asarray(gold_values, dtype=np.float64))
+    values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+    tolerance_type = tolerance['type']
+    if tolerance_type == 'ignore':
+        return np.zeros(values.shape, dtype=bool)
+    if tolerance_type.startswith('eigen_'):
+        # Eigenvectors can flip sign
+        gold_values = np.abs(gold_values)
+        values = np.abs(values)
+        tolerance_type = tolerance_type[len('eigen_'):]
+    with np.errstate(invalid='ignore', over='ignore'):
+        difference = np.abs(values - gold_values)
+        magnitude = np.maximum(np.abs(values), np.abs(gold_values))
+        if tolerance_type == 'relative':
+            exceeded = difference > tolerance['value'] * magnitude
+        elif tolerance_type == 'absolute':
+            exceeded = difference > tolerance['value']
+        elif tolerance_type == 'combined':
+            exceeded = difference > tolerance['value'] * np.maximum(1.0, magnitude)
+        elif tolerance_type == 'ulps_float':
+            exceeded = np.abs(_ordered_bits(values, np.float32, np.int32) - _ordered_bits(gold_values, np.float32, np.int32)) > tolerance['value']
+        else:
+            exceeded = np.abs(_ordered_bits(values, np.float64, np.int64) - _ordered_bits(gold_values, np.float64, np.int64)) > tolerance['value']
+        exceeded &= ~((np.abs(values) <= tolerance['floor']) & (np.abs(gold_values) <= tolerance['floor']))
+    exceeded |= np.isfinite(gold_values) & ~np.isfinite(values)
+    return exceeded
+
+def _describe(name, section, gold_values, values, exceeded):
+    gold_values = np.atleast_1d(gold_values)
+    values = np.atleast_1d(values)
+    with np.errstate(invalid='ignore'):
+        difference = np.where(exceeded, np.abs(values - gold_values), 0.0)
+    # A non finite value is the worst difference
+    difference[exceeded & ~np.isfinite(difference)] = np.inf
+    index = int(np.argmax(difference))
+    location = f" at {_ENTITY_NAMES[section]} {index + 1}" if section in _ENTITY_NAMES else ""
+    return f"{name}: {values[index]:.8g} vs gold {gold_values[index]:.8g}{location} ({int(np.count_nonzero(exceeded))} values out of tolerance)"
+
+class LiveComparison:
+    # Compares the time steps of results_file against gold_file as they are written. check() is cheap to call often:
+    # the results file is only read when it has changed. netCDF counts a record as soon as its first variable is
+    # written, so a step is only compared once the next one has started. The last step is left to exodiff.
+
+    def __init__(self, results_file, gold_file, compare_file):
+        self.results_file = results_file
+        self.gold_file = gold_file
+        self.tolerances = read_exodiff_tolerances(compare_file)
+        self.gold_header = read_header(gold_file)
+        self.gold_names = read_variable_names(gold_file, self.gold_header)
+        self.results_state = None
+        self.coordinates_compared = False
+        # Next 0-based time step to compare
+        self.next_step = 0
+        # Description of the first difference found
+        self.failure = None
+
+    def _compare(self, section, name, tolerance, gold_values, values):
+        if np.shape(gold_values) != np.shape(values):
+            return f"{name}: {np.size(values)} values vs {np.size(gold_values)} in gold"
+        exceeded = exceeds_tolerance(tolerance, gold_values, values)
+        if exceeded.any():
+            return _describe(name, section, gold_values, values, exceeded)
+        return None
+
+    def _compare_coordinates(self, header):
+        differences = []
+        tolerance = self.tolerances['coordinates']
+        for name in ['coordx', 'coordy', 'coordz']:
+            if tolerance is None or name not in self.gold_header['variables']:
+                continue
+            if name not in header['variables']:
+                differences.append(f"{name}: missing")
+                continue
+            difference = self._compare('coordinates', name, tolerance, read_variable(self.gold_file, name, header=self.gold_header), read_variable(self.results_file, name, header=header))
+            if difference is not None:
+                differences.append(difference)
+        return differences
+
+    def _compare_step(self, header, names, step):
+        gold_values = read_time_step(self.gold_file, step, self.gold_header, self.gold_names)
+        values = read_time_step(self.results_file, step, header, names)
+        differences = []
+        if self.tolerances['time_steps'] is not None:
+            difference = self._compare('time_steps', 'time', self.tolerances['time_steps'], gold_values['time'], values['time'])
+            if difference is not None:
+                differences.append(difference)
+        for section in ['global', 'nodal', 'element']:
+            section_tolerances = self.tolerances[section]
+            if section_tolerances is None:
+                continue
+            variable_names = self.gold_names[section] if section_tolerances['variables'] is None else list(section_tolerances['variables'])
+            for name in variable_names:
+                if name in section_tolerances['excluded']:
+                    continue
+                tolerance = section_tolerances['default'] if section_tolerances['variables'] is None else section_tolerances['variables'][name]
+                if name not in gold_values[section]:
+                    continue
+                if name not in values[section]:
+                    differences.append(f"{name}: missing")
+                    continue
+                difference = self._compare(section, name, tolerance, gold_values[section][name], values[section][name])
+                if difference is not None:
+                    differences.append(difference)
+        return values['time'], differences
+
+    def check(self):
+        # Compare any new time steps. Returns a message for the first step out of tolerance, otherwise None.
+        if self.failure is not None:
+            return self.failure
+        try:
+            stat = os.stat(self.results_file)
+        except OSError:
+            return None
+        state = (stat.st_size, stat.st_mtime_ns)
+        if state == self.results_state:
+            return None
+        try:
+            header = read_header(self.results_file)
+            # The coordinates are written before the first step
+            if header['num_records'] == 0:
+                return None
+            names = read_variable_names(self.results_file, header)
+            if not self.coordinates_compared:
+                differences = self._compare_coordinates(header)
+                self.coordinates_compared = True
+                if differences:
+                    self.failure = "Coordinates are out of tolerance:\n    " + "\n    ".join(differences)
+                    return self.failure
+            num_steps = min(header['num_records'] - 1, self.gold_header['num_records'])
+            while self.next_step < num_steps:
+                time, differences = self._compare_step(header, names, self.next_step)
+                if differences:
+                    # 1-based like exodiff
+                    self.failure = f"Time step {self.next_step + 1} (time {time:.6g}) is out of tolerance:\n    " + "\n    ".join(differences)
+                    return self.failure
+                self.next_step += 1
+        except (ValueError, KeyError, IndexError):
+            # Partly written or not a netCDF classic file. Try again once it changes.
+            pass
+        self.results_state = state
+        return None
@@ -0,0 +1,114 @@
+import json
+import os
+import numpy as np
+import yaml
+try:
+    from .exodus_reader import read_mesh_counts
+except ImportError:
+    # Imported from this directory, e.g. by the tests
+    from exodus_reader import read_mesh_counts
+
+# Pre-flight estimates of the peak memory and runtime of a run, from the mesh, formulation, step count and number
+# of processors. The estimates are linear fits over earlier runs, recorded in a JSON lines history file.
+
+MIN_RECORDS = 3  # runs needed before a fit is trusted
+MEMORY_SAFETY_FACTOR = 1.25  # margin on the predicted peak memory when deciding if a test fits
+
+def _formulation(input_node):
+    # ('finite_element' or 'reproducing_kernel', 'gauss_quadrature' or 'strain_smoothing'). Any part using
+    # reproducing kernels or strain smoothing counts for the whole run.
+    approximation_space = 'finite_element'
+    integration_scheme = 'gauss_quadrature'
+    for procedure in input_node['procedures']:
+        for procedure_node in procedure.values():
+            for part in procedure_node['geometry'].get('parts', []):
+                formulation = part['part'].get('formulation', {})
+                if 'reproducing_kernel' in (formulation.get('approximation_space') or {}):
+                    approximation_space = 'reproducing_kernel'
+                if 'strain_smoothing' in (formulation.get('integration_scheme') or {}):
+                    integration_scheme = 'strain_smoothing'
+    return approximation_space, integration_scheme
+
+def _num_steps(input_node):
+    num_steps = 0
+    for procedure in input_node['procedures']:
+        for procedure_node in procedure.values():
+            for time_stepper in procedure_node.get('time_stepper', {}).values():
+                if 'time_end' in time_stepper and 'time_increment' in time_stepper:
+                    num_steps += int(round(time_stepper['time_end'] / time_stepper['time_increment']))
+    return max(num_steps, 1)
+
+def get_features(input_file, num_procs):
+    # What the run depends on, from the input file and the header of its mesh. The mesh path is relative to the input file.
+    with open(input_file, 'r') as file:
+        input_node = yaml.safe_load(file)
+    mesh_file = None
+    for procedure in input_node['procedures']:
+        for procedure_node in procedure.values():
+            mesh_file = os.path.join(os.path.dirname(os.path.abspath(input_file)), procedure_node['geometry']['mesh'])
+    counts = read_mesh_counts(mesh_file)
+    approximation_space, integration_scheme = _formulation(input_node)
+    return {
+        'num_nodes': counts['num_nodes'],
+        'num_elem': counts['num_elem'],
+        'approximation_space': approximation_space,
+        'integration_scheme': integration_scheme,
+        'num_steps': _num_steps(input_node),
+        'num_procs': int(num_procs),
+    }
+
+def _memory_terms(features):
+    # Per rank peak memory is fit against the nodes and elements each rank holds
+    num_procs = features['num_procs']
+    return [1.0, features['num_nodes'] / num_procs, features['num_elem'] / num_procs]
+
+def _runtime_terms(features):
+    num_procs = features['num_procs']
+    num_steps = features['num_steps']
+    return [1.0, num_steps * features['num_nodes'] / num_procs, num_steps * features['num_elem'] / num_procs]
+
+def _fit(rows, values):
+    coefficients, _residuals, _rank, _singular_values = np.linalg.lstsq(np.asarray(rows, dtype=float), np.asarray(values, dtype=float), rcond=None)
+    return coefficients
+
+def read_history(history_file):
+    if history_file is None or not os.path.exists(history_file):
+        return []
+    with open(history_file, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def append_to_history(history_file, features, peak_memory, runtime):
+    # peak_memory is the total over all ranks, in MB
+    record = dict(features)
+    record['peak_memory'] = peak_memory
+    record['runtime'] = runtime
+    with open(history_file, 'a') as file:
+        file.write(json.dumps(record) + '\n')
+
+class Predictor:
+
+    def __init__(self, records):
+        self.records = [record for record in records if record.get('peak_memory') and record.get('runtime')]
+
+    def _matching_records(self, features):
+        # Runs with the same formulation if there are enough, otherwise all of them
+        matching = [record for record in self.records if record['approximation_space'] == features['approximation_space'] and record['integration_scheme'] == features['integration_scheme']]
+        if len(matching) >= MIN_RECORDS:
+            return matching
+        return self.records
+
+    def predict(self, features):
+        # Returns {'peak_memory': MB over all ranks, 'peak_memory_per_rank': MB, 'runtime': s}, or None without enough history
+        records = self._matching_records(features)
+        if len(records) < MIN_RECORDS:
+            return None
+        memory_coefficients = _fit([_memory_terms(record) for record in records], [record['peak_memory'] / record['num_procs'] for record in records])
+        runtime_coefficients = _fit([_runtime_terms(record) for record in records], [record['runtime'] for record in records])
+        # A fit over few runs can extrapolate below zero. Never predict less than the smallest run seen.
+        peak_memory_per_rank = max(float(np.dot(memory_coefficients, _memory_terms(features))), min(record['peak_memory'] / record['num_procs'] for record in records))
+        runtime = max(float(np.dot(runtime_coefficients, _runtime_terms(features))), min(record['runtime'] for record in records))
+        return {
+            'peak_memory': peak_memory_per_rank * features['num_procs'],
+            'peak_memory_per_rank': peak_memory_per_rank,
+            'runtime': runtime,
+        }
@@ -1,51 +1,314 @@
 import argparse
+import asyncio
 import subprocess
 import os
+import signal
 import sys
 import datetime
+import functools
 import time
+import uuid
 import psutil
+try:
+    from .launcher import get_session_launcher
+except ImportError:
+    # Imported from this directory, e.g. by the tests
+    from launcher import get_session_launcher
+
+# Resource usage recorded for every run, from wait4. Covers the whole process tree since mpirun waits for
+# its ranks. Unknown (None) when the ranks are started by a DVM instead. Also gives the units used when logging them.
+RESOURCE_STATS = {
+    'user_time': 's',
+    'system_time': 's',
+    'voluntary_context_switches': '',
+    'involuntary_context_switches': '',
+    'minor_page_faults': '',
+    'major_page_faults': '',
+    'read_bytes': 'B',
+    'write_bytes': 'B',
+}
 
 def _log_output(log_file, message):
     with open(log_file, 'a') as f:
         f.write(message)
 
-def _run_executable(command_pre, executable_path, command_args, log_file, check_memory=False):
+def _rusage_stats(usage):
+    # ru_inblock and ru_oublock count 512 byte blocks read from / written to storage
+    return {
+        'user_time': usage.ru_utime,
+        'system_time': usage.ru_stime,
+        'voluntary_context_switches': usage.ru_nvcsw,
+        'involuntary_context_switches': usage.ru_nivcsw,
+        'minor_page_faults': usage.ru_minflt,
+        'major_page_faults': usage.ru_majflt,
+        'read_bytes': usage.ru_inblock * 512,
+        'write_bytes': usage.ru_oublock * 512,
+    }
+
+# Process supervision. Everything below runs on an asyncio event loop so one thread can supervise many
+# concurrent processes. Waiting on exit uses a pidfd, so an unmonitored process costs nothing until it exits.
+
+SAMPLE_INTERVAL = 0.01  # seconds between samples of the process tree when monitoring memory or I/O
+KILL_GRACE_PERIOD = 5.0  # seconds between SIGTERM and SIGKILL when a deadline is hit
+READ_CHUNK_SIZE = 65536
+STOP_CHECK_INTERVAL = 0.5  # seconds between calls to the stop check of a run
+
+async def _open_pipe_reader(pipe):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader
+
+async def _read_stream(reader, stream_name, chunks, on_output):
+    # Collect the output and pass complete lines to on_output as they arrive
+    partial = b''
+    while True:
+        data = await reader.read(READ_CHUNK_SIZE)
+        if not data:
+            break
+        chunks.append(data)
+        if on_output is not None:
+            lines = (partial + data).split(b'\n')
+            partial = lines.pop()
+            for line in lines:
+                on_output(stream_name, line.decode(errors='replace'))
+    if partial and on_output is not None:
+        on_output(stream_name, partial.decode(errors='replace'))
+
+def _wait_for_exit(pid):
+    # Returns a future with the exit code and the resource usage of the process and the descendants it waited for.
+    # wait4 is used instead of waitpid so the resource usage is per process, even with many running at once.
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def reap(options):
+        waited_pid, status, usage = os.wait4(pid, options)
+        if waited_pid == 0:
+            return False
+        future.set_result((os.waitstatus_to_exitcode(status), usage))
+        return True
+
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        pidfd = None
+
+    if pidfd is not None:
+        def on_readable():
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+            reap(0)
+        loop.add_reader(pidfd, on_readable)
+    else:
+        # No pidfd (old kernel or not Linux), poll instead
+        async def poll():
+            while not reap(os.WNOHANG):
+                await asyncio.sleep(SAMPLE_INTERVAL)
+        poll_task = asyncio.ensure_future(poll())
+        # Also keeps a reference to the task until the process exits
+        future.add_done_callback(lambda _future: poll_task.cancel())
+    return future
+
+def _signal_tree(ps_process, sig):
+    # Signal the children first so mpirun doesn't leave orphaned ranks behind
+    try:
+        processes = ps_process.children(recursive=True) + [ps_process]
+    except psutil.NoSuchProcess:
+        return
+    for proc in processes:
+        try:
+            proc.send_signal(sig)
+        except psutil.NoSuchProcess:
+            continue
+
+class _TreeMonitor:
+    # Samples memory and I/O of a process and all of its descendants, and of the processes find_ranks() returns,
+    # for ranks that were started outside the process tree
+
+    def __init__(self, ps_process, mesh_files=None, find_ranks=None):
+        self.ps_process = ps_process
+        self.find_ranks = find_ranks
+        self.mesh_files = {os.path.realpath(mesh_file) for mesh_file in mesh_files} if mesh_files else None
+        self.start_time = time.perf_counter()
+        self.peak_memory = 0
+        # Last seen /proc I/O counters of each process in the tree, kept after the process exits
+        self.io_chars = {}
+        # Mesh file reads of each process (rank) that opened a mesh file: the read position of each of its mesh file
+        # descriptors, when it last advanced or the files were closed, and whether they were closed
+        self.mesh_reads = {}
+
+    def _sample_mesh_reads(self, proc, now):
+        record = self.mesh_reads.get(proc.pid)
+        if record is not None and record['closed']:
+            return
+        positions = {open_file.fd: open_file.position for open_file in proc.open_files() if open_file.path in self.mesh_files}
+        if record is None:
+            if positions:
+                self.mesh_reads[proc.pid] = {'positions': positions, 'end': None, 'closed': False, 'close_time': None}
+            return
+        if not positions:
+            # An exiting process closes its files too. It only counts as a close if the process is still there
+            # at the next sample.
+            if record['close_time'] is None:
+                record['close_time'] = now
+            else:
+                record['closed'] = True
+                record['end'] = record['close_time']
+            return
+        record['close_time'] = None
+        if any(fd in record['positions'] and position != record['positions'][fd] for fd, position in positions.items()):
+            record['end'] = now
+        record['positions'] = positions
+
+    def get_mesh_read_time(self):
+        # Time until the slowest rank closed the mesh files, or last moved its read position in them if it keeps
+        # them open. None if no rank was seen with a mesh file open, or a rank read it without moving the position
+        # (pread) and kept it open, since there is then nothing to tell when it finished.
+        if not self.mesh_reads or any(record['end'] is None for record in self.mesh_reads.values()):
+            return None
+        return max(record['end'] for record in self.mesh_reads.values()) - self.start_time
+
+    def sample(self):
+        total_memory = 0
+        now = time.perf_counter()
+        try:
+            processes = [self.ps_process] + self.ps_process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        if self.find_ranks is not None:
+            processes += self.find_ranks()
+        for proc in processes:
+            try:
+                total_memory += proc.memory_info().rss  # Sum memory of the main process and all child processes
+                io_counters = proc.io_counters()
+                self.io_chars[proc.pid] = (io_counters.read_chars, io_counters.write_chars)
+                if self.mesh_files is not None:
+                    self._sample_mesh_reads(proc, now)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue  # Process has finished and can no longer be queried
+        self.peak_memory = max(self.peak_memory, total_memory)
+
+    async def run(self, interval):
+        while True:
+            self.sample()
+            await asyncio.sleep(interval)
+
+async def _poll_stop_check(stop_check, interval):
+    # Returns the first reason stop_check gives to stop. It runs in a thread since it may read files.
+    loop = asyncio.get_running_loop()
+    while True:
+        reason = await loop.run_in_executor(None, stop_check)
+        if reason is not None:
+            return reason
+        await asyncio.sleep(interval)
+
+async def supervise(command, cwd=None, check_memory=False, mesh_files=None, timeout=None, on_output=None, sample_interval=SAMPLE_INTERVAL, stop_check=None, stop_check_interval=STOP_CHECK_INTERVAL, find_ranks=None):
+    # Run command to completion on the current event loop. Returns a dict with the return code, the captured
+    # stdout and stderr, whether the deadline was hit, why it was stopped early and the stats of the run.
+    # on_output(stream_name, line) is called for each line of output as it arrives. stop_check() is called
+    # periodically while the command runs. If it returns a reason (not None), the command is stopped like on a timeout.
+    # If mesh_files is given, the time until every process that opened them is done reading is 'mesh_read_time'.
+    # find_ranks() returns the ranks of the run when they aren't descendants of command, e.g. under a DVM. They
+    # are sampled like the descendants, but their resource usage from wait4 is unknown.
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    exit_future = _wait_for_exit(process.pid)
+    stdout_chunks = []
+    stderr_chunks = []
+    readers = [
+        asyncio.ensure_future(_read_stream(await _open_pipe_reader(process.stdout), 'stdout', stdout_chunks, on_output)),
+        asyncio.ensure_future(_read_stream(await _open_pipe_reader(process.stderr), 'stderr', stderr_chunks, on_output)),
+    ]
+
+    try:
+        ps_process = psutil.Process(process.pid)
+    except psutil.NoSuchProcess:
+        ps_process = None
+
+    monitor = None
+    monitor_task = None
+    if ps_process is not None and (check_memory or mesh_files is not None):
+        monitor = _TreeMonitor(ps_process, mesh_files, find_ranks)
+        monitor_task = asyncio.ensure_future(monitor.run(sample_interval))
+
+    stop_task = None
+    if stop_check is not None:
+        stop_task = asyncio.ensure_future(_poll_stop_check(stop_check, stop_check_interval))
+
+    timed_out = False
+    stop_reason = None
+    try:
+        done, _pending = await asyncio.wait([exit_future] + ([stop_task] if stop_task is not None else []), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if exit_future in done:
+            return_code, usage = exit_future.result()
+        else:
+            if stop_task is not None and stop_task in done:
+                stop_reason = stop_task.result()
+            else:
+                timed_out = True
+            if ps_process is not None:
+                _signal_tree(ps_process, signal.SIGTERM)
+            try:
+                return_code, usage = await asyncio.wait_for(asyncio.shield(exit_future), KILL_GRACE_PERIOD)
+            except asyncio.TimeoutError:
+                if ps_process is not None:
+                    _signal_tree(ps_process, signal.SIGKILL)
+                return_code, usage = await exit_future
+    except asyncio.CancelledError:
+        # Don't leave the processes running when the supervisor is cancelled
+        if ps_process is not None:
+            _signal_tree(ps_process, signal.SIGKILL)
+        raise
+    finally:
+        if monitor_task is not None:
+            monitor_task.cancel()
+        if stop_task is not None:
+            stop_task.cancel()
+    # Popen didn't reap the process, so tell it the result
+    process.returncode = return_code
+
+    # Orphaned grandchildren can hold the pipes open. Don't wait on them forever.
+    _done, pending = await asyncio.wait(readers, timeout=KILL_GRACE_PERIOD)
+    for reader in pending:
+        reader.cancel()
+
+    stats = _rusage_stats(usage)
+    if find_ranks is not None:
+        stats = {stat_name: None for stat_name in stats}
+    stats['peak_memory'] = 0
+    stats['mesh_read_time'] = None
+    if monitor is not None:
+        stats['peak_memory'] = monitor.peak_memory
+        stats['mesh_read_time'] = monitor.get_mesh_read_time()
+        stats['read_chars'] = sum(read_chars for read_chars, _write_chars in monitor.io_chars.values())
+        stats['write_chars'] = sum(write_chars for _read_chars, write_chars in monitor.io_chars.values())
+
+    return {'return_code': return_code, 'stdout': b''.join(stdout_chunks), 'stderr': b''.join(stderr_chunks), 'timed_out': timed_out, 'stop_reason': stop_reason, 'stats': stats}
+
+async def _run_executable_async(command_pre, executable_path, command_args, log_file, check_memory=False, mesh_files=None, cwd=None, timeout=None, on_output=None, stop_check=None, find_ranks=None):
     return_code = 1
     error_message = None
+    stats = {}
+    stats['peak_memory'] = 0
 
     try:
         command = command_pre + [executable_path] + command_args
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        # Initialize peak memory usage variable
-        peak_memory = 0
-        stats = {}
-        stats['peak_memory'] = 0
-
-        if check_memory:
-            # Wrap the subprocess with psutil to monitor memory usage
-            ps_process = psutil.Process(process.pid)
-
-            # Monitor memory usage as long as the process is running
-            while process.poll() is None:
-                total_memory = ps_process.memory_info().rss  # Memory of the main process
-                for child in ps_process.children(recursive=True):
-                    try:
-                        child_mem = child.memory_info().rss
-                        total_memory += child_mem  # Sum memory of all child processes
-                    except psutil.NoSuchProcess:
-                        continue  # Child process has finished and can no longer be queried
-                peak_memory = max(peak_memory, total_memory)
-                time.sleep(0.01)  # Adjust this value as needed
-
-        stdout, stderr = process.communicate()
-        return_code = process.wait()
+        result = await supervise(command, cwd, check_memory, mesh_files, timeout, on_output, stop_check=stop_check, find_ranks=find_ranks)
+        return_code = result['return_code']
+        # A run stopped early fails even if it exited cleanly on SIGTERM
+        if result['stop_reason'] is not None and return_code == 0:
+            return_code = 1
+        stats = result['stats']
+        stdout = result['stdout']
+        stderr = result['stderr']
 
         if return_code == 0:
             _log_output(log_file, "Executable ran successfully.\nPASSED\n")
         else:
             error_message = f"Executable returned non-zero exit code: {return_code}"
+            if result['timed_out']:
+                error_message += f"\nKilled after exceeding the timeout of {timeout} s"
+            if result['stop_reason'] is not None:
+                error_message += f"\nStopped early: {result['stop_reason']}"
             error_message += f"\nCommand: {' '.join(command)}"
             error_message += "\nFAILED\n"
             _log_output(log_file, error_message)
@@ -53,14 +316,28 @@ def _run_executable(command_pre, executable_path, command_args, log_file, check_
 
         # Log peak memory usage
         if check_memory:
-            peak_memory_mb = peak_memory / (1024 * 1024)  # Convert bytes to megabytes
+            peak_memory_mb = stats['peak_memory'] / (1024 * 1024)  # Convert bytes to megabytes
             _log_output(log_file, f"Peak memory usage: {peak_memory_mb:.2f} MB\n")
             stats['peak_memory'] = peak_memory_mb
+        else:
+            stats['peak_memory'] = 0
+
+        if mesh_files is not None and stats['mesh_read_time'] is not None:
+            _log_output(log_file, f"Mesh read time: {stats['mesh_read_time']:.4e} s\n")
+
+        # Log resource usage
+        resource_message = "Resource usage:\n"
+        for stat_name, units in RESOURCE_STATS.items():
+            if stats[stat_name] is None:
+                resource_message += f"    {stat_name}: unknown\n"
+            else:
+                resource_message += f"    {stat_name}: {stats[stat_name]:.6g} {units}\n"
+        _log_output(log_file, resource_message)
 
         if stdout:
-            _log_output(log_file, "Standard output:\n" + stdout.decode())
+            _log_output(log_file, "Standard output:\n" + stdout.decode(errors='replace'))
         if stderr:
-            _log_output(log_file, "Standard error:\n" + stderr.decode())
+            _log_output(log_file, "Standard error:\n" + stderr.decode(errors='replace'))
     
     except FileNotFoundError:
         _log_output(log_file, f"Executable not found at path: {executable_path}")
@@ -71,6 +348,9 @@ def _run_executable(command_pre, executable_path, command_args, log_file, check_
 
     return return_code, stats
 
+def _run_executable(command_pre, executable_path, command_args, log_file, check_memory=False, mesh_files=None, cwd=None, timeout=None):
+    return asyncio.run(_run_executable_async(command_pre, executable_path, command_args, log_file, check_memory, mesh_files, cwd, timeout))
+
 def _remove_file(filename):
     try:
         os.remove(filename)
@@ -81,6 +361,19 @@ def _remove_file(filename):
         print(f"Failed to remove {filename}")
         sys.exit(1)
 
+def _flush_file(filename):
+    # Time how long it takes to write the data the run left in the page cache to storage. This is only what is
+    # still dirty after the run exits, not the time the run spent writing the file.
+    if not os.path.exists(filename):
+        return None
+    start_time = time.perf_counter()
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return time.perf_counter() - start_time
+
 def _get_date_time():
     now = datetime.datetime.now()
     return now.strftime("%Y-%m-%d_%H-%M-%S")
@@ -88,10 +381,15 @@ def _get_date_time():
 def _move_log_files(input_log_file, test_name):
     # Move log_file to a unique name with the date and time
     date_time = _get_date_time()
-    log_file_base = input_log_file.split('.')[0]
+    log_file_base = os.path.splitext(input_log_file)[0]
     log_file = log_file_base + '_' + test_name + '_' + date_time + '.log'
     os.rename(input_log_file, log_file)
 
+def _in_working_dir(working_dir, filename):
+    if working_dir is None or filename is None:
+        return filename
+    return os.path.join(working_dir, filename)
+
 def _print_pass_fail(test_name, return_code, executable_time, extra_message=None):
     GREEN = '\033[92m'  # Green text
     RED = '\033[91m'   # Red text
@@ -110,30 +408,66 @@ def _print_pass_fail(test_name, return_code, executable_time, extra_message=None
 
 class RegressionTest:
 
-    def __init__(self, test_name, executable_path, num_procs, exe_args):
+    def __init__(self, test_name, executable_path, num_procs, exe_args, mesh_files=None, results_file=None, working_dir=None, timeout=None, live_comparisons=None, launcher=None):
         self.test_name = test_name
-        self.log_file = 'regression_test.log'
+        # Directory to run in. Defaults to the current directory.
+        self.working_dir = working_dir
+        self.log_file = _in_working_dir(working_dir, 'regression_test.log')
         self.executable_path = executable_path
         self.num_procs = num_procs
         self.exe_args = exe_args
+        # Input meshes of the run. If set, the time until the slowest rank is done reading them is recorded as 'mesh_read_time'
+        self.mesh_files = [_in_working_dir(working_dir, mesh_file) for mesh_file in mesh_files] if mesh_files is not None else None
+        # Results file of the run. If set, the time to flush what is left of it in the page cache after the run
+        # is recorded as 'results_flush_time'
+        self.results_file = _in_working_dir(working_dir, results_file)
+        # Seconds before the run is killed. None for no limit.
+        self.timeout = timeout
+        # LiveComparison objects checked while the executable runs. The run is stopped at the first difference.
+        self.live_comparisons = live_comparisons if live_comparisons is not None else []
+        # How the MPI ranks are launched. Defaults to the DVM of the session, if there is one, or mpirun.
+        self.launcher = launcher if launcher is not None else get_session_launcher()
         self.executable_time = 0
         self.peak_memory = 0
 
     def run(self):
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
         _remove_file(self.log_file)
-        return_code, stats = self._run()
+        return_code, stats = await self._run()
         _print_pass_fail(self.test_name, return_code, self.executable_time)
         _move_log_files(self.log_file, self.test_name)
         return return_code, stats
 
-    def _run(self):
-        command_pre = ['mpirun', '-n', str(self.num_procs)]
+    def _check_live_comparisons(self):
+        for live_comparison in self.live_comparisons:
+            failure = live_comparison.check()
+            if failure is not None:
+                return f"{live_comparison.results_file} differs from {live_comparison.gold_file}. {failure}"
+        return None
+
+    async def _run(self):
+        # The job ID finds the ranks under a DVM daemon
+        job_id = uuid.uuid4().hex
+        command_pre = self.launcher.command(self.num_procs, job_id)
+        find_ranks = None if self.launcher.ranks_are_children else functools.partial(self.launcher.find_ranks, job_id)
+        stop_check = None
+        if self.live_comparisons:
+            # Results left over from an earlier run would be compared before the new run writes them
+            for live_comparison in self.live_comparisons:
+                _remove_file(live_comparison.results_file)
+            stop_check = self._check_live_comparisons
         # Time the executable
         start_time = time.perf_counter()
-        return_code, stats = _run_executable(command_pre, self.executable_path, self.exe_args, self.log_file, check_memory=True)
+        return_code, stats = await _run_executable_async(command_pre, self.executable_path, self.exe_args, self.log_file, check_memory=True, mesh_files=self.mesh_files, cwd=self.working_dir, timeout=self.timeout, stop_check=stop_check, find_ranks=find_ranks)
         self.peak_memory = stats['peak_memory']
         end_time = time.perf_counter()
         self.executable_time = end_time - start_time
+        stats['run_time'] = self.executable_time
+        stats['launcher'] = self.launcher.name
+        if self.results_file is not None:
+            stats['results_flush_time'] = _flush_file(self.results_file)
         return return_code, stats
 
 class PeakMemoryCheck:
@@ -156,11 +490,43 @@ class PeakMemoryCheck:
 
         return return_code
 
+class ResourceCheck:
+
+    def __init__(self, test_name, stat_name, value, gold_value, tolerance_percent):
+        self.test_name = test_name
+        self.stat_name = stat_name
+        self.value = value
+        self.gold_value = gold_value
+        self.tolerance_percent = tolerance_percent / 100.0
+
+    def run(self):
+        # Check if the resource usage is within the tolerance
+        if self.stat_name not in RESOURCE_STATS:
+            print(f"    Unknown resource '{self.stat_name}'. Options are: {', '.join(RESOURCE_STATS)}")
+            _print_pass_fail(self.test_name, 1, 0)
+            return 1
+        if self.value is None:
+            # Not measured, e.g. when the ranks were started by a DVM
+            print(f"    WARNING: {self.stat_name} of {self.test_name} is unknown with this launcher. Skipping the check. Use --launcher mpirun to check it.")
+            return 0
+        units = RESOURCE_STATS[self.stat_name]
+        upper_limit = self.gold_value * (1.0 + self.tolerance_percent)
+        message = f"{self.stat_name} value: {self.value:.6g} {units}, Gold value: {self.gold_value:.6g} {units}, Upper limit {upper_limit:.6g} {units}"
+        return_code = 0
+        if self.value > upper_limit:
+            print(f"    {self.stat_name} ({self.value:.6g} {units}) exceeded the gold value ({self.gold_value:.6g} {units}) by more than {self.tolerance_percent*100.0}%")
+            return_code = 1
+        _print_pass_fail(self.test_name, return_code, 0, message)
+
+        return return_code
+
 class ExodiffCheck:
 
-    def __init__(self, test_name, exodiff_path, exodiff_file, exodiff_results_file, exodiff_gold_results_file, exodiff_args):
+    def __init__(self, test_name, exodiff_path, exodiff_file, exodiff_results_file, exodiff_gold_results_file, exodiff_args, working_dir=None):
         self.test_name = test_name
-        self.log_file = 'exodiff_check.log'
+        # Directory to run in. Defaults to the current directory.
+        self.working_dir = working_dir
+        self.log_file = _in_working_dir(working_dir, 'exodiff_check.log')
         self.exodiff_path = exodiff_path
         self.exodiff_file = exodiff_file
         self.exodiff_results_file = exodiff_results_file
@@ -169,17 +535,20 @@ class ExodiffCheck:
         self.executable_time = 0
 
     def run(self):
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
         _remove_file(self.log_file)
-        return_code = self._run()
+        return_code = await self._run()
         _print_pass_fail(self.test_name, return_code, self.executable_time)
         _move_log_files(self.log_file, self.test_name)
         return return_code
 
-    def _run(self):
+    async def _run(self):
         command_pre = []
         # Time the executable
         start_time = time.perf_counter()
-        return_code, _stats = _run_executable(command_pre, self.exodiff_path, ['-f', self.exodiff_file, self.exodiff_results_file, self.exodiff_gold_results_file] + self.exodiff_args, self.log_file, check_memory=False)
+        return_code, _stats = await _run_executable_async(command_pre, self.exodiff_path, ['-f', self.exodiff_file, self.exodiff_results_file, self.exodiff_gold_results_file] + self.exodiff_args, self.log_file, check_memory=False, cwd=self.working_dir)
         end_time = time.perf_counter()
         self.executable_time = end_time - start_time
         return return_code
@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+class ResourcePool:
+    # Limits the tests running at once on this host by the number of tests, the cores they use and,
+    # if memory (MB) is given, their predicted peak memory
+
+    def __init__(self, max_jobs=1, cores=None, memory=None):
+        self.max_jobs = max_jobs
+        self.cores = cores if cores is not None else os.cpu_count()
+        self.memory = memory
+        self.running_jobs = 0
+        self.used_cores = 0
+        self.used_memory = 0.0
+        self.condition = None
+
+    def fits_alone(self, memory):
+        # Whether a test could ever run here. One that doesn't fit even on an idle host should be refused.
+        return self.memory is None or memory <= self.memory
+
+    def _fits(self, cores, memory):
+        # A test that needs more cores than the whole host still runs, by itself
+        if self.running_jobs == 0:
+            return True
+        if self.memory is not None and self.used_memory + memory > self.memory:
+            return False
+        return self.running_jobs < self.max_jobs and self.used_cores + cores <= self.cores
+
+    async def acquire(self, cores, memory=0.0):
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self._fits(cores, memory))
+            self.running_jobs += 1
+            self.used_cores += cores
+            self.used_memory += memory
+
+    async def release(self, cores, memory=0.0):
+        async with self.condition:
+            self.running_jobs -= 1
+            self.used_cores -= cores
+            self.used_memory -= memory
+            self.condition.notify_all()
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+def estimate_durations(durations, work):
+    # Fills in the unknown (None) durations from the work of each test, e.g. steps x mesh entities per rank, scaled
+    # by the median seconds per unit of work of the tests with known durations. Without any known durations the
+    # work itself is used, as only the relative sizes matter. Tests with neither get the median.
+    rate = _median([duration / amount for duration, amount in zip(durations, work) if duration is not None and amount])
+    if rate is None and any(duration is not None for duration in durations):
+        # Known durations but no work to scale by. Can't mix the two.
+        work = [None] * len(work)
+    rate = rate if rate is not None else 1.0
+    estimates = [duration if duration is not None else (amount * rate if amount else None) for duration, amount in zip(durations, work)]
+    default = _median([estimate for estimate in estimates if estimate is not None]) or 1.0
+    return [estimate if estimate is not None else default for estimate in estimates]
+
+def partition_tests(keys, durations, cores, num_shards):
+    # Shard index of each test. Longest tests (by core-seconds) are placed first, each on the shard where it raises
+    # the larger of the shard's share of the total runtime and of the total cores the least. Ties are broken by
+    # the test keys, so every CI job computes the same partition from the same inputs.
+    total_duration = sum(durations) or 1.0
+    total_cores = sum(cores) or 1
+    shard_durations = [0.0] * num_shards
+    shard_cores = [0] * num_shards
+    shards = [0] * len(keys)
+    order = sorted(range(len(keys)), key=lambda i: (-durations[i] * cores[i], -durations[i], keys[i]))
+    for i in order:
+        def load(shard):
+            return max((shard_durations[shard] + durations[i]) / total_duration, (shard_cores[shard] + cores[i]) / total_cores)
+        shard = min(range(num_shards), key=lambda s: (load(s), shard_durations[s], s))
+        shards[i] = shard
+        shard_durations[shard] += durations[i]
+        shard_cores[shard] += cores[i]
+    return shards
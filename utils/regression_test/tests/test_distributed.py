@@ -0,0 +1,188 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from distributed import Coordinator, Worker, make_job
+
+WRITE_STATS = 'import json, sys; print("running"); json.dump({"value": int(sys.argv[2])}, open(sys.argv[1], "w"))'
+REMOVE_STATS = 'import os, sys; os.remove(sys.argv[1]); sys.exit(3)'
+WRITE_LOG = 'open("regression_test_big.log", "w").write("x" * 200000 + "\\n" + "y" * 100000)'
+
+
+class _DroppingWorker(Worker):
+    # Simulates a host that goes away as soon as it gets a job
+    async def _run_job(self, job):
+        self.writer.close()
+
+
+class _HangingWorker(Worker):
+    # Simulates a host that stops responding, without closing the connection
+    async def _run_job(self, job):
+        await asyncio.sleep(3600)
+
+
+class TestDistributed(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        for i in range(6):
+            os.makedirs(os.path.join(self.root.name, f'test_{i}'))
+        self.jobs = [make_job(i, f'test_{i}', f'test_{i}', ['{python}', '-c', WRITE_STATS, '{stats_file}', str(i)]) for i in range(6)]
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def _make_worker(self, worker_class, port, name, **kwargs):
+        return worker_class('127.0.0.1', port, 'build', root=self.root.name, cores=2, hardware=['cpu'], name=name, **kwargs)
+
+    def _check_results(self, results):
+        self.assertEqual(sorted(results), list(range(6)))
+        for job_id, result in results.items():
+            self.assertEqual(result['return_code'], 0)
+            self.assertEqual(result['stats'], {'value': job_id})
+
+    def test_several_workers(self):
+        async def run():
+            logs = []
+            coordinator = Coordinator(self.jobs, '127.0.0.1', 0, on_log=lambda worker, job, line: logs.append(line))
+            await coordinator.start()
+            workers = [self._make_worker(Worker, coordinator.port, f'worker_{i}') for i in range(3)]
+            worker_tasks = [asyncio.create_task(worker.run()) for worker in workers]
+            results = await coordinator.wait()
+            await asyncio.gather(*worker_tasks)
+            return results, logs
+
+        results, logs = asyncio.run(run())
+        self._check_results(results)
+        self.assertEqual(logs.count('running'), 6)
+
+    def test_hardware_matching(self):
+        self.jobs[0]['hardware'] = 'gpu'
+
+        async def run():
+            coordinator = Coordinator(self.jobs, '127.0.0.1', 0, on_log=None)
+            await coordinator.start()
+            cpu_worker = self._make_worker(Worker, coordinator.port, 'cpu_worker')
+            gpu_worker = Worker('127.0.0.1', coordinator.port, 'build', root=self.root.name, cores=2, hardware=['cpu', 'gpu'], name='gpu_worker')
+            worker_tasks = [asyncio.create_task(cpu_worker.run()), asyncio.create_task(gpu_worker.run())]
+            results = await coordinator.wait()
+            await asyncio.gather(*worker_tasks)
+            return results
+
+        results = asyncio.run(run())
+        self._check_results(results)
+        self.assertEqual(results[0]['worker'], 'gpu_worker')
+
+    def test_requeue_on_disconnect(self):
+        async def run():
+            coordinator = Coordinator(self.jobs, '127.0.0.1', 0, on_log=None)
+            await coordinator.start()
+            dropping_worker = self._make_worker(_DroppingWorker, coordinator.port, 'dropping_worker')
+            dropping_task = asyncio.create_task(dropping_worker.run())
+            await dropping_task
+            worker = self._make_worker(Worker, coordinator.port, 'worker')
+            worker_task = asyncio.create_task(worker.run())
+            results = await coordinator.wait()
+            await worker_task
+            return results
+
+        results = asyncio.run(run())
+        self._check_results(results)
+        self.assertTrue(all(result['worker'] == 'worker' for result in results.values()))
+
+    def test_requeue_on_missed_heartbeats(self):
+        async def run():
+            coordinator = Coordinator(self.jobs, '127.0.0.1', 0, heartbeat_timeout=0.5, on_log=None)
+            await coordinator.start()
+            wait_task = asyncio.create_task(coordinator.wait())
+            hanging_worker = self._make_worker(_HangingWorker, coordinator.port, 'hanging_worker', heartbeat_interval=3600)
+            hanging_task = asyncio.create_task(hanging_worker.run())
+            await asyncio.sleep(0.2)
+            worker = self._make_worker(Worker, coordinator.port, 'worker')
+            worker_task = asyncio.create_task(worker.run())
+            results = await wait_task
+            await asyncio.gather(worker_task, hanging_task)
+            return results
+
+        results = asyncio.run(run())
+        self._check_results(results)
+        self.assertTrue(all(result['worker'] == 'worker' for result in results.values()))
+
+    def test_unrunnable_jobs_fail(self):
+        # No worker has a gpu, so the gpu job fails after the timeout instead of waiting forever
+        self.jobs[0]['hardware'] = 'gpu'
+
+        async def run():
+            coordinator = Coordinator(self.jobs, '127.0.0.1', 0, on_log=None, unrunnable_timeout=0.5)
+            await coordinator.start()
+            worker = self._make_worker(Worker, coordinator.port, 'cpu_worker')
+            worker_task = asyncio.create_task(worker.run())
+            results = await asyncio.wait_for(coordinator.wait(), 30.0)
+            await worker_task
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(sorted(results), list(range(6)))
+        self.assertEqual(results[0]['return_code'], 1)
+        self.assertIn('gpu', results[0]['error'])
+        self.assertTrue(all(results[job_id]['return_code'] == 0 for job_id in range(1, 6)))
+
+    def test_missing_stats_file(self):
+        # A job that leaves no stats file fails without taking the worker down
+        jobs = [make_job(0, 'test_0', 'test_0', ['{python}', '-c', REMOVE_STATS, '{stats_file}']), self.jobs[1]]
+
+        async def run():
+            coordinator = Coordinator(jobs, '127.0.0.1', 0, on_log=None)
+            await coordinator.start()
+            worker = self._make_worker(Worker, coordinator.port, 'worker')
+            worker_task = asyncio.create_task(worker.run())
+            results = await asyncio.wait_for(coordinator.wait(), 30.0)
+            await worker_task
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(results[0]['return_code'], 3)
+        self.assertEqual(results[0]['stats'], {})
+        self.assertEqual(results[1]['stats'], {'value': 1})
+
+    def test_large_log(self):
+        # Logs much larger than a line of the stream reader's default limit reach the coordinator
+        jobs = [make_job(0, 'test_0', 'test_0', ['{python}', '-c', WRITE_LOG])]
+
+        async def run():
+            coordinator = Coordinator(jobs, '127.0.0.1', 0, on_log=None)
+            await coordinator.start()
+            worker = self._make_worker(Worker, coordinator.port, 'worker')
+            worker_task = asyncio.create_task(worker.run())
+            results = await asyncio.wait_for(coordinator.wait(), 30.0)
+            await worker_task
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(results[0]['return_code'], 0)
+        self.assertEqual(results[0]['worker'], 'worker')
+        self.assertEqual(results[0]['logs'], {'regression_test_big.log': 'x' * 200000 + '\n' + 'y' * 100000})
+
+    def test_hello_and_token(self):
+        # A connection that never says hello and a worker with the wrong token are turned away
+        async def run():
+            coordinator = Coordinator(self.jobs, '127.0.0.1', 0, on_log=None, token='secret', hello_timeout=0.5)
+            await coordinator.start()
+            _silent_reader, silent_writer = await asyncio.open_connection('127.0.0.1', coordinator.port)
+            intruder = self._make_worker(Worker, coordinator.port, 'intruder', token='wrong')
+            await asyncio.wait_for(intruder.run(), 30.0)
+            worker = self._make_worker(Worker, coordinator.port, 'worker', token='secret')
+            worker_task = asyncio.create_task(worker.run())
+            results = await asyncio.wait_for(coordinator.wait(), 30.0)
+            await worker_task
+            silent_writer.close()
+            return results
+
+        results = asyncio.run(run())
+        self._check_results(results)
+        self.assertTrue(all(result['worker'] == 'worker' for result in results.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
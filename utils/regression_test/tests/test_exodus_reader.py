@@ -0,0 +1,33 @@
+import os
+import unittest
+
+from exodus_reader import read_header, read_mesh_counts
+
+
+class TestExodusReader(unittest.TestCase):
+
+    def setUp(self):
+        os.chdir('tests/test_files')
+
+    def tearDown(self):
+        os.chdir('../..')
+
+    def test_read_mesh_counts(self):
+        counts = read_mesh_counts('mesh_1x1x5.exo')
+        self.assertEqual(counts['num_dim'], 3)
+        self.assertEqual(counts['num_nodes'], 24)
+        self.assertEqual(counts['num_elem'], 30)
+        self.assertEqual(counts['num_elem_blocks'], 1)
+        self.assertEqual(counts['num_side_sets'], 1)
+
+    def test_read_header(self):
+        header = read_header('mesh_1x1x5.exo')
+        self.assertIn(header['version'], (1, 2, 5))
+        self.assertEqual(header['variables']['coordx']['dimensions'], ['num_nodes'])
+
+    def test_not_netcdf(self):
+        with self.assertRaises(ValueError):
+            read_header('input.yaml')
+
+if __name__ == '__main__':
+    unittest.main()
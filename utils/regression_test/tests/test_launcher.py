@@ -0,0 +1,139 @@
+import csv
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import psutil
+
+from launcher import DVM_ENVIRONMENT_VARIABLE, JOB_ENVIRONMENT_VARIABLE, DvmLauncher, MpirunLauncher, get_session_launcher, record_startup_time, start_launcher
+from regression_test import RegressionTest
+
+# Stand-ins for PRRTE, which this machine doesn't have. Like the real prte, the daemon starts the ranks of
+# every job as its own children. prun hands it the job through a spool directory next to the URI file and
+# waits for the return code.
+FAKE_PRTE = '''
+import json, os, subprocess, sys, time
+uri_file = sys.argv[sys.argv.index('--report-uri') + 1]
+spool = os.path.dirname(uri_file)
+with open(uri_file + '.tmp', 'w') as file:
+    file.write('prte-fake@0.0;tcp://127.0.0.1:0\\n')
+os.rename(uri_file + '.tmp', uri_file)
+jobs = {}
+while not os.path.exists(os.path.join(spool, 'stop')):
+    for name in os.listdir(spool):
+        if name.endswith('.job') and name not in jobs:
+            with open(os.path.join(spool, name)) as file:
+                job = json.load(file)
+            jobs[name] = [subprocess.Popen(job['command'], cwd=job['cwd'], env=dict(os.environ, **job['env'])) for _ in range(job['num_procs'])]
+    for name, ranks in jobs.items():
+        if ranks and all(rank.poll() is not None for rank in ranks):
+            with open(os.path.join(spool, name[:-len('.job')] + '.done'), 'w') as file:
+                file.write(str(max(rank.returncode for rank in ranks)))
+            jobs[name] = []
+    time.sleep(0.01)
+'''
+
+FAKE_PRUN = '''
+import json, os, sys, time
+args = sys.argv[1:]
+uri_file = args[args.index('--dvm-uri') + 1][len('file:'):]
+num_procs = int(args[args.index('-n') + 1])
+args = args[args.index('-n') + 2:]
+env = {}
+while args[0] == '-x':
+    name, _separator, value = args[1].partition('=')
+    env[name] = value
+    args = args[2:]
+job = os.path.join(os.path.dirname(uri_file), str(os.getpid()))
+with open(job + '.tmp', 'w') as file:
+    json.dump({'command': args, 'cwd': os.getcwd(), 'env': env, 'num_procs': num_procs}, file)
+os.rename(job + '.tmp', job + '.job')
+while not os.path.exists(job + '.done'):
+    time.sleep(0.01)
+with open(job + '.done') as file:
+    sys.exit(int(file.read()))
+'''
+
+FAKE_PTERM = '''
+import os, sys
+uri_file = sys.argv[sys.argv.index('--dvm-uri') + 1][len('file:'):]
+open(os.path.join(os.path.dirname(uri_file), 'stop'), 'w').close()
+'''
+
+# Holds 200 MB for a second, so the memory is only there if the rank is measured
+RANK = 'import time; data = b"\\1" * (200 * 1024 * 1024); time.sleep(1.0)'
+
+
+def write_script(directory, name, source):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as file:
+        file.write(f'#!{sys.executable}\n' + source)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+
+class TestLauncher(unittest.TestCase):
+
+    def test_session_launcher(self):
+        with tempfile.NamedTemporaryFile() as uri_file:
+            with mock.patch.dict(os.environ, {DVM_ENVIRONMENT_VARIABLE: f'prte:{os.getpid()}:{uri_file.name}'}):
+                launcher = get_session_launcher()
+                self.assertIsInstance(launcher, DvmLauncher)
+                self.assertEqual(launcher.command(4), ['prun', '--dvm-uri', f'file:{uri_file.name}', '-n', '4'])
+                self.assertEqual(launcher.command(4, 'abc')[-2:], ['-x', f'{JOB_ENVIRONMENT_VARIABLE}=abc'])
+        # The DVM is gone
+        with mock.patch.dict(os.environ, {DVM_ENVIRONMENT_VARIABLE: f'prte:{os.getpid()}:/nonexistent/dvm.uri'}):
+            self.assertEqual(get_session_launcher().command(2), ['mpirun', '-n', '2'])
+
+    def test_fallback(self):
+        # No DVM on the path
+        with tempfile.TemporaryDirectory() as empty_dir, mock.patch.dict(os.environ, {'PATH': empty_dir}):
+            launcher = start_launcher('dvm')
+        self.assertIsInstance(launcher, MpirunLauncher)
+        self.assertNotIn(DVM_ENVIRONMENT_VARIABLE, os.environ)
+
+    def test_dvm_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            bin_dir = os.path.join(directory, 'bin')
+            os.makedirs(bin_dir)
+            for name, source in [('prte', FAKE_PRTE), ('prun', FAKE_PRUN), ('pterm', FAKE_PTERM)]:
+                write_script(bin_dir, name, source)
+            with mock.patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}):
+                launcher = start_launcher('dvm')
+                self.assertIsInstance(launcher, DvmLauncher)
+                self.assertEqual(launcher.kind, 'prte')
+                daemon = psutil.Process(launcher.daemon_pid)
+                # The scripts the session spawns submit into the same DVM
+                self.assertEqual(get_session_launcher().daemon_pid, launcher.daemon_pid)
+                try:
+                    regression_test = RegressionTest('dvm_run', sys.executable, 2, ['-c', RANK], working_dir=directory)
+                    return_code, stats = regression_test.run()
+                finally:
+                    launcher.stop()
+
+                self.assertEqual(return_code, 0)
+                self.assertEqual(stats['launcher'], 'prte-dvm')
+                # The ranks under the daemon are measured, not only prun
+                self.assertGreater(stats['peak_memory'], 2 * 200)
+                # wait4 only sees prun
+                self.assertIsNone(stats['user_time'])
+
+                self.assertFalse(daemon.is_running())
+                self.assertFalse(os.path.exists(launcher.uri_file))
+                self.assertNotIn(DVM_ENVIRONMENT_VARIABLE, os.environ)
+
+            # The startup time goes to its own history
+            history_file = record_startup_time(launcher, directory)
+            record_startup_time(launcher, directory)
+            with open(history_file, 'r') as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual([row['Launcher'] for row in rows], ['prte-dvm', 'prte-dvm'])
+            self.assertAlmostEqual(float(rows[0]['Startup Time (s)']), launcher.startup_time)
+            self.assertGreater(launcher.startup_time, 0.0)
+            self.assertIsNone(record_startup_time(MpirunLauncher(), directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
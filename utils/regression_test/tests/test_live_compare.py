@@ -0,0 +1,64 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from exodus_reader import read_header
+from live_compare import LiveComparison, exceeds_tolerance, read_exodiff_tolerances
+
+GOLD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tests', 'cylindrical_taylor_bar', 'regression', 'rkpm')
+
+
+class TestLiveCompare(unittest.TestCase):
+
+    def test_read_exodiff_tolerances(self):
+        tolerances = read_exodiff_tolerances('tests/test_files/compare.exodiff')
+        self.assertEqual(tolerances['coordinates'], {'type': 'absolute', 'value': 1.0e-6, 'floor': 0.0})
+        self.assertEqual(tolerances['time_steps']['type'], 'relative')
+        self.assertIsNone(tolerances['global'])
+        nodal = tolerances['nodal']
+        self.assertEqual(len(nodal['variables']), 20)
+        # Variables without their own tolerance use the one of the section
+        self.assertEqual(nodal['variables']['kernel_radius'], nodal['default'])
+        self.assertEqual(list(tolerances['element']['variables']), ['num_neighbors'])
+
+    def test_exceeds_tolerance(self):
+        relative = {'type': 'relative', 'value': 1.0e-3, 'floor': 1.0e-10}
+        gold = np.array([1.0, 1.0, 0.0, 1.0e-12, 1.0])
+        values = np.array([1.0005, 1.002, 0.0, -1.0e-12, np.nan])
+        np.testing.assert_array_equal(exceeds_tolerance(relative, gold, values), [False, True, False, False, True])
+        absolute = {'type': 'absolute', 'value': 0.01, 'floor': 0.0}
+        np.testing.assert_array_equal(exceeds_tolerance(absolute, [100.0, 100.0], [100.005, 100.02]), [False, True])
+        ignore = {'type': 'ignore', 'value': 0.0, 'floor': 0.0}
+        self.assertFalse(exceeds_tolerance(ignore, [1.0], [2.0]).any())
+
+    def test_live_comparison(self):
+        gold_file = os.path.join(GOLD_DIR, 'gold_results.exo')
+        compare_file = os.path.join(GOLD_DIR, 'compare.exodiff')
+        with tempfile.TemporaryDirectory() as directory:
+            results_file = os.path.join(directory, 'results.exo')
+            # Nothing written yet
+            live_comparison = LiveComparison(results_file, gold_file, compare_file)
+            self.assertIsNone(live_comparison.check())
+
+            # Same results. The first step is compared since the second one has started.
+            shutil.copyfile(gold_file, results_file)
+            self.assertIsNone(live_comparison.check())
+            self.assertEqual(live_comparison.next_step, 1)
+
+            # Change velocity_z of node 5 in the first step
+            header = read_header(results_file)
+            with open(results_file, 'r+b') as file:
+                file.seek(header['variables']['vals_nod_var20']['begin'] + 4 * 8)
+                file.write(struct.pack('>d', 400.0))
+            live_comparison = LiveComparison(results_file, gold_file, compare_file)
+            failure = live_comparison.check()
+            self.assertIn('Time step 1', failure)
+            self.assertIn('velocity_z: 400 vs gold -373 at node 5', failure)
+
+
+if __name__ == '__main__':
+    unittest.main()
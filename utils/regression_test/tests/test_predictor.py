@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from predictor import Predictor, append_to_history, get_features, read_history
+
+
+def make_record(num_nodes, num_procs, approximation_space='finite_element'):
+    # 10 MB per rank plus 1 kB per node and 0.5 kB per element on the rank, 1 us per node and step
+    features = {'num_nodes': num_nodes, 'num_elem': 3 * num_nodes, 'approximation_space': approximation_space,
+                'integration_scheme': 'gauss_quadrature', 'num_steps': 100, 'num_procs': num_procs}
+    peak_memory = num_procs * (10.0 + 1.0e-3 * num_nodes / num_procs + 0.5e-3 * 3 * num_nodes / num_procs)
+    runtime = 0.5 + 1.0e-6 * 100 * num_nodes / num_procs
+    return features, peak_memory, runtime
+
+
+class TestPredictor(unittest.TestCase):
+
+    def test_get_features(self):
+        features = get_features('tests/test_files/input.yaml', 2)
+        self.assertEqual(features['num_nodes'], 24)
+        self.assertEqual(features['num_elem'], 30)
+        self.assertEqual(features['approximation_space'], 'reproducing_kernel')
+        self.assertEqual(features['integration_scheme'], 'strain_smoothing')
+        self.assertEqual(features['num_steps'], 50)
+        self.assertEqual(features['num_procs'], 2)
+
+    def test_predict(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history_file = os.path.join(directory, 'history.jsonl')
+            # Not enough history yet
+            self.assertIsNone(Predictor(read_history(history_file)).predict(make_record(1000, 1)[0]))
+            for num_nodes, num_procs in [(1000, 1), (8000, 1), (8000, 4), (64000, 4), (64000, 2)]:
+                append_to_history(history_file, *make_record(num_nodes, num_procs))
+            predictor = Predictor(read_history(history_file))
+        features, peak_memory, runtime = make_record(512000, 8)
+        prediction = predictor.predict(features)
+        self.assertAlmostEqual(prediction['peak_memory'], peak_memory, places=6)
+        self.assertAlmostEqual(prediction['peak_memory_per_rank'], peak_memory / 8, places=6)
+        self.assertAlmostEqual(prediction['runtime'], runtime, places=6)
+        # Falls back to all the runs for a formulation without history
+        self.assertIsNotNone(predictor.predict(make_record(1000, 1, 'reproducing_kernel')[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,24 @@
+import asyncio
+import glob
 import os
+import sys
+import tempfile
+import time
 import unittest
+from unittest import mock
 
-from regression_test import ExodiffCheck, RegressionTest
+import psutil
+
+from regression_test import ExodiffCheck, RegressionTest, ResourceCheck, supervise
+
+
+class _DirectLauncher:
+    # Runs the executable without MPI
+    name = 'direct'
+    ranks_are_children = True
+
+    def command(self, num_procs, job_id=None):
+        return []
 
 
 class TestRegressionTest(unittest.TestCase):
@@ -46,5 +63,117 @@ class TestRegressionTest(unittest.TestCase):
         result = exodiff.run()
         self.assertTrue(result == 0)
 
+    def test_resource_check(self):
+        # Within the tolerance
+        check = ResourceCheck('resource_check_pass', 'system_time', 1.05, 1.0, 10)
+        self.assertTrue(check.run() == 0)
+
+        # Exceeds the tolerance
+        check = ResourceCheck('resource_check_fail', 'system_time', 2.0, 1.0, 10)
+        self.assertFalse(check.run() == 0)
+
+        # Unknown resource
+        check = ResourceCheck('resource_check_unknown', 'not_a_resource', 1.0, 1.0, 10)
+        self.assertFalse(check.run() == 0)
+
+        # Not measured, e.g. under a DVM or when the run failed to start. Skipped with a warning, not taken as 0.
+        check = ResourceCheck('resource_check_missing', 'system_time', None, 1.0, 10)
+        self.assertTrue(check.run() == 0)
+
+class TestSupervise(unittest.TestCase):
+
+    def test_return_code_and_output(self):
+        lines = []
+        result = asyncio.run(supervise([sys.executable, '-c', 'import sys; print("line 1"); print("line 2"); sys.exit(3)'], on_output=lambda stream_name, line: lines.append(line)))
+        self.assertEqual(result['return_code'], 3)
+        self.assertEqual(result['stdout'], b'line 1\nline 2\n')
+        self.assertEqual(lines, ['line 1', 'line 2'])
+        self.assertFalse(result['timed_out'])
+
+    def test_large_output(self):
+        # Output larger than the pipe buffer must not block the process
+        result = asyncio.run(supervise([sys.executable, '-c', 'print("x" * 1000000)']))
+        self.assertEqual(result['return_code'], 0)
+        self.assertEqual(len(result['stdout']), 1000001)
+
+    def test_timeout(self):
+        start_time = time.perf_counter()
+        result = asyncio.run(supervise(['sleep', '30'], timeout=0.2))
+        self.assertTrue(result['timed_out'])
+        self.assertFalse(result['return_code'] == 0)
+        self.assertLess(time.perf_counter() - start_time, 10.0)
+
+    def test_stop_check(self):
+        calls = []
+
+        def stop_check():
+            calls.append(1)
+            return 'diverged' if len(calls) >= 2 else None
+
+        start_time = time.perf_counter()
+        result = asyncio.run(supervise(['sleep', '30'], stop_check=stop_check, stop_check_interval=0.05))
+        self.assertEqual(result['stop_reason'], 'diverged')
+        self.assertFalse(result['timed_out'])
+        self.assertFalse(result['return_code'] == 0)
+        self.assertLess(time.perf_counter() - start_time, 10.0)
+
+    def test_concurrent(self):
+        async def run_all():
+            return await asyncio.gather(*(supervise(['sleep', '0.5']) for _ in range(20)))
+
+        start_time = time.perf_counter()
+        results = asyncio.run(run_all())
+        self.assertTrue(all(result['return_code'] == 0 for result in results))
+        self.assertLess(time.perf_counter() - start_time, 5.0)
+
+    def test_resource_stats(self):
+        result = asyncio.run(supervise([sys.executable, '-c', 'sum(range(10000000))'], check_memory=True))
+        self.assertGreater(result['stats']['user_time'], 0.0)
+        self.assertGreater(result['stats']['peak_memory'], 0)
+
+    def test_mesh_read_time(self):
+        # Reads of other files don't count. The mesh is read in chunks and closed, then the run keeps going.
+        script = '''
+import sys, time
+with open(sys.argv[2], 'rb') as file:
+    file.read()
+time.sleep(0.2)
+with open(sys.argv[1], 'rb') as file:
+    while file.read(262144):
+        time.sleep(0.1)
+time.sleep(1.0)
+'''
+        with tempfile.TemporaryDirectory() as directory:
+            mesh_file = os.path.join(directory, 'mesh.exo')
+            other_file = os.path.join(directory, 'other.dat')
+            for filename in [mesh_file, other_file]:
+                with open(filename, 'wb') as file:
+                    file.write(b'\0' * 1048576)
+            result = asyncio.run(supervise([sys.executable, '-c', script, mesh_file, other_file], mesh_files=[mesh_file]))
+        mesh_read_time = result['stats']['mesh_read_time']
+        self.assertIsNotNone(mesh_read_time)
+        self.assertGreater(mesh_read_time, 0.5)
+        self.assertLess(mesh_read_time, 1.2)
+
+    def test_mesh_read_time_unknown(self):
+        # pread doesn't move the file position, so a mesh kept open until exit can't be timed
+        script = 'import os, sys, time; fd = os.open(sys.argv[1], os.O_RDONLY); os.pread(fd, 1024, 0); time.sleep(0.5)'
+        with tempfile.NamedTemporaryFile() as mesh_file:
+            result = asyncio.run(supervise([sys.executable, '-c', script, mesh_file.name], mesh_files=[mesh_file.name]))
+        self.assertIsNone(result['stats']['mesh_read_time'])
+
+    def test_unmonitored_run(self):
+        # A run that is gone before it can be monitored still has its stats and output logged
+        with tempfile.TemporaryDirectory() as directory, mock.patch('psutil.Process', side_effect=psutil.NoSuchProcess(0)):
+            test = RegressionTest('unmonitored', sys.executable, 1, ['-c', 'print("done")'], mesh_files=['mesh.exo'], working_dir=directory, launcher=_DirectLauncher())
+            return_code, stats = test.run()
+            log_file, = glob.glob(os.path.join(directory, 'regression_test_unmonitored_*.log'))
+            with open(log_file, 'r') as file:
+                log = file.read()
+        self.assertEqual(return_code, 0)
+        self.assertIsNone(stats['mesh_read_time'])
+        self.assertIn('Resource usage:', log)
+        self.assertIn('done', log)
+
 if __name__ == '__main__':
     unittest.main()
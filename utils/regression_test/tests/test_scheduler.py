@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+from scheduler import ResourcePool, estimate_durations, partition_tests
+
+
+class TestResourcePool(unittest.TestCase):
+
+    def test_memory(self):
+        pool = ResourcePool(max_jobs=4, cores=4, memory=1000.0)
+        self.assertTrue(pool.fits_alone(1000.0))
+        self.assertFalse(pool.fits_alone(1001.0))
+
+        async def run():
+            order = []
+
+            async def job(name, memory, duration):
+                await pool.acquire(1, memory)
+                order.append(('start', name))
+                await asyncio.sleep(duration)
+                order.append(('end', name))
+                await pool.release(1, memory)
+
+            await asyncio.gather(job('a', 600.0, 0.1), job('b', 600.0, 0.0), job('c', 300.0, 0.0))
+            return order
+
+        order = asyncio.run(run())
+        # b waits for a to free its memory, c fits next to a
+        self.assertLess(order.index(('start', 'c')), order.index(('end', 'a')))
+        self.assertGreater(order.index(('start', 'b')), order.index(('end', 'a')))
+
+
+class TestSharding(unittest.TestCase):
+
+    def test_estimate_durations(self):
+        # 2 s per unit of work from the known tests. The last has neither a duration nor work and gets the median.
+        self.assertEqual(estimate_durations([10.0, 20.0, None, None], [5.0, 10.0, 3.0, None]), [10.0, 20.0, 6.0, 10.0])
+        # Without any known durations the work is used as is
+        self.assertEqual(estimate_durations([None, None], [4.0, 2.0]), [4.0, 2.0])
+
+    def test_partition_tests(self):
+        keys = [f'test_{i}' for i in range(8)]
+        durations = [100.0, 90.0, 50.0, 40.0, 30.0, 20.0, 10.0, 10.0]
+        cores = [1, 1, 4, 4, 1, 1, 2, 2]
+        shards = partition_tests(keys, durations, cores, 2)
+        self.assertEqual(shards, partition_tests(keys, durations, cores, 2))
+        shard_durations = [sum(d for d, s in zip(durations, shards) if s == shard) for shard in range(2)]
+        shard_cores = [sum(c for c, s in zip(cores, shards) if s == shard) for shard in range(2)]
+        self.assertLessEqual(max(shard_durations), 0.6 * sum(durations))
+        self.assertLessEqual(max(shard_cores), 0.6 * sum(cores))
+        # The same partition whatever order the tests are found in
+        reverse_shards = partition_tests(keys[::-1], durations[::-1], cores[::-1], 2)
+        self.assertEqual(reverse_shards[::-1], shards)
+
+
+if __name__ == '__main__':
+    unittest.main()
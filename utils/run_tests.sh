@@ -1,6 +1,6 @@
 #!/bin/bash
 
-test_dirs=("regression_test")
+test_dirs=("regression_test" "performance_test" "misc")
 fail=0
 
 for dir in "${test_dirs[@]}"; do